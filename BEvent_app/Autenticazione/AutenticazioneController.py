@@ -57,6 +57,8 @@ def logout():
     session.pop('nome_utente', None)
     session.pop('ruolo', None)
     session.pop('regione', None)
+    if current_user.is_authenticated:
+        AutenticazioneService.invalida_principale(current_user.get_id())
     logout_user()
     return redirect('/')
 
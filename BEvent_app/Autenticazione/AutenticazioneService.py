@@ -9,10 +9,16 @@ from ..InterfacciaPersistenza.Organizzatore import Organizzatore
 from ..InterfacciaPersistenza.Fornitore import Fornitore
 from ..InterfacciaPersistenza.Admin import Admin
 from ..InterfacciaPersistenza.EventoPrivato import EventoPrivato
+from ..InterfacciaPersistenza.Principale import Principale
+from ..InterfacciaPersistenza.Proiezioni import proiezione, PRINCIPALE
+from ..Utils.Cache import CacheTTL
+from ..Utils.Conversioni import converti_intero
+from ..GestioneEvento.IndiceFornitori import aggiorna_fornitore
 from ..db import get_db
 from werkzeug.security import generate_password_hash
 
-db = get_db()
+# utenti autenticati già letti dal database, per non rileggerli a ogni richiesta
+_cache_principali = CacheTTL(dimensione_massima=1024, durata=300)
 
 
 def verify_user(email, password):
@@ -24,7 +30,8 @@ def verify_user(email, password):
         restituisce un'istanza dell'utente se la verifica ha successo, altrimenti None
         """
 
-    user_data = db.Utente.find_one({'email': email})
+    db = get_db()
+    user_data = db.Utente.find_one({'email': email}, proiezione('Utente'))
 
     if user_data:
         utente = Utente(user_data)
@@ -241,6 +248,7 @@ def registra_forn(nome, cognome, nome_utente, email, password, cpassword, telefo
     :param regione: (str) regione del fornitore
     :return: restituisce un'istanza del Fornitore se la registrazione ha successo, altrimenti restituisce None
     """
+    db = get_db()
     result, result_message = controlla_campi(nome, cognome, telefono, nome_utente, email, data_di_nascita)
     if not result:
         flash(result_message, "error")
@@ -268,7 +276,7 @@ def registra_forn(nome, cognome, nome_utente, email, password, cpassword, telefo
                 fornitore_data = {
                     'Fornitore': {
                         'Descrizione': descrizione,
-                        'EventiMassimiGiornaliero': eventi_max_giorn,
+                        'EventiMassimiGiornaliero': converti_intero(eventi_max_giorn),
                         'OrarioDiLavoro': "",
                         'Foto': [],
                         'Citta': citta,
@@ -280,7 +288,10 @@ def registra_forn(nome, cognome, nome_utente, email, password, cpassword, telefo
 
                 documento_fornitore = {**user_data, **fornitore_data}
 
-                db.Utente.insert_one(documento_fornitore)
+                from ..GestioneEvento.GestioneEventoService import invalida_disponibilita
+                risultato = db.Utente.insert_one(documento_fornitore)
+                aggiorna_fornitore(risultato.inserted_id)
+                invalida_disponibilita()
                 flash("Registrazione avvenuta con successo!", "success")
 
                 return True
@@ -302,6 +313,7 @@ def registra_admin(nome, cognome, nome_utente, email, password, cpassword, telef
     :return: Restituisce un'istanza Admin se la registrazione ha successo, altrimenti restituisce None
     """
 
+    db = get_db()
     if controlla_campi(nome, cognome, telefono, nome_utente, email, data_di_nascita):
         if not is_valid_email(email):
             flash("Email esistente", "error")
@@ -340,6 +352,7 @@ def registra_org(nome, cognome, nome_utente, email, password, cpassword, telefon
     :return:Restituisce un'istanza di Organizzatore se la registrazione ha successo, altrimenti restituisce None
     """
 
+    db = get_db()
     if controlla_campi(nome, cognome, telefono, nome_utente, email, data_di_nascita):
 
         if not is_valid_email(email):
@@ -380,13 +393,14 @@ def get_dati_area_organizzatore(id_organizzatore):
     :return: Una tupla contentente un'itanza di Organizzatore, una lista di EventoPrivato e una lista di Biglietto
     """
 
-    organizzatore_data = db['Utente'].find_one({'_id': ObjectId(id_organizzatore)})
+    db = get_db()
+    organizzatore_data = db['Utente'].find_one({'_id': ObjectId(id_organizzatore)}, proiezione('Utente'))
     organizzatore = Organizzatore(organizzatore_data, organizzatore_data)
 
     eventi_privati_data = list(db['Evento'].find({
         'EventoPrivato.Organizzatore': id_organizzatore,
         'Ruolo': "2"
-    }))
+    }, proiezione('Evento')))
     eventi_privati = []
     for data in eventi_privati_data:
         evento_privato = EventoPrivato(data, data)
@@ -408,88 +422,80 @@ def get_dati_home_organizzatore(id_organizzatore):
     """
     Ottiene i dati per la home page di un organizzatore.
     Versione OTTIMIZZATA e SICURA contro errori di chiavi mancanti.
+    Richiede che le date degli eventi siano salvate come datetime (vedi il comando flask migra-date).
     """
+    db = get_db()
     oggi = datetime.now()
+    # oltre alla card servono i campi dei documenti più vecchi usati come ripiego per 'Invitati/Posti'
+    campi_evento = {**proiezione('Evento'), 'n_persone': 1, 'BigliettiDisponibili': 1}
 
     # --- 1. EVENTO PRIVATO ---
-    # Cerchiamo direttamente nel DB ordinando per data (più efficiente)
-    eventi_privati_cursor = db['Evento'].find({
+    # La data è salvata come datetime: filtro sui soli eventi futuri e ordinamento li fa il database
+    evento_privato_data = db['Evento'].find_one({
         "Ruolo": "2",
-        "EventoPrivato.Organizzatore": id_organizzatore
-    }).sort("Data", 1)
+        "EventoPrivato.Organizzatore": id_organizzatore,
+        "Data": {"$gte": oggi}
+    }, campi_evento, sort=[("Data", 1)])
 
     evento_privato = None
-
-    for ev in eventi_privati_cursor:
-        try:
-            # Parsing Data Sicuro
-            data_raw = ev.get("Data")
-            data_evento = None
-
-            if isinstance(data_raw, datetime):
-                data_evento = data_raw
-            elif isinstance(data_raw, str):
-                for fmt in ("%d-%m-%Y", "%Y-%m-%d"):
-                    try:
-                        data_evento = datetime.strptime(data_raw, fmt)
-                        break
-                    except ValueError:
-                        continue
-
-            # Se la data è valida e futura
-            if data_evento and data_evento >= oggi:
-                # FIX: Patch per evitare crash se mancano campi nel vecchio DB
-                if 'Invitati/Posti' not in ev:
-                    ev['Invitati/Posti'] = ev.get('n_persone', '0')
-
-                evento_privato = EventoPrivato(ev, ev)
-                break  # Trovato il più vicino, usciamo!
-
-        except Exception as e:
-            continue  # Ignora silenziosamente eventi rotti
+    if evento_privato_data:
+        # FIX: Patch per evitare crash se mancano campi nel vecchio DB
+        if 'Invitati/Posti' not in evento_privato_data:
+            evento_privato_data['Invitati/Posti'] = evento_privato_data.get('n_persone', '0')
+        evento_privato = EventoPrivato(evento_privato_data, evento_privato_data)
 
     # --- 2. EVENTI PUBBLICI ---
     eventi_pubblici_cursor = db['Evento'].find({
         "Ruolo": "1",
-        "isPagato": True
-    }).sort("Data", 1)
+        "isPagato": True,
+        "Data": {"$gte": oggi}
+    }, campi_evento).sort("Data", 1).limit(4)
 
     eventi_pubblici = []
-
     for ev in eventi_pubblici_cursor:
-        if len(eventi_pubblici) >= 4:
-            break
-
-        try:
-            data_raw = ev.get("Data")
-            data_evento = None
-
-            if isinstance(data_raw, datetime):
-                data_evento = data_raw
-            elif isinstance(data_raw, str):
-                for fmt in ("%d-%m-%Y", "%Y-%m-%d"):
-                    try:
-                        data_evento = datetime.strptime(data_raw, fmt)
-                        break
-                    except ValueError:
-                        continue
-
-            if data_evento and data_evento >= oggi:
-                # FIX CRITICO: Aggiungiamo la chiave mancante al volo!
-                if 'Invitati/Posti' not in ev:
-                    # Se manca, prova a prendere 'BigliettiDisponibili' o metti '0'
-                    ev['Invitati/Posti'] = ev.get('BigliettiDisponibili', ev.get('n_persone', '0'))
-
-                # Ora la creazione dell'oggetto non fallirà più
-                eventi_pubblici.append(EventoPubblico(ev, ev))
-
-        except Exception as e:
-            # Se proprio l'evento è irrecuperabile, lo saltiamo senza intasare i log
-            continue
+        # FIX CRITICO: Aggiungiamo la chiave mancante al volo!
+        if 'Invitati/Posti' not in ev:
+            # Se manca, prova a prendere 'BigliettiDisponibili' o metti '0'
+            ev['Invitati/Posti'] = ev.get('BigliettiDisponibili', ev.get('n_persone', '0'))
+        eventi_pubblici.append(EventoPubblico(ev, ev))
 
     return evento_privato, eventi_pubblici
 
 def get_utente_by_email(email):
-    user_data = db.Utente.find_one({'email': email})
+    db = get_db()
+    user_data = db.Utente.find_one({'email': email}, proiezione('Utente'))
     user = Fornitore(user_data, user_data)
     return user
+
+
+def get_principale(id_utente):
+    """
+    Restituisce l'utente autenticato usato da Flask-Login, leggendolo dal database solo se non è già in cache.
+    Solo organizzatori e fornitori possono avere una sessione.
+
+    :param id_utente: (str) id dell'utente
+
+    :return: Principale dell'utente, None se l'utente non esiste o non è un organizzatore o un fornitore
+    """
+    principale = _cache_principali.get(id_utente)
+    if principale is None:
+        db = get_db()
+        user_data = db.Utente.find_one({'_id': ObjectId(id_utente)}, proiezione('Utente', PRINCIPALE))
+        if not user_data or user_data['Ruolo'] not in ("2", "3"):
+            return None
+        principale = Principale(user_data)
+        _cache_principali.set(id_utente, principale)
+    return principale
+
+
+def invalida_principale(id_utente):
+    """
+    Elimina dalla cache l'utente autenticato, da chiamare quando il suo profilo cambia o quando esce.
+
+    :param id_utente: (str) id dell'utente
+    """
+    _cache_principali.invalida(id_utente)
+
+
+def get_statistiche_cache_principali():
+    return _cache_principali.statistiche()
@@ -0,0 +1,85 @@
+"""
+Comandi di manutenzione richiamabili da terminale con 'flask --app BEvent_app <comando>'.
+"""
+import click
+
+
+def registra_comandi(app):
+    """
+    Registra i comandi di manutenzione sull'applicazione Flask.
+
+    :param app: applicazione Flask
+    """
+
+    @app.cli.command('migra-media')
+    def migra_media():
+        """Sposta le immagini salvate nei documenti nell'archivio media (GridFS)."""
+        from .Media.MediaService import migra_immagini, genera_varianti_mancanti
+        migrati = migra_immagini()
+        for collezione, numero in migrati.items():
+            click.echo(f"{collezione}: {numero} documenti migrati")
+        click.echo(f"Varianti generate per {genera_varianti_mancanti()} immagini")
+
+    @app.cli.command('genera-varianti')
+    def genera_varianti():
+        """Genera le varianti ridotte delle immagini dell'archivio media che non le hanno."""
+        from .Media.MediaService import genera_varianti_mancanti
+        click.echo(f"Varianti generate per {genera_varianti_mancanti()} immagini")
+
+    @app.cli.command('migra-date')
+    def migra_date():
+        """Converte le date di eventi e biglietti salvate come stringa in datetime."""
+        from .GestioneEvento.GestioneEventoService import migra_date_eventi
+        for campo, conteggi in migra_date_eventi().items():
+            click.echo(f"{campo}: {conteggi['convertiti']} date convertite, {conteggi['non_validi']} non valide")
+
+    @app.cli.command('migra-numeri')
+    def migra_numeri():
+        """Converte prezzi, posti e quantità salvati come stringa in numeri."""
+        from .GestioneEvento.GestioneEventoService import migra_campi_numerici
+        for campo, conteggi in migra_campi_numerici().items():
+            click.echo(f"{campo}: {conteggi['convertiti']} valori convertiti, {conteggi['non_validi']} non validi")
+
+    @app.cli.command('ricostruisci-prenotazioni')
+    def ricostruisci_prenotazioni():
+        """Ricalcola dagli eventi pagati i contatori delle prenotazioni giornaliere dei fornitori."""
+        from .GestioneEvento.PrenotazioniFornitori import ricostruisci_prenotazioni as ricostruisci
+        click.echo(f"{ricostruisci()} contatori (fornitore, giorno) ricostruiti")
+
+    @app.cli.command('rilascia-biglietti')
+    def rilascia_biglietti():
+        """Restituisce agli eventi i biglietti delle prenotazioni scadute."""
+        from .GestioneEvento.PrenotazioniBiglietti import rilascia_prenotazioni_scadute
+        click.echo(f"{rilascia_prenotazioni_scadute()} prenotazioni scadute rilasciate")
+
+    @app.cli.command('invia-notifiche')
+    @click.option('--continua', is_flag=True, help="Resta attivo e consegna le notifiche man mano che arrivano.")
+    def invia_notifiche(continua):
+        """Consegna le notifiche email in attesa nella outbox."""
+        from .Notifiche.NotificheService import consegna_notifiche, WorkerNotifiche
+        if continua:
+            worker = WorkerNotifiche(app.logger)
+            worker.start()
+            try:
+                while worker.is_alive():
+                    worker.join(1)
+            except KeyboardInterrupt:
+                worker.ferma()
+            return
+        esito = consegna_notifiche()
+        click.echo(f"{esito['inviate']} inviate, {esito['ritentate']} da ritentare, {esito['fallite']} fallite")
+
+    @app.cli.command('indici')
+    @click.option('--verifica', is_flag=True, help="Riporta gli indici mancanti, non dichiarati e inutilizzati.")
+    def indici(verifica):
+        """Crea gli indici dichiarati che mancano nel database."""
+        from .InterfacciaPersistenza.Indici import assicura_indici, verifica_indici
+        if verifica:
+            for collezione, stato in verifica_indici().items():
+                click.echo(f"{collezione}: mancanti {stato['mancanti']}, non dichiarati {stato['non_dichiarati']}, "
+                           f"inutilizzati {stato['inutilizzati']}")
+            return
+        for collezione, stato in assicura_indici().items():
+            click.echo(f"{collezione}: creati {stato['creati']}")
+            for conflitto in stato['conflitti']:
+                click.echo(f"{collezione}: conflitto {conflitto}", err=True)
@@ -4,8 +4,6 @@ from ..InterfacciaPersistenza.Recensione import Recensione
 from bson import ObjectId
 import re
 
-db = get_db()
-
 
 def get_recensioni_associate_a_servizi(servizi):
     """
@@ -15,6 +13,7 @@ def get_recensioni_associate_a_servizi(servizi):
     Returns: lista di recensioni associate ai servizi specificati
     """
 
+    db = get_db()
     lista_id = [servizio._id for servizio in servizi]
 
     recensioni_data = list(db['Recensione'].find({'id_valutato': {'$in': lista_id}}))
@@ -45,6 +44,7 @@ def recensione_serializer(recensione):
 
 
 def inserisci_recensione(id_valutato, id_valutante, voto, titolo, descrizione):
+    db = get_db()
     if not isinstance(descrizione, str) or not len(descrizione) <= 100:
         flash("La descrizione della recensione è troppo lunga!", "error")
         return False
@@ -58,8 +58,8 @@ def inserisci_recensione(id_valutato, id_valutante, voto, titolo, descrizione):
         recensioni = db["Recensione"]
         utenti = db["Utente"]
         servizi = db["Servizio Offerto"]
-        utente_data = utenti.find_one({"_id": ObjectId(id_valutante)})
-        servizio_data = servizi.find_one({"_id": ObjectId(id_valutato)})
+        utente_data = utenti.find_one({"_id": ObjectId(id_valutante)}, {"nome_utente": 1})
+        servizio_data = servizi.find_one({"_id": ObjectId(id_valutato)}, {"Tipo": 1})
         recensioni_data = {
             "id_valutato": str(id_valutato),
             "id_valutante": id_valutante,
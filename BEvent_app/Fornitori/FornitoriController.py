@@ -1,9 +1,9 @@
-from flask import Blueprint, request, session
+from flask import Blueprint, request, session, flash
 from flask_login import login_required
 from .FornitoriService import get_dati_fornitore, get_tutti_servizi_byfornitore, aggiorna_foto_fornitore, \
     aggiungi_servizio, modifica_servizio, elimina_servizio, get_eventi_by_fornitore_privato, \
     get_eventi_fornitore_pubblico, \
-    cancella_evento, get_dettagli_evento, get_dati_organizzatore, get_dati_servizi, invio_feed_back, sponsorizza
+    cancella_evento, invio_feed_back, sponsorizza
 from flask import redirect
 from ..Utils import Image
 from ..Routes import fornitore_page, visualizza_evento_dettagli_page
@@ -37,18 +37,9 @@ def aggiungi_foto_fornitore_controller():
     files = request.files.getlist('foto')
     id_fornitore = session['id']
 
-    byte_arrays = []
+    immagini = Image.elabora_immagini([file.read() for file in files])
 
-    for file in files:
-
-        content = file.read()
-
-        byte_array = Image.convert_image_to_byte_array(content)
-        byte_arrays.append(byte_array)
-
-    byte_arrays_bytes = [bytes(byte_array) for byte_array in byte_arrays]
-
-    aggiorna_foto_fornitore(id_fornitore, byte_arrays_bytes)
+    aggiorna_foto_fornitore(id_fornitore, immagini)
 
     return redirect('/fornitori')
 
@@ -97,16 +88,7 @@ def aggiungi_servizio_controller():
     """
     files = request.files.getlist('photos')
     fornitore_associato = session['id']
-    byte_arrays = []
-
-    for file in files:
-
-        content = file.read()
-
-        byte_array = Image.convert_image_to_byte_array(content)
-        byte_arrays.append(byte_array)
-
-    byte_arrays_bytes = [bytes(byte_array) for byte_array in byte_arrays]
+    immagini = Image.elabora_immagini([file.read() for file in files])
     descrizione = request.form.get("descrizione")
     tipo = request.form.get("tipo")
     prezzo = request.form.get("prezzo")
@@ -114,7 +96,7 @@ def aggiungi_servizio_controller():
         "Descrizione": descrizione,
         "Tipo": tipo,
         "Prezzo": prezzo,
-        "FotoServizio": byte_arrays_bytes,
+        "FotoServizio": immagini,
         "fornitore_associato": fornitore_associato,
         "isDeleted": False,
         "isCurrentVersion": None
@@ -146,11 +128,15 @@ def visualizza_evento_dettagli_controller():
     :return: reindirizza alla pagina dettagli dell'evento
 
     """
+    from ..GestioneEvento.GestioneEventoService import get_dettagli_evento_con_servizi
     id = request.form.get("id")
-    evento = get_dettagli_evento(id)
-    organizzatore = get_dati_organizzatore(id)
-    servizi = get_dati_servizi(id, session["id"])
-    return visualizza_evento_dettagli_page(evento=evento, organizzatore=organizzatore, servizi=servizi)
+    dettagli = get_dettagli_evento_con_servizi(id, session["id"])
+    if dettagli.evento:
+        flash("nessun dettaglio", category="success")
+    else:
+        flash("ok", "warning")
+    return visualizza_evento_dettagli_page(evento=dettagli.evento, organizzatore=dettagli.organizzatore,
+                                           servizi=dettagli.servizi)
 
 
 @Fornitori.route('/invio_Feedback', methods=['POST'])
@@ -176,5 +162,9 @@ def sponsorizza_evento():
 
     """
     id_evento = request.form.get("id_evento")
-    sponsorizza(id_evento)
+    if sponsorizza(id_evento):
+        flash("L'evento è stato sponsorizzato", "success")
+    else:
+        flash("L'evento non può essere sponsorizzato: è già sponsorizzato oppure un fornitore non è più "
+              "disponibile in quella data", "error")
     return redirect("/fornitori")
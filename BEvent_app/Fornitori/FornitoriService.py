@@ -3,6 +3,11 @@ from flask import flash
 from ..db import get_db
 from ..InterfacciaPersistenza import ServizioOfferto
 from ..InterfacciaPersistenza import Organizzatore
+from ..InterfacciaPersistenza.Proiezioni import proiezione
+from ..Media.MediaService import salva_immagini, elimina_media
+from ..Utils.Conversioni import converti_intero, converti_prezzo
+from ..GestioneEvento.IndiceFornitori import aggiorna_servizio
+from ..GestioneEvento.PrenotazioniFornitori import registra_prenotazioni, annulla_prenotazioni
 
 
 def is_valid_number(value):
@@ -53,7 +58,8 @@ def get_tutti_servizi_byfornitore(id_fornitore):
     db = get_db()
     servizi_collection = db['Servizio Offerto']
     servizi_data = list(servizi_collection.find(
-        {'fornitore_associato': id_fornitore, 'isCurrentVersion': {'$in': [None, '']}, 'isDeleted': False}))
+        {'fornitore_associato': id_fornitore, 'isCurrentVersion': {'$in': [None, '']}, 'isDeleted': False},
+        proiezione('Servizio Offerto')))
 
     lista_servizi = []
 
@@ -74,26 +80,32 @@ def get_dati_fornitore(id_fornitore):
     """
     from ..InterfacciaPersistenza.Fornitore import Fornitore
     db = get_db()
-    user_data = db['Utente'].find_one({"_id": ObjectId(id_fornitore)})
+    user_data = db['Utente'].find_one({"_id": ObjectId(id_fornitore)}, proiezione('Utente'))
     fornitore = Fornitore(user_data, user_data)
     return fornitore
 
 
 def aggiorna_foto_fornitore(id_fornitore, byte_arrays_bytes):
     """
-    serve ad aggiornare le foto di un dato fornitore
+    serve ad aggiornare le foto di un dato fornitore, salvandole nell'archivio media e aggiungendo i loro id al
+    fornitore
     :param id_fornitore: (str) id del fornitore
-    :param byte_arrays_bytes: (byte_array) Array di byte che rappresentano le foto di un fornitore
+    :param byte_arrays_bytes: (list) foto del fornitore, elaborate con Utils.Image.elabora_immagini
     :return: messaggio di successo in caso di riuscito inseromento al contrario messaggio di errore
     """
+    from ..GestioneEvento.GestioneEventoService import invalida_disponibilita
     db = get_db()
     collection = db['Utente']
     try:
 
+        from ..Autenticazione.AutenticazioneService import invalida_principale
+        id_foto = salva_immagini(byte_arrays_bytes)
         result = collection.update_one(
             {"_id": ObjectId(id_fornitore)},
-            {"$push": {"Fornitore.Foto": {"$each": byte_arrays_bytes}}}
+            {"$push": {"Fornitore.FotoIds": {"$each": id_foto}}}
         )
+        invalida_principale(id_fornitore)
+        invalida_disponibilita()
         if result.modified_count > 0:
             return "Foto aggiornata con successo"
         else:
@@ -111,6 +123,7 @@ def elimina_servizio(servizio_id):
 
     :return:
     """
+    from ..GestioneEvento.GestioneEventoService import invalida_disponibilita
     db = get_db()
     servizi_collection = db['Servizio Offerto']
     eventi_collection = db['Evento']
@@ -118,15 +131,35 @@ def elimina_servizio(servizio_id):
     evento_associato = eventi_collection.find_one({
         "servizi_associati": servizio_id,
         "isPagato": True
-    })
+    }, {'_id': 1})
     if evento_associato:
         result = servizi_collection.update_one(
             {"_id": ObjectId(servizio_id)},
             {"$set": {"isDeleted": True}}
         )
+        aggiorna_servizio(servizio_id)
+        invalida_disponibilita()
         return result
     else:
         servizi_collection.delete_one({"_id": ObjectId(servizio_id)})
+        aggiorna_servizio(servizio_id)
+        invalida_disponibilita()
+
+
+def _converti_campi_numerici_servizio(dati_servizio):
+    """
+    Restituisce una copia dei dati del servizio con prezzo e quantità convertiti nei tipi numerici salvati nel
+    database (None se mancano o non sono validi, così da non sovrascrivere il valore corrente in una modifica).
+
+    :param dati_servizio: (dict) dizionario con i dati del servizio
+    :return: copia del dizionario con i campi numerici convertiti
+    """
+    documento = dict(dati_servizio)
+    if 'Prezzo' in documento:
+        documento['Prezzo'] = converti_prezzo(documento['Prezzo'])
+    if 'Quantità' in documento:
+        documento['Quantità'] = converti_intero(documento['Quantità'])
+    return documento
 
 
 def modifica_servizio(nuovi_dati, servizio_id):
@@ -141,14 +174,16 @@ def modifica_servizio(nuovi_dati, servizio_id):
 
     :return: restituisce l'id del servizio modificato
     """
+    from ..GestioneEvento.GestioneEventoService import invalida_disponibilita
     db = get_db()
     servizi_collection = db['Servizio Offerto']
     eventi_collection = db['Evento']
+    nuovi_dati = _converti_campi_numerici_servizio(nuovi_dati)
 
     evento_associato = eventi_collection.find_one({
         "servizi_associati": servizio_id,
         "isPagato": True
-    })
+    }, {'_id': 1})
 
     if evento_associato:
 
@@ -170,12 +205,15 @@ def modifica_servizio(nuovi_dati, servizio_id):
                 {"_id": ObjectId(servizio_id)},
                 {"$set": {"isCurrentVersion": nuovo_servizio_id}}
             )
+            aggiorna_servizio(servizio_id)
+            aggiorna_servizio(nuovo_servizio_id)
+            invalida_disponibilita()
 
             return nuovo_servizio_id
 
     else:
 
-        servizio_corrente = servizi_collection.find_one({"_id": ObjectId(servizio_id)})
+        servizio_corrente = servizi_collection.find_one({"_id": ObjectId(servizio_id)}, {'_id': 1})
 
         if servizio_corrente:
             campi_da_modificare = {k: v for k, v in nuovi_dati.items() if v is not None}
@@ -183,6 +221,8 @@ def modifica_servizio(nuovi_dati, servizio_id):
                 {"_id": ObjectId(servizio_id)},
                 {"$set": campi_da_modificare}
             )
+            aggiorna_servizio(servizio_id)
+            invalida_disponibilita()
 
             return servizio_id
 
@@ -191,14 +231,20 @@ def modifica_servizio(nuovi_dati, servizio_id):
 
 def aggiungi_servizio(nuovi_dati):
     """
-    Aggiunge al database un servizio se quest'ultimo è valido
+    Aggiunge al database un servizio se quest'ultimo è valido. Le foto in 'FotoServizio' vengono salvate nell'archivio
+    media e nel documento restano solo i loro id ('FotoServizioIds').
     :param nuovi_dati: (dict) dizionario con tutti  i dati relativi al servizio
     :return: True se il servizio è stato inserito, false se quest'ultimo non è stato inserito
     """
+    from ..GestioneEvento.GestioneEventoService import invalida_disponibilita
     result = validate_servizio_data(nuovi_dati['Descrizione'], nuovi_dati['Tipo'], nuovi_dati['Prezzo'])
     if result:
         db = get_db()
-        db['Servizio Offerto'].insert_one(nuovi_dati)
+        documento = _converti_campi_numerici_servizio(nuovi_dati)
+        documento['FotoServizioIds'] = salva_immagini(documento.pop('FotoServizio', None) or [])
+        risultato = db['Servizio Offerto'].insert_one(documento)
+        aggiorna_servizio(risultato.inserted_id)
+        invalida_disponibilita()
         return True
     else:
         return False
@@ -213,7 +259,7 @@ def get_eventi_by_fornitore_privato(id):
     from ..InterfacciaPersistenza import EventoPrivato
     db = get_db()
     eventi = db['Evento']
-    eventi_fornitore_privati = eventi.find({"fornitori_associati": id, "Ruolo": "2"})
+    eventi_fornitore_privati = eventi.find({"fornitori_associati": id, "Ruolo": "2"}, proiezione('Evento'))
 
     lista_eventi_fornitore = []
     for evento_fornitore in eventi_fornitore_privati:
@@ -232,7 +278,7 @@ def get_eventi_fornitore_pubblico(id):
     from ..InterfacciaPersistenza import EventoPubblico
     db = get_db()
     eventi = db['Evento']
-    eventi_fornitore_pubblico = eventi.find({"fornitori_associati": id, "Ruolo": "1"})
+    eventi_fornitore_pubblico = eventi.find({"fornitori_associati": id, "Ruolo": "1"}, proiezione('Evento'))
 
     lista_eventi_fornitore = []
     for evento_fornitore in eventi_fornitore_pubblico:
@@ -247,9 +293,19 @@ def cancella_evento(id):
     Cancella un evento Pubblico in base all'id dell'evento
     :param id: (str) id dell'evento
     """
+    from ..RicercaEvento.RicercaEventoService import invalida_catalogo
+    from ..GestioneEvento.GestioneEventoService import invalida_disponibilita
     db = get_db()
     eventi = db['Evento']
-    eventi.delete_one({"_id": ObjectId(id)})
+    evento = eventi.find_one_and_delete({"_id": ObjectId(id)},
+                                        projection={'LocandinaId': 1, 'Data': 1, 'isPagato': 1,
+                                                    'fornitori_associati': 1})
+    if evento and evento.get('LocandinaId'):
+        elimina_media(evento['LocandinaId'])
+    invalida_catalogo()
+    if evento:
+        annulla_prenotazioni(evento)
+        invalida_disponibilita(evento.get('Data'))
 
 
 def get_dettagli_evento(id):
@@ -262,7 +318,7 @@ def get_dettagli_evento(id):
     db = get_db()
     eventi = db['Evento']
     evento_data = eventi.find_one({"_id": ObjectId(id),
-                                   "Ruolo": "2"})
+                                   "Ruolo": "2"}, proiezione('Evento'))
     if evento_data:
         evento = EventoPrivato.EventoPrivato(evento_data, evento_data)
         flash("nessun dettaglio", category="success")
@@ -281,10 +337,10 @@ def get_dati_organizzatore(id):
     from ..InterfacciaPersistenza import EventoPrivato
     db = get_db()
     eventi = db['Evento']
-    evento_data = eventi.find_one({"_id": ObjectId(id)})
+    evento_data = eventi.find_one({"_id": ObjectId(id)}, proiezione('Evento'))
     evento = EventoPrivato.EventoPrivato(evento_data, evento_data)
     utenti = db['Utente']
-    utenti_data = utenti.find_one({"_id": ObjectId(evento.organizzatore)})
+    utenti_data = utenti.find_one({"_id": ObjectId(evento.organizzatore)}, proiezione('Utente'))
     organizzatore = Organizzatore.Organizzatore(utenti_data, utenti_data)
     return organizzatore
 
@@ -292,23 +348,13 @@ def get_dati_organizzatore(id):
 def get_dati_servizi(id, id_fornitore):
     """
     serve a vedere tutti i dettagli dei servizi offerti impiegati in un determinato evento escludendo i servizi di un
-    fornitore( ovvero quello che ha richiesto questa funzione) :param id: (str) id dell'evento :param id_fornitore: (
-    str) id del fornitore da escludere dalla ricerca :return: organizzatore ricercato
+    fornitore( ovvero quello che ha richiesto questa funzione); i servizi vengono letti con una sola aggregazione
+    :param id: (str) id dell'evento
+    :param id_fornitore: (str) id del fornitore da escludere dalla ricerca
+    :return: lista dei servizi dell'evento
     """
-    from ..InterfacciaPersistenza import EventoPrivato
-    db = get_db()
-    eventi = db['Evento']
-
-    evento_data = eventi.find_one({"_id": ObjectId(id)})
-    evento = EventoPrivato.EventoPrivato(evento_data, evento_data)
-    servizi_lista = []
-    for servizi in evento.servizi_associati:
-        servizio_data = db['Servizio Offerto'].find_one({"_id": ObjectId(servizi)})
-
-        if not (servizio_data and ObjectId(servizio_data["fornitore_associato"]) == ObjectId(id_fornitore)):
-            servizi_lista.append(servizio_data)
-
-    return servizi_lista
+    from ..GestioneEvento.GestioneEventoService import get_dettagli_evento_con_servizi
+    return get_dettagli_evento_con_servizi(id, id_fornitore).servizi
 
 
 def invio_feed_back(id_valutato, id_valutante, valutazione):
@@ -343,7 +389,7 @@ def get_fornitori(id_fornitori):
     from ..InterfacciaPersistenza.Fornitore import Fornitore
     db = get_db()
     lista_id = [ObjectId(id_str) for id_str in id_fornitori]
-    risultati = db['Utente'].find({'_id': {'$in': lista_id}})
+    risultati = db['Utente'].find({'_id': {'$in': lista_id}}, proiezione('Utente'))
 
     lista_fornitori = []
     for user_data in risultati:
@@ -354,15 +400,32 @@ def get_fornitori(id_fornitori):
 
 def sponsorizza(id_evento):
     """
-       Imposta lo stato di pagamento di un evento da sponsorizzare come pagato.
+       Imposta lo stato di pagamento di un evento da sponsorizzare come pagato. L'evento viene contato nelle
+       prenotazioni giornaliere dei suoi fornitori; se uno di loro ha già raggiunto il limite la sponsorizzazione
+       viene annullata.
 
        :param id_evento: str
            L'ID univoco dell'evento da sponsorizzare.
 
+       :return: True se l'evento è stato sponsorizzato, False se non esiste, è già sponsorizzato o uno dei fornitori
+           non è più disponibile
+
        """
+    from ..RicercaEvento.RicercaEventoService import invalida_catalogo
+    from ..GestioneEvento.GestioneEventoService import invalida_disponibilita
     db = get_db()
     eventi = db['Evento']
-    eventi.update_one(
-        {"_id": ObjectId(id_evento)},
-        {"$set": {"isPagato": True}}
+    # solo un evento non ancora pagato viene contato nelle prenotazioni dei suoi fornitori
+    evento = eventi.find_one_and_update(
+        {"_id": ObjectId(id_evento), "isPagato": {"$ne": True}},
+        {"$set": {"isPagato": True}},
+        projection={'Data': 1, 'fornitori_associati': 1}
     )
+    if evento is None:
+        return False
+    sponsorizzato = registra_prenotazioni({**evento, 'isPagato': True})
+    if not sponsorizzato:
+        eventi.update_one({"_id": evento['_id'], "isPagato": True}, {"$set": {"isPagato": False}})
+    invalida_catalogo()
+    invalida_disponibilita(evento.get('Data'))
+    return sponsorizzato
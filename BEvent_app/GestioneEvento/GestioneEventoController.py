@@ -5,7 +5,7 @@ from flask import request, Blueprint, session, flash, jsonify, make_response, re
 from flask_login import login_required
 from BEvent_app.FeedBack import FeedBackService
 from BEvent_app.Fornitori import FornitoriService
-from BEvent_app.GestioneEvento import GestioneEventoService
+from BEvent_app.GestioneEvento import GestioneEventoService, PrenotazioniBiglietti
 from BEvent_app.Routes import scelta_evento_da_creare_page, sceltafornitori_page, riepilogo_scelte_page, \
     visualizza_evento_dettagli_organizzatore_page, crea_evento_pubblico_page
 from ..Utils import Image
@@ -48,16 +48,47 @@ def visualizza_fornitori():
     is_valid, messaggio = GestioneEventoService.is_valid_data(data)  # Nota: ho aggiunto lo spacchettamento
 
     if is_valid:
-        fornitori = GestioneEventoService.get_fornitori_disponibli(data_formattata)
-        servizi_non_filtrati = GestioneEventoService.get_servizi(data_formattata)
-        servizi_offerti = GestioneEventoService.filtrare_servizi_per_fornitore(servizi_non_filtrati, fornitori)
-        recensioni = FeedBackService.get_recensioni_associate_a_servizi(servizi_offerti)
+        # fornitori, servizi, recensioni e conteggi della barra laterale arrivano da un'unica aggregazione
+        disponibilita = GestioneEventoService.get_disponibilita(data_formattata)
 
-        return sceltafornitori_page(fornitori=fornitori, servizi=servizi_offerti, recensioni=recensioni)
+        return sceltafornitori_page(fornitori=list(disponibilita.fornitori), servizi=list(disponibilita.servizi),
+                                    recensioni=list(disponibilita.recensioni), faccette=disponibilita.faccette,
+                                    riepilogo_recensioni=disponibilita.riepilogo_recensioni)
     else:
         flash(messaggio)  # Uso il messaggio restituito dalla funzione
         return redirect(url_for('aut.home_organizzatore'))  # Meglio redirect che chiamare la pagina diretta
 
+
+@ge.route('/ricerca_fornitori', methods=['POST'])
+@login_required
+def ricerca_fornitori():
+    """
+    Serve a elaborare una richiesta in Ajax che combina tutti i filtri dei fornitori ('ricerca', 'categoria',
+    'regione', 'prezzo_min', 'prezzo_max', tutti opzionali) e restituisce in una sola risposta i fornitori e i servizi
+    disponibili nella data dell'evento e i conteggi di ogni filtro.
+
+    :return: Risposta in formato JSON che contiene due liste di oggetti: fornitori_filtrati (di tipo Fornitore) e
+    servizi_filtrati (di tipo Servizio Offerto) e i conteggi: faccette (categorie, regioni, prezzi)
+    """
+    try:
+        data = request.get_json() or {}
+
+        data_evento = session.get('data_evento')
+        if not data_evento:
+            return jsonify({"errore": "Sessione scaduta. Ricarica la pagina."}), 400
+
+        servizi_filtrati, fornitori_filtrati, faccette = GestioneEventoService.ricerca_fornitori_faccette(data,
+                                                                                                         data_evento)
+        return jsonify({
+            "servizi_filtrati": [GestioneEventoService.servizio_serializer(s) for s in servizi_filtrati],
+            "fornitori_filtrati": [GestioneEventoService.fornitore_serializer(f) for f in fornitori_filtrati],
+            "faccette": faccette
+        }), 200
+
+    except Exception as e:
+        return jsonify({"errore": str(e)}), 500
+
+
 @ge.route('/filtro_categoria', methods=['POST'])
 @login_required
 def filtro_categoria():
@@ -79,10 +110,8 @@ def filtro_categoria():
 
         if 'categoria' in data:
             if data['categoria'] == 'Annulla':
-                fornitori_filtrati = GestioneEventoService.get_fornitori_disponibli(data_evento)
-                servizi_non_filtrati = GestioneEventoService.get_servizi(data_evento)
-                servizi_filtrati = GestioneEventoService.filtrare_servizi_per_fornitore(servizi_non_filtrati,
-                                                                                        fornitori_filtrati)
+                disponibilita = GestioneEventoService.get_disponibilita(data_evento)
+                fornitori_filtrati, servizi_filtrati = disponibilita.fornitori, disponibilita.servizi
             else:
                 categoria = data['categoria']
                 servizi_filtrati, fornitori_filtrati = GestioneEventoService.filtro_categoria_liste(categoria,
@@ -131,10 +160,8 @@ def filtro_regione():
 
         if 'regione' in data:
             if data['regione'] == 'Annulla':
-                fornitori_filtrati = GestioneEventoService.get_fornitori_disponibli(data_evento)
-                servizi_non_filtrati = GestioneEventoService.get_servizi(data_evento)
-                servizi_filtrati = GestioneEventoService.filtrare_servizi_per_fornitore(servizi_non_filtrati,
-                                                                                        fornitori_filtrati)
+                disponibilita = GestioneEventoService.get_disponibilita(data_evento)
+                fornitori_filtrati, servizi_filtrati = disponibilita.fornitori, disponibilita.servizi
             else:
                 regione = data['regione']
                 servizi_filtrati, fornitori_filtrati = GestioneEventoService.filtro_regione_liste(regione, data_evento)
@@ -524,14 +551,13 @@ def crea_event_publico():
     :return: messaggio di successo
     """
     file = request.files.get('foto')
-    content = file.read()
-    foto_byte_array = Image.convert_image_to_byte_array(content)
+    immagini = Image.elabora_immagini([file.read()])
     fornitore = FornitoriService.get_dati_fornitore(session["id"])
     data_non_formattata = request.form.get('data')
     data = datetime.strptime(data_non_formattata, "%Y-%m-%d").strftime("%d-%m-%Y")
     n_persone = request.form.get('n_persone')
     descrizione = request.form.get('descrizione')
-    locandina = foto_byte_array
+    locandina = immagini[0] if immagini else None
     ruolo = '1'
     tipo = request.form.get('tipo')
     is_pagato = False
@@ -558,10 +584,55 @@ def acquista_biglietto_controller():
     id_evento = request.form.get('id')
     id_organizzatore = session["id"]
     numero_biglietti = request.form.get('quantita')
-    GestioneEventoService.acquista_biglietto(id_evento, id_organizzatore, numero_biglietti)
+    if GestioneEventoService.acquista_biglietto(id_evento, id_organizzatore, numero_biglietti):
+        flash("Acquisto completato", "success")
+    else:
+        flash("I biglietti richiesti non sono più disponibili", "error")
+    return redirect(url_for('aut.area_organizzatore'))
+
+
+@ge.route('/riserva_biglietti', methods=['POST'])
+@login_required
+def riserva_biglietti_controller():
+    """
+    Riserva per un tempo limitato i biglietti richiesti, da confermare con /conferma_biglietti
+
+    :return: json con l'id e la scadenza della prenotazione, oppure con l'errore
+    """
+    prenotazione = PrenotazioniBiglietti.riserva_biglietti(request.form.get('id'), session["id"],
+                                                           request.form.get('quantita'))
+    if prenotazione is None:
+        return jsonify({"errore": "I biglietti richiesti non sono più disponibili"}), 409
+    return jsonify({"prenotazione": prenotazione['id'], "scadenza": prenotazione['scadenza'].isoformat()}), 200
+
+
+@ge.route('/conferma_biglietti', methods=['POST'])
+@login_required
+def conferma_biglietti_controller():
+    """
+    Trasforma una prenotazione non ancora scaduta nei biglietti dell'utente
+
+    :return: redirect all'area organizzatore
+    """
+    if PrenotazioniBiglietti.conferma_prenotazione(request.form.get('prenotazione'), session["id"]):
+        flash("Acquisto completato", "success")
+    else:
+        flash("La prenotazione è scaduta", "error")
     return redirect(url_for('aut.area_organizzatore'))
 
 
+@ge.route('/annulla_biglietti', methods=['POST'])
+@login_required
+def annulla_biglietti_controller():
+    """
+    Annulla una prenotazione e restituisce i biglietti all'evento
+
+    :return: json con l'esito dell'annullamento
+    """
+    annullata = PrenotazioniBiglietti.annulla_prenotazione(request.form.get('prenotazione'), session["id"])
+    return jsonify({"annullata": annullata}), 200
+
+
 @ge.route('/Visuallizza_Dettagli_evento_Organizzatore', methods=['GET', 'POST'])
 @login_required
 def visualizza_evento_dettagli_controller():
@@ -571,9 +642,11 @@ def visualizza_evento_dettagli_controller():
     :return: dettagliEventoPrivato.html con i parametri evento (oggetto di tipo evento priavto), organizzatore(oggetto
     di tipo Organizzatore) e servizi (lista di oggetti di tipo servizio offerto)
     """
-    from ..Fornitori.FornitoriService import get_dettagli_evento, get_dati_organizzatore
     id = request.form.get("id")
-    evento = get_dettagli_evento(id)
-    organizzatore = get_dati_organizzatore(id)
-    servizi = GestioneEventoService.get_dati_servizi_organizzatore(id)
-    return visualizza_evento_dettagli_organizzatore_page(evento=evento, organizzatore=organizzatore, servizi=servizi)
+    dettagli = GestioneEventoService.get_dettagli_evento_con_servizi(id)
+    if dettagli.evento:
+        flash("nessun dettaglio", category="success")
+    else:
+        flash("ok", "warning")
+    return visualizza_evento_dettagli_organizzatore_page(evento=dettagli.evento, organizzatore=dettagli.organizzatore,
+                                                         servizi=dettagli.servizi)
@@ -1,14 +1,31 @@
 from datetime import datetime
 from bson import ObjectId
 from flask import flash
+from pymongo import UpdateOne
 import re
 from ..InterfacciaPersistenza import ServizioOfferto
 from ..InterfacciaPersistenza.EventoPrivato import EventoPrivato
 from ..db import get_db
 from ..InterfacciaPersistenza.Fornitore import Fornitore
+from ..InterfacciaPersistenza.Organizzatore import Organizzatore
 from ..InterfacciaPersistenza.ServizioOfferto import ServizioOfferto
-
-db = get_db()
+from ..InterfacciaPersistenza.Recensione import Recensione
+from ..InterfacciaPersistenza.Proiezioni import proiezione
+from ..Media.MediaService import salva_immagini, elimina_media
+from ..Utils.Image import url_variante
+from ..Utils.Cache import CacheTTL
+from .IndiceFornitori import cerca_fornitori
+from .PrenotazioniFornitori import COLLEZIONE_PRENOTAZIONI, registra_prenotazioni, annulla_prenotazioni
+from ..RicercaEvento.RicercaEventoService import invalida_catalogo
+from ..Utils.Faccette import valore_filtro, conteggi, conteggi_prezzo, raggruppa, raggruppa_prezzi
+from ..Utils.Conversioni import converti_data, intervallo_giorno, converti_intero, converti_prezzo, \
+    intervallo_numerico, nell_intervallo
+
+# Fornitori e servizi prenotabili in ogni data, condivisi tra le richieste e gli utenti che stanno creando un evento
+# per quella data. Una data viene invalidata quando un evento in quella data viene salvato, sponsorizzato o eliminato,
+# tutte le date quando cambiano i servizi o i fornitori; la durata limita quanto restano visibili le modifiche fatte da
+# altri worker.
+_cache_disponibilita = CacheTTL(dimensione_massima=64, durata=120)
 
 
 def is_valid_data(data):
@@ -47,43 +64,40 @@ def is_valid_data(data):
         return False, "La data è precedente alla data odierna."
 
 
-def get_fornitori_disponibli(data_richiesta):
+def _fasi_fornitori_disponibili(data_richiesta, id_fornitori=None):
     """
-    Funzione che ottiene tutti i fornitori che sono disponibili in una determinata data, prendendola dal database.
-    Usa una pipeline per verificare quali sono disponibili.
+    Fasi dell'aggregazione sulla collezione Utente che tengono solo i fornitori disponibili nella data indicata: per
+    ogni fornitore il numero di eventi già prenotati nel giorno viene letto dai contatori di supplier_day_bookings (una
+    lettura sull'indice per fornitore) e confrontato con EventiMassimiGiornaliero.
 
     :param data_richiesta: (str) stringa che indica la data in cui si vuole creare un evento
-    :return: lista di oggetti di tipo Fornitore, ovvero i fornitori disponibli
+    :param id_fornitori: (list) se indicata, limita la verifica ai fornitori con questi id
     """
-
-    pipeline = [
-        {"$match": {"Ruolo": "3"}},
+    inizio_giorno, _ = intervallo_giorno(data_richiesta)
+    filtro_fornitori = {"Ruolo": "3"}
+    if id_fornitori is not None:
+        filtro_fornitori["_id"] = {"$in": [ObjectId(id_fornitore) for id_fornitore in id_fornitori]}
+    return [
+        {"$match": filtro_fornitori},
         {
             "$lookup": {
-                "from": "Evento",
+                "from": COLLEZIONE_PRENOTAZIONI,
                 "let": {"fornitore_id_str": {"$toString": "$_id"}},
                 "pipeline": [
-                    {
-                        "$unwind": "$Evento.fornitori_associati"
-                    },
                     {
                         "$match": {
-                            "$expr": {
-                                "$and": [
-                                    {"$eq": ["$$fornitore_id_str", "$Evento.fornitori_associati"]},
-                                    {"$eq": ["$Evento.Data", data_richiesta]},
-                                    {"$eq": ["$Evento.isPagato", True]}
-                                ]
-                            }
+                            "data": inizio_giorno,
+                            "$expr": {"$eq": ["$fornitore", "$$fornitore_id_str"]}
                         }
-                    }
+                    },
+                    {"$project": {"_id": 0, "prenotazioni": 1}}
                 ],
-                "as": "eventi_associati"
+                "as": "prenotazioni_giorno"
             }
         },
         {
             "$addFields": {
-                "eventiPrenotati": {"$size": "$eventi_associati"},
+                "eventiPrenotati": {"$sum": "$prenotazioni_giorno.prenotazioni"},
                 "EventiMassimiGiornaliero": "$Fornitore.EventiMassimiGiornaliero"
             }
         },
@@ -94,6 +108,20 @@ def get_fornitori_disponibli(data_richiesta):
         }
     ]
 
+
+def get_fornitori_disponibli(data_richiesta, id_fornitori=None):
+    """
+    Funzione che ottiene tutti i fornitori che sono disponibili in una determinata data, prendendola dal database.
+    Usa una pipeline per verificare quali sono disponibili (_fasi_fornitori_disponibili).
+
+    :param data_richiesta: (str) stringa che indica la data in cui si vuole creare un evento
+    :param id_fornitori: (list) se indicata, limita la verifica ai fornitori con questi id
+    :return: lista di oggetti di tipo Fornitore, ovvero i fornitori disponibli
+    """
+
+    db = get_db()
+    pipeline = _fasi_fornitori_disponibili(data_richiesta, id_fornitori) + [{"$project": proiezione('Utente')}]
+
     fornitori_disponibili = list(db.Utente.aggregate(pipeline))
     lista_fornitori = []
 
@@ -104,7 +132,42 @@ def get_fornitori_disponibli(data_richiesta):
     return lista_fornitori
 
 
-def get_servizi(data_richiesta):
+def get_id_servizi_occupati(data_richiesta, id_servizi=None):
+    """
+    Restituisce gli id dei servizi già prenotati in un evento nella data indicata (eventi pubblici ed eventi privati
+    pagati).
+
+    :param data_richiesta: (str) stringa che indica la data in cui si vuole creare un evento
+    :param id_servizi: (list) se indicata, verifica solo questi servizi (con l'indice su servizi_associati)
+    :return: insieme degli id (str) dei servizi occupati
+    """
+    db = get_db()
+    inizio_giorno, fine_giorno = intervallo_giorno(data_richiesta)
+
+    filtro = {
+        'Data': {'$gte': inizio_giorno, '$lt': fine_giorno},
+        '$or': [
+            {'Ruolo': '2', 'isPagato': True}, # Privato e Pagato
+            {'Ruolo': '1'}                    # Pubblico
+        ]
+    }
+    if id_servizi is not None:
+        # gli id dei servizi associati agli eventi possono essere salvati come stringa o come ObjectId
+        filtro['servizi_associati'] = {'$in': [*id_servizi, *[ObjectId(id_servizio) for id_servizio in id_servizi
+                                                             if ObjectId.is_valid(id_servizio)]]}
+    # Prendi solo il campo che serve (ottimizzazione)
+    eventi_impedienti = db['Evento'].find(filtro, {'servizi_associati': 1})
+
+    id_servizi_occupati = set()
+    for evento in eventi_impedienti:
+        for id_servizio in evento.get('servizi_associati') or []:
+            id_servizi_occupati.add(str(id_servizio))
+    if id_servizi is not None:
+        id_servizi_occupati &= set(id_servizi)
+    return id_servizi_occupati
+
+
+def get_servizi(data_richiesta, filtro=None):
     """
        Funzione che ottiene dal database tutti i servizi che si possono prenotare in una determinata data, poichè alcuni
        potrebbero essere impegnati in un evento.
@@ -115,35 +178,24 @@ def get_servizi(data_richiesta):
        che non sono prenotati in un evento nella data inserita dall'organizzatore.
 
        :param data_richiesta: (str) stringa che indica la data in cui si vuole creare un evento
+       :param filtro: (dict) condizioni aggiuntive sui servizi, ad esempio l'intervallo di prezzo
 
        :return: lista di oggetti di tipo Servizio Offerto, ovvero i servizi disponibli
        """
     """
     Versione OTTIMIZZATA: Fa solo 2 query al database invece di N query.
     """
+    db = get_db()
     servizi_collection = db['Servizio Offerto']
-    eventi_collection = db['Evento']
 
     # 1. Recupera TUTTI i servizi validi in un colpo solo
     servizi_data = list(servizi_collection.find({
-        '$or': [{'isCurrentVersion': None}, {'isCurrentVersion': {'$exists': False}}]
-    }))
+        '$or': [{'isCurrentVersion': None}, {'isCurrentVersion': {'$exists': False}}],
+        **(filtro or {})
+    }, proiezione('Servizio Offerto')))
 
-    # 2. Recupera TUTTI gli eventi che potrebbero bloccare i servizi in quella data
-    eventi_impedienti = list(eventi_collection.find({
-        'Data': data_richiesta,
-        '$or': [
-            {'Ruolo': '2', 'isPagato': True}, # Privato e Pagato
-            {'Ruolo': '1'}                    # Pubblico
-        ]
-    }, {'servizi_associati': 1})) # Prendi solo il campo che serve (ottimizzazione)
-
-    # 3. Crea un "Set" (lista veloce) degli ID occupati
-    id_servizi_occupati = set()
-    for evento in eventi_impedienti:
-        if 'servizi_associati' in evento:
-            for id_servizio in evento['servizi_associati']:
-                id_servizi_occupati.add(str(id_servizio))
+    # 2-3. Crea un "Set" (lista veloce) degli ID dei servizi occupati in quella data
+    id_servizi_occupati = get_id_servizi_occupati(data_richiesta)
 
     # 4. Filtra i servizi in memoria (molto più veloce del DB)
     lista_servizi = []
@@ -156,10 +208,147 @@ def get_servizi(data_richiesta):
 
 
 
+class Disponibilita:
+    """
+    Fornitori e servizi prenotabili in una data, letti una volta sola dal database e condivisi tra le richieste: per
+    questo sono conservati in tuple, da cui i filtri costruiscono nuove liste.
+
+    Attributi:
+        fornitori (tuple): fornitori disponibili nella data (oggetti di tipo Fornitore).
+        servizi (tuple): servizi non ancora prenotati dei fornitori disponibili (oggetti di tipo Servizio Offerto).
+        recensioni (tuple): recensioni dei servizi (oggetti di tipo Recensione).
+        riepilogo_recensioni (dict): id del fornitore -> {'numero': recensioni dei suoi servizi, 'media': voto medio}.
+        faccette (dict): conteggi per categoria, regione e fascia di prezzo senza filtri (gli stessi di
+            ricerca_fornitori_faccette).
+    """
+
+    def __init__(self, fornitori, servizi, recensioni):
+        self.fornitori = tuple(fornitori)
+        self.servizi = tuple(servizi)
+        self.recensioni = tuple(recensioni)
+
+        fornitore_del_servizio = {servizio._id: servizio.fornitore_associato for servizio in self.servizi}
+        voti = {}
+        for recensione in self.recensioni:
+            voto = converti_intero(recensione.voto)
+            if voto is not None:
+                voti.setdefault(fornitore_del_servizio.get(recensione.valutato), []).append(voto)
+        self.riepilogo_recensioni = {id_fornitore: {'numero': len(voti_fornitore),
+                                                    'media': round(sum(voti_fornitore) / len(voti_fornitore), 1)}
+                                     for id_fornitore, voti_fornitore in voti.items()}
+
+        regione_del_fornitore = {fornitore.id: fornitore.regione for fornitore in self.fornitori}
+        self.faccette = {
+            'categorie': conteggi(raggruppa(servizio.tipo for servizio in self.servizi)),
+            'regioni': conteggi(raggruppa(regione_del_fornitore.get(id_fornitore)
+                                          for id_fornitore in set(fornitore_del_servizio.values()))),
+            'prezzi': conteggi_prezzo(raggruppa_prezzi(servizio.prezzo for servizio in self.servizi)),
+        }
+
+
+def get_disponibilita(data_richiesta):
+    """
+    Restituisce i fornitori e i servizi prenotabili nella data indicata, leggendoli dal database solo se non sono già
+    in cache. Tutti i filtri della pagina di scelta dei fornitori lavorano su questa fotografia.
+    I dati vengono letti con un'unica aggregazione sui fornitori disponibili (_fasi_fornitori_disponibili), che
+    restituisce ogni fornitore con i suoi servizi non prenotati nella data e, dentro ogni servizio, le sue recensioni.
+    I servizi prenotati vengono letti da una sotto-pipeline che non dipende dal fornitore, eseguita dal server una volta
+    sola.
+
+    :param data_richiesta: (str) stringa che indica la data in cui si vuole creare un evento
+
+    :return: oggetto di tipo Disponibilita
+    """
+    inizio_giorno, fine_giorno = intervallo_giorno(data_richiesta)
+    disponibilita = _cache_disponibilita.get(inizio_giorno) if inizio_giorno else None
+    if disponibilita is None:
+        pipeline = _fasi_fornitori_disponibili(data_richiesta) + [
+            {
+                "$lookup": {
+                    "from": "Evento",
+                    "pipeline": [
+                        {"$match": {
+                            'Data': {'$gte': inizio_giorno, '$lt': fine_giorno},
+                            '$or': [{'Ruolo': '2', 'isPagato': True}, {'Ruolo': '1'}]
+                        }},
+                        {"$project": {"_id": 0, "servizi_associati": 1}}
+                    ],
+                    "as": "eventi_giorno"
+                }
+            },
+            {
+                "$lookup": {
+                    "from": "Servizio Offerto",
+                    "let": {
+                        "fornitore_id_str": {"$toString": "$_id"},
+                        "servizi_occupati": {"$map": {
+                            "input": {"$reduce": {
+                                "input": "$eventi_giorno.servizi_associati",
+                                "initialValue": [],
+                                "in": {"$concatArrays": ["$$value", {"$ifNull": ["$$this", []]}]}
+                            }},
+                            "in": {"$toString": "$$this"}
+                        }}
+                    },
+                    "pipeline": [
+                        {"$match": {
+                            '$or': [{'isCurrentVersion': None}, {'isCurrentVersion': {'$exists': False}}],
+                            "$expr": {"$and": [
+                                {"$eq": ["$fornitore_associato", "$$fornitore_id_str"]},
+                                {"$not": [{"$in": [{"$toString": "$_id"}, "$$servizi_occupati"]}]}
+                            ]}
+                        }},
+                        {
+                            "$lookup": {
+                                "from": "Recensione",
+                                "let": {"servizio_id_str": {"$toString": "$_id"}},
+                                "pipeline": [{"$match": {"$expr": {"$eq": ["$id_valutato", "$$servizio_id_str"]}}}],
+                                "as": "recensioni"
+                            }
+                        },
+                        {"$project": {**proiezione('Servizio Offerto'), "recensioni": 1}}
+                    ],
+                    "as": "servizi"
+                }
+            },
+            {"$project": {**proiezione('Utente'), "servizi": 1}}
+        ]
+        fornitori, servizi, recensioni = [], [], []
+        for data_fornitore in get_db().Utente.aggregate(pipeline):
+            fornitori.append(Fornitore(data_fornitore, data_fornitore))
+            for data_servizio in data_fornitore['servizi']:
+                servizi.append(ServizioOfferto(data_servizio))
+                recensioni += [Recensione(data_recensione) for data_recensione in data_servizio['recensioni']]
+
+        disponibilita = Disponibilita(fornitori, servizi, recensioni)
+        if inizio_giorno:
+            _cache_disponibilita.set(inizio_giorno, disponibilita)
+    return disponibilita
+
+
+def invalida_disponibilita(data=None):
+    """
+    Elimina dalla cache la disponibilità di una data, da chiamare quando un evento in quella data viene salvato,
+    sponsorizzato o eliminato. Senza data svuota tutta la cache (quando cambiano servizi o fornitori).
+
+    :param data: (str or datetime) data dell'evento modificato
+    """
+    if data is None:
+        _cache_disponibilita.svuota()
+    else:
+        inizio_giorno, _ = intervallo_giorno(data)
+        _cache_disponibilita.invalida(inizio_giorno)
+
+
+def get_statistiche_cache_disponibilita():
+    return _cache_disponibilita.statistiche()
+
+
 def filtro_categoria_liste(categoria, data):
     """
-    Funzione per ottenere dal database la lista di fornitori e servizi che appartengono alla categoria inserita
-    dall'utente. -Vengono prese le liste di fornitori e servizi disponibli nella data indicata dall'organizzatore.
+    Funzione per ottenere la lista di fornitori e servizi che appartengono alla categoria inserita dall'utente.
+    -Vengono prese le liste di fornitori e servizi disponibli nella data indicata dall'organizzatore
+    (get_disponibilita).
     -La lista dei servizi viene filtrata per prendere i servizi che hanno il parametro "tipo" che corrisponde alla
     categoria indicata dall'organizzatore. -In base ai servizi filtrati viene filtrata la lista dei fornitori per
     ottenere i fornitori ai quali appartengono i servizi selezionati.
@@ -170,24 +359,22 @@ def filtro_categoria_liste(categoria, data):
     :return: due liste filtrate di oggetti: servizi filtrati (lista di oggetti di tipo Servizio Offerto) e fornitori
     filtrati (lista di oggetti di tipo Fornitore)
     """
-    servizi = get_servizi(data)
-    fornitori_non_filtrati = get_fornitori_disponibli(data)
-    servizi_non_filtrati = filtrare_servizi_per_fornitore(servizi, fornitori_non_filtrati)
+    disponibilita = get_disponibilita(data)
 
-    servizi_filtrati = [servizio for servizio in servizi_non_filtrati if servizio.tipo == categoria]
+    servizi_filtrati = [servizio for servizio in disponibilita.servizi if servizio.tipo == categoria]
 
     id_fornitori = set(servizio.fornitore_associato for servizio in servizi_filtrati)
 
-    fornitori_filtrati = [fornitore for fornitore in fornitori_non_filtrati if fornitore.id in id_fornitori]
+    fornitori_filtrati = [fornitore for fornitore in disponibilita.fornitori if fornitore.id in id_fornitori]
 
     return servizi_filtrati, fornitori_filtrati
 
 
 def filtro_regione_liste(regione, data):
     """
-    Funzione per ottenere dal database la lista di fornitori e servizi che si trovano nella regione inserita dall'
-    organizzatore.
-    -Vengono prese le liste di fornitori e servizi disponibli nella data indicata dall'organizzatore.
+    Funzione per ottenere la lista di fornitori e servizi che si trovano nella regione inserita dall' organizzatore.
+    -Vengono prese le liste di fornitori e servizi disponibli nella data indicata dall'organizzatore
+    (get_disponibilita).
     -La lista dei fornitori viene filtrata per prendere i fornitori che hanno il parametro "regione" che corrisponde
     alla regione indicata dall'organizzatore.
     -In base alla lista di fornitori selezionati vengono presi i servizi associati.
@@ -199,23 +386,22 @@ def filtro_regione_liste(regione, data):
     fornitori_filtrati (lista di oggetti di tipo Fornitore)
 
     """
-    servizi = get_servizi(data)
-    fornitori_non_filtrati = get_fornitori_disponibli(data)
+    disponibilita = get_disponibilita(data)
 
-    fornitori_filtrati = [fornitore for fornitore in fornitori_non_filtrati if fornitore.regione == regione]
+    fornitori_filtrati = [fornitore for fornitore in disponibilita.fornitori if fornitore.regione == regione]
 
-    servizi_filtrati = filtrare_servizi_per_fornitore(servizi, fornitori_filtrati)
+    servizi_filtrati = filtrare_servizi_per_fornitore(disponibilita.servizi, fornitori_filtrati)
 
     return servizi_filtrati, fornitori_filtrati
 
 
 def filtro_prezzo_liste(prezzo_min, prezzo_max, data):
     """
-    Funzione per ottenere dal database la lista di fornitori e servizi il cui prezzo si trova nel range di prezzo
-    inserito dall'organizzatore.
-    -Vengono prese le liste di fornitori e servizi disponibli nella data indicata dall'organizzatore.
-    -La lista dei servizi viene filtrata per prendere i servizi che rientrano nel range di prezzi indicati dall'
-    organizzatore.
+    Funzione per ottenere la lista di fornitori e servizi il cui prezzo si trova nel range di prezzo inserito
+    dall'organizzatore.
+    -Vengono prese le liste di fornitori e servizi disponibli nella data indicata dall'organizzatore
+    (get_disponibilita).
+    -I servizi vengono filtrati per il range di prezzi indicato dall'organizzatore.
     -In base alla lista di servizi selezionati vengono presi i fornitori associati.
 
     :param prezzo_min: (str) stringa che indica il prezzo minimo del range di prezzo scelto dall'organizzatore
@@ -226,25 +412,17 @@ def filtro_prezzo_liste(prezzo_min, prezzo_max, data):
     fornitori_filtrati (lista di oggetti di tipo Fornitore)
 
    """
+    disponibilita = get_disponibilita(data)
+    intervallo_prezzo = intervallo_numerico(prezzo_min, prezzo_max)
 
-    servizi = get_servizi(data)
-    fornitori_non_filtrati = get_fornitori_disponibli(data)
-    servizi_non_filtrati = filtrare_servizi_per_fornitore(servizi, fornitori_non_filtrati)
-
-    if prezzo_min == "" and prezzo_max == "":
-        return servizi_non_filtrati, fornitori_non_filtrati
-    elif prezzo_min == "" and float(prezzo_max) >= 0:
-        servizi_filtrati = [servizio for servizio in servizi_non_filtrati if float(servizio.prezzo) <=
-                            float(prezzo_max)]
-    elif float(prezzo_min) >= 0 and prezzo_max == "":
-        servizi_filtrati = [servizio for servizio in servizi_non_filtrati if
-                            float(prezzo_min) <= float(servizio.prezzo)]
-    else:
-        servizi_filtrati = [servizio for servizio in servizi_non_filtrati if
-                            float(prezzo_min) <= float(servizio.prezzo) <= float(prezzo_max)]
+    if not intervallo_prezzo:
+        return list(disponibilita.servizi), list(disponibilita.fornitori)
+
+    servizi_filtrati = [servizio for servizio in disponibilita.servizi
+                        if nell_intervallo(servizio.prezzo, intervallo_prezzo)]
 
     id_fornitori = set(servizio.fornitore_associato for servizio in servizi_filtrati)
-    fornitori_filtrati = [fornitore for fornitore in fornitori_non_filtrati if fornitore.id in id_fornitori]
+    fornitori_filtrati = [fornitore for fornitore in disponibilita.fornitori if fornitore.id in id_fornitori]
 
     return servizi_filtrati, fornitori_filtrati
 
@@ -270,49 +448,104 @@ def filtrare_servizi_per_fornitore(servizi_non_filtrati, fornitori_filtrati):
 
 def filtro_ricerca(ricerca, data):
     """
-    Funzione per ottenere dal database la lista di fornitori e servizi la cui descrizione o nome contiene la parola
-    inserita dall'organizzatore.
-    -Vengono prese le liste di fornitori e servizi disponibli nella data indicata dall'organizzatore.
-    -Vengono filtrati i fornitori cercando la parola sia nel nome che nella descrizione
-    -In base alla lista di fornitori selezionati vengono presi i servizi associati.
+    Funzione per ottenere dal database la lista di fornitori e servizi che corrispondono alla parola inserita
+    dall'organizzatore, anche se scritta con errori di battitura.
+    -La parola viene cercata nell'indice in memoria di fornitori (nome e descrizione) e servizi (tipo e descrizione),
+    senza leggere le liste complete dal database.
+    -Tra i fornitori trovati vengono presi quelli disponibili nella data indicata, con i loro servizi prenotabili
+    (get_disponibilita).
+    -I fornitori sono ordinati dal più simile alla parola cercata.
+    -Una ricerca vuota non usa l'indice e restituisce tutti i fornitori disponibili nella data indicata.
 
     :param ricerca: (str) stringa che indica la parola da ricercare scelta dall'organizzatore
     :param data: (str) stringa che indica la data nella quale si vuole fare l'evento
 
     :return: due liste filtrate di oggetti: servizi_filtrati (lista di oggetti di tipo Servizio Offerto) e
-    fornitori_filtrati (lista di oggetti di tipo Fornitore)
+    fornitori_filtrati (lista di oggetti di tipo Fornitore); None al posto delle liste se nessun fornitore corrisponde
 
    """
-    servizi = get_servizi(data)
-    fornitori_non_filtrati = get_fornitori_disponibli(data)
-    servizi_non_filtrati = filtrare_servizi_per_fornitore(servizi, fornitori_non_filtrati)
+    ricerca = (ricerca or "").strip()
+    punteggi = cerca_fornitori(ricerca) if ricerca else None
+    if punteggi is not None and not punteggi:
+        return None, None
 
-    fornitori_filtrati_nome = [fornitore for fornitore in fornitori_non_filtrati if
-                               ricerca.lower() in fornitore.nome_utente.lower()
-                               ]
+    fornitori = [fornitore for fornitore in get_disponibilita(data).fornitori
+                 if punteggi is None or fornitore.id in punteggi]
+    if not fornitori:
+        return None, None
+    if punteggi:
+        fornitori.sort(key=lambda fornitore: punteggi.get(fornitore.id, 0), reverse=True)
 
-    fornitori_filtrati_desctizione = [fornitore for fornitore in fornitori_non_filtrati if ricerca.lower() in
-                                      fornitore.descrizione.lower()]
+    servizi_filtrati = filtrare_servizi_per_fornitore(get_disponibilita(data).servizi, fornitori)
 
-    fornitori_filtrati = None
-    if fornitori_filtrati_desctizione and fornitori_filtrati_nome:
-        fornitori_unici = {}
+    return servizi_filtrati, fornitori
 
-        for fornitore in fornitori_filtrati_nome + fornitori_filtrati_desctizione:
-            fornitori_unici[fornitore.id] = fornitore
 
-        fornitori_filtrati = list(fornitori_unici.values())
-    elif fornitori_filtrati_desctizione:
-        fornitori_filtrati = fornitori_filtrati_desctizione
-    elif fornitori_filtrati_nome:
-        fornitori_filtrati = fornitori_filtrati_nome
+def ricerca_fornitori_faccette(filtri, data):
+    """
+    Ricerca di fornitori e servizi disponibili nella data indicata che combina tutti i filtri (parole, categoria del
+    servizio, regione del fornitore, intervallo di prezzo del servizio).
+    -Le parole vengono cercate nell'indice in memoria di fornitori e servizi, i fornitori disponibili e i loro servizi
+    prenotabili vengono presi dalla disponibilità della data (get_disponibilita).
+    -Servizi, conteggi per categoria, per regione e per fascia di prezzo vengono calcolati in memoria sulla stessa
+    fotografia (raggruppa, raggruppa_prezzi), quindi filtrare non richiede nessuna query; ogni conteggio usa tutti i
+    filtri tranne il proprio. Le regioni contano i fornitori, le altre faccette i servizi.
+
+    :param filtri: (dict) filtri della ricerca, tutti opzionali: 'ricerca', 'categoria', 'regione', 'prezzo_min',
+    'prezzo_max' (i valori vuoti o "Annulla" non filtrano)
+    :param data: (str) stringa che indica la data nella quale si vuole fare l'evento
 
-    if fornitori_filtrati:
-        servizi_filtrati = filtrare_servizi_per_fornitore(servizi_non_filtrati, fornitori_filtrati)
-    else:
-        servizi_filtrati = None
+    :return: tupla (servizi_filtrati (lista di oggetti di tipo Servizio Offerto), fornitori_filtrati (lista di
+    oggetti di tipo Fornitore), dizionario con i conteggi di ogni faccetta)
+    """
+    ricerca = valore_filtro(filtri, 'ricerca')
+    categoria = valore_filtro(filtri, 'categoria')
+    regione = valore_filtro(filtri, 'regione')
+    intervallo_prezzo = intervallo_numerico(filtri.get('prezzo_min'), filtri.get('prezzo_max'))
+    faccette = {'categorie': {}, 'regioni': {}, 'prezzi': {}}
+
+    punteggi = cerca_fornitori(ricerca) if ricerca else None
+    if punteggi is not None and not punteggi:
+        return [], [], faccette
+    disponibilita = get_disponibilita(data)
+    fornitori = [fornitore for fornitore in disponibilita.fornitori if punteggi is None or fornitore.id in punteggi]
+    if not fornitori:
+        return [], [], faccette
+    if punteggi:
+        fornitori.sort(key=lambda fornitore: punteggi.get(fornitore.id, 0), reverse=True)
+    fornitori_per_id = {fornitore.id: fornitore for fornitore in fornitori}
+
+    condizioni = {
+        'categoria': (lambda servizio: servizio.tipo == categoria) if categoria else None,
+        'regione': (lambda servizio: fornitori_per_id[servizio.fornitore_associato].regione == regione)
+        if regione else None,
+        'prezzo': (lambda servizio: nell_intervallo(servizio.prezzo, intervallo_prezzo))
+        if intervallo_prezzo else None,
+    }
+    servizi = [servizio for servizio in disponibilita.servizi if servizio.fornitore_associato in fornitori_per_id]
 
-    return servizi_filtrati, fornitori_filtrati
+    def filtra(esclusa=None):
+        attive = [condizione for nome, condizione in condizioni.items() if condizione and nome != esclusa]
+        return [servizio for servizio in servizi if all(condizione(servizio) for condizione in attive)]
+
+    servizi_filtrati = filtra()
+    if categoria or intervallo_prezzo:
+        # con un filtro sui servizi restano solo i fornitori che ne offrono almeno uno
+        id_fornitori = set(servizio.fornitore_associato for servizio in servizi_filtrati)
+    else:
+        id_fornitori = set(fornitori_per_id)
+        if regione:
+            id_fornitori = set(fornitore.id for fornitore in fornitori if fornitore.regione == regione)
+    fornitori_filtrati = [fornitore for fornitore in fornitori if fornitore.id in id_fornitori]
+
+    fornitori_per_regione = set(servizio.fornitore_associato for servizio in filtra('regione'))
+    faccette = {
+        'categorie': conteggi(raggruppa(servizio.tipo for servizio in filtra('categoria'))),
+        'regioni': conteggi(raggruppa(fornitori_per_id[id_fornitore].regione
+                                      for id_fornitore in fornitori_per_regione)),
+        'prezzi': conteggi_prezzo(raggruppa_prezzi(servizio.prezzo for servizio in filtra('prezzo'))),
+    }
+    return servizi_filtrati, fornitori_filtrati, faccette
 
 
 def get_fornitore_by_email(email):
@@ -325,25 +558,34 @@ def get_fornitore_by_email(email):
 
     """
 
-    fornitore_data = db['Utente'].find_one({"email": email})
+    db = get_db()
+    fornitore_data = db['Utente'].find_one({"email": email}, proiezione('Utente'))
     fornitore = Fornitore(fornitore_data, fornitore_data)
     return fornitore
 
 
 def get_servizi_fornitore(fornitore, datarichiesta):
     """
-    Funzione per ottenere dal database i servizi corrispondenti a un singolo fornitore. Vengono prima presi tutti i
-    servizi disponibili in una data scelta e poi vengono filtrati per ottenere solo quelli associati al fornitore
-    indicato.
+    Funzione per ottenere dal database i servizi corrispondenti a un singolo fornitore che si possono prenotare nella
+    data scelta. Vengono letti solo i servizi correnti del fornitore (indice su fornitore_associato e
+    isCurrentVersion) e per questi soli servizi vengono cercati gli eventi della data che li hanno già prenotati
+    (indice su servizi_associati): il costo non dipende dal numero di servizi degli altri fornitori.
 
     :param fornitore: (obj) oggetto della classe Fornitore che contiene i dati del fornitore scelto
     :param datarichiesta: (str)  stringa che indica la data nella quale si vuole fare l'evento
 
     :return: lista_servizi, ovvero una lista di oggetti di tipo Servizio Offerto
     """
-    servizi_non_filtrati = get_servizi(datarichiesta)
+    servizi_data = list(get_db()['Servizio Offerto'].find({
+        'fornitore_associato': fornitore.id,
+        '$or': [{'isCurrentVersion': None}, {'isCurrentVersion': {'$exists': False}}]
+    }, proiezione('Servizio Offerto')))
+    if not servizi_data:
+        return []
+
+    id_servizi_occupati = get_id_servizi_occupati(datarichiesta, [str(data['_id']) for data in servizi_data])
 
-    lista_servizi = [servizio for servizio in servizi_non_filtrati if servizio.fornitore_associato == fornitore.id]
+    lista_servizi = [ServizioOfferto(data) for data in servizi_data if str(data['_id']) not in id_servizi_occupati]
 
     return lista_servizi
 
@@ -359,7 +601,8 @@ def fornitore_serializer(fornitore):
     return {
         "id": fornitore.id,
         "nome": fornitore.nome,
-        "foto": fornitore.foto,
+        "foto": [url_variante(url, 'media') for url in fornitore.url_foto],
+        "miniature": [url_variante(url, 'miniatura') for url in fornitore.url_foto],
         "citta": fornitore.citta,
         "regione": fornitore.regione,
         "OrarioDiLavoro": fornitore.orario_lavoro,
@@ -383,7 +626,7 @@ def servizio_serializer(servizio):
         "fornitore_associato": servizio.fornitore_associato,
         "descrizione": servizio.descrizione,
         "prezzo": servizio.prezzo,
-        "foto_servizio": servizio.foto_servizio
+        "foto_servizio": [url_variante(url, 'miniatura') for url in servizio.url_foto_servizio]
     }
 
 
@@ -396,8 +639,9 @@ def get_servizio_by_id(id_servizio):
     :return: oggetto di tipo servizio Offerto
     """
 
+    db = get_db()
     id_servizio_obj = ObjectId(id_servizio)
-    servizio_data = db["Servizio Offerto"].find_one({"_id": id_servizio_obj})
+    servizio_data = db["Servizio Offerto"].find_one({"_id": id_servizio_obj}, proiezione('Servizio Offerto'))
     servizio = ServizioOfferto(servizio_data)
     return servizio
 
@@ -410,8 +654,9 @@ def get_fornitore_by_id(id_fornitore):
 
     :return: oggetto di tipo fornitore
     """
+    db = get_db()
     id_fornitore_obj = ObjectId(id_fornitore)
-    fornitore_data = db['Utente'].find_one({"_id": id_fornitore_obj})
+    fornitore_data = db['Utente'].find_one({"_id": id_fornitore_obj}, proiezione('Utente'))
     fornitore = Fornitore(fornitore_data, fornitore_data)
     return fornitore
 
@@ -419,25 +664,32 @@ def get_fornitore_by_id(id_fornitore):
 def ottieni_servizi_e_fornitori_cookie(carrello):
     """
     Funzione per ottenere la lista dei fornitori e dei servizi in base a ciò che è stato salvato nei cookie.
+    I servizi del carrello e i loro fornitori vengono letti con due sole query ($in), qualunque sia la dimensione del
+    carrello; i servizi restano nell'ordine del carrello e ogni fornitore compare una volta sola.
 
     :param carrello: (str) stringa che rappresenta i cookie del carrello
 
     :return: due liste di oggetti: lista_servizi (lista di oggetti di tipo servizio Offerto) e lista_fornitori (lista di
     oggetti di tipo Fornitore)
     """
-    lista_servizi = []
-
-    for id_servizio in carrello:
-        if id_servizio != '' and id_servizio is not None:
-            servizio = get_servizio_by_id(id_servizio)
-            lista_servizi.append(servizio)
-
-    lista_fornitori = []
-    if lista_servizi:
-        for servizio in lista_servizi:
-            fornitore = get_fornitore_by_id(servizio.fornitore_associato)
-            if fornitore not in lista_fornitori:
-                lista_fornitori.append(fornitore)
+    db = get_db()
+    id_servizi = [id_servizio for id_servizio in carrello if id_servizio and ObjectId.is_valid(id_servizio)]
+    if not id_servizi:
+        return [], []
+
+    servizi_data = db['Servizio Offerto'].find({'_id': {'$in': [ObjectId(id_servizio) for id_servizio in id_servizi]}},
+                                               proiezione('Servizio Offerto'))
+    servizi_per_id = {str(data['_id']): ServizioOfferto(data) for data in servizi_data}
+    lista_servizi = [servizi_per_id[id_servizio] for id_servizio in id_servizi if id_servizio in servizi_per_id]
+
+    # id dei fornitori senza ripetizioni, nell'ordine in cui compaiono nel carrello
+    id_fornitori = list(dict.fromkeys(servizio.fornitore_associato for servizio in lista_servizi
+                                      if ObjectId.is_valid(servizio.fornitore_associato)))
+    fornitori_data = db['Utente'].find({'_id': {'$in': [ObjectId(id_fornitore) for id_fornitore in id_fornitori]}},
+                                       proiezione('Utente'))
+    fornitori_per_id = {str(data['_id']): Fornitore(data, data) for data in fornitori_data}
+    lista_fornitori = [fornitori_per_id[id_fornitore] for id_fornitore in id_fornitori
+                       if id_fornitore in fornitori_per_id]
 
     return lista_servizi, lista_fornitori
 
@@ -448,11 +700,12 @@ def crea_documento_evento_generico(data_evento, descrizione, tipo_evento, n_invi
     Funzione per creare il documento da inserire nel database che contiene gli attributi dell'evento comuni sia all'
     evento privato che all'evento pubblico
 
-    :param data_evento: (str) stringa che rappresenta la data in cui si terrà l'evento
+    :param data_evento: (str) stringa che rappresenta la data in cui si terrà l'evento, salvata come datetime
     :param descrizione: (str) stringa che rappresenta la descrzione dell'evento
     :param tipo_evento: (str) stringa che rappresenta il tipo di evento
     :param n_invitati: (str) stringa che rappresenta il numero di persone invitate o i posti disponibli
-    :param foto_byte_array: (byte_array) byte array che rappresenta l'immagine locandina dell'evento
+    :param foto_byte_array: (byte_array) immagine locandina dell'evento (elaborata con Utils.Image.elabora_immagini),
+    viene salvata nell'archivio media e nel documento resta solo il suo id
     :param ruolo: (str) indica se l'evento è di tipo privato ("2") o pubblico ("3")
     :param id_fornitori: (array) array che continene l'id dei fornitori coinvolti nell'evento
     :param id_servizi: (array) array che continene l'id dei servizi coinvolti nell'evento
@@ -463,11 +716,11 @@ def crea_documento_evento_generico(data_evento, descrizione, tipo_evento, n_invi
     """
     documento = {
         '_id': ObjectId(),
-        'Data': data_evento,
+        'Data': converti_data(data_evento),
         'Descrizione': descrizione,
         'Tipo': tipo_evento,
-        'Invitati/Posti': n_invitati,
-        'Locandina': foto_byte_array,
+        'Invitati/Posti': converti_intero(n_invitati),
+        'LocandinaId': salva_immagini([foto_byte_array])[0] if foto_byte_array else None,
         'Ruolo': ruolo,
         'fornitori_associati': id_fornitori,
         'servizi_associati': id_servizi,
@@ -498,6 +751,7 @@ def save_evento(lista_servizi, lista_fornitori, tipo_evento, data_evento, n_invi
 
     :return: l'evento privato inserito nel database
     """
+    db = get_db()
     if not isinstance(tipo_evento, str) or not re.match(r'^[^0-9]*$', tipo_evento):
         flash("Il tipo di evento non rispetta il formato previsto", "error")
         return False
@@ -518,14 +772,27 @@ def save_evento(lista_servizi, lista_fornitori, tipo_evento, data_evento, n_invi
                                                                        is_pagato)
             documento_evento_privato = {
                 'EventoPrivato': {
-                    'Prezzo': prezzo,
+                    'Prezzo': converti_prezzo(prezzo),
                     'Festeggiato/i': nome_festeggiato,
                     'Organizzatore': id_organizzatore
                 }
             }
 
             documento_evento = {**documento_evento_generico, **documento_evento_privato}
-            db.Evento.insert_one(documento_evento)
+            # i fornitori vengono prenotati prima di salvare l'evento: se nel frattempo uno di loro ha raggiunto il
+            # limite giornaliero l'evento non viene creato
+            if not registra_prenotazioni(documento_evento):
+                if documento_evento.get('LocandinaId'):
+                    elimina_media(documento_evento['LocandinaId'])
+                invalida_disponibilita(data_evento)
+                flash("Uno dei fornitori scelti non è più disponibile in questa data", "error")
+                return False
+            try:
+                db.Evento.insert_one(documento_evento)
+            except Exception:
+                annulla_prenotazioni(documento_evento)
+                raise
+            invalida_disponibilita(data_evento)
             flash("L'evento è stato creato correttamente", "success")
             return True
 
@@ -538,7 +805,8 @@ def elimina_evento(id_evento):
 
     :return: true per indicare che l'evento è stato cancellato
     """
-    evento = db.Evento.find_one({"_id": ObjectId(id_evento)})
+    db = get_db()
+    evento = db.Evento.find_one({"_id": ObjectId(id_evento)}, proiezione('Evento'))
 
     evento_privato = EventoPrivato(evento, evento)
     if evento_privato is None:
@@ -548,7 +816,12 @@ def elimina_evento(id_evento):
         evento_privato.notify_observers()
 
         # Eliminazione dell'evento
-    db.Evento.delete_one({"_id": ObjectId(id_evento)})
+    if db.Evento.delete_one({"_id": ObjectId(id_evento)}).deleted_count:
+        annulla_prenotazioni(evento)
+    if evento and evento.get('LocandinaId'):
+        elimina_media(evento['LocandinaId'])
+    if evento:
+        invalida_disponibilita(evento.get('Data'))
 
     return True, "Evento eliminato e fornitori notificati"
 
@@ -562,7 +835,7 @@ def crea_evento_pubblico(data, n_persone, descrizione, locandina, ruolo, tipo, i
     :param data: (str) stringa che rappresenta la data nella quale si terrà l'evento
     :param n_persone: (str) stringa che rappresenta il numero di posti disponibili
     :param descrizione: (str) stringa che rappresenta una descrizione dell'evento
-    :param locandina: (byte_array) byte array che rappresenta una foto dell'evento
+    :param locandina: (tuple) foto dell'evento, elaborata con Utils.Image.elabora_immagini
     :param ruolo: (str) stringa che rappresenta il ruolo dell'evento se pubblico o privato
     :param tipo: (str) stringa che rappresenta il tipo di evento pubblico
     :param is_pagato: (bool) booleano che indica se l'evento è stato pagato per la sponsorizzazione o meno
@@ -577,6 +850,7 @@ def crea_evento_pubblico(data, n_persone, descrizione, locandina, ruolo, tipo, i
     :return: nulla
     """
 
+    db = get_db()
     if not valid_evento(data, n_persone, tipo, prezzo, ora):
         return False
 
@@ -586,16 +860,28 @@ def crea_evento_pubblico(data, n_persone, descrizione, locandina, ruolo, tipo, i
 
     documento_evento_pubblico = {
         'EventoPubblico': {
-            'Prezzo': prezzo,
+            'Prezzo': converti_prezzo(prezzo),
             'Nome': nome,
             'Luogo': via,
             'Regione': regione,
             'Ora': ora,
-            'BigliettiDisponibili': n_persone
+            'BigliettiDisponibili': converti_intero(n_persone)
         }
     }
     documento_evento = {**documento_evento_generico, **documento_evento_pubblico}
-    db.Evento.insert_one(documento_evento)
+    if not registra_prenotazioni(documento_evento):
+        if documento_evento.get('LocandinaId'):
+            elimina_media(documento_evento['LocandinaId'])
+        invalida_disponibilita(data)
+        flash("Uno dei fornitori scelti non è più disponibile in questa data", "error")
+        return False
+    try:
+        db.Evento.insert_one(documento_evento)
+    except Exception:
+        annulla_prenotazioni(documento_evento)
+        raise
+    invalida_catalogo()
+    invalida_disponibilita(data)
     return True
 
 
@@ -636,13 +922,14 @@ def get_tutti_servizi_by_fornitore_location(id_fornitore):
     :return : lista_servizi, ovvero una lista di oggetti di tipo servizio offerto
 
     """
+    db = get_db()
     servizi_collection = db['Servizio Offerto']
     servizi_data = servizi_collection.find({
         'fornitore_associato': id_fornitore,
         'isCurrentVersion': {'$in': [None, '']},
         'isDeleted': False,
         'Tipo': 'Location'
-    })
+    }, proiezione('Servizio Offerto'))
     lista_servizi = []
 
     for data in servizi_data:
@@ -654,41 +941,103 @@ def get_tutti_servizi_by_fornitore_location(id_fornitore):
 
 def acquista_biglietto(id_evento, id_organizzatore, numero_biglietti):
     """
-    Funzione per acquistare un biglietto e salvarlo nel database. Per salvarlo recupera delle informazioni utili dalla
-    collezione evento. Inoltre modifica la variabile biglietti disponibili nel documento dell'evento a cui
-    corrispondono i biglietti
+    Funzione per acquistare dei biglietti e salvarli nel database. I biglietti disponibili vengono scalati con un solo
+    update_one ($inc condizionato da $gte, verificato con modified_count), così acquisti concorrenti sullo stesso
+    evento non possono vendere più biglietti di quelli disponibili; se il salvataggio del biglietto fallisce la
+    disponibilità viene ripristinata.
 
     :param id_evento: (str) stringa che rappresenta l'id dell'evento
     :param id_organizzatore: (str) stringa che reppresenta l'id dell'organizzatore
     :param numero_biglietti: (str) stringa che indica il numero di biglietti che si vogliono acquistare
-    :return: nulla
+    :return: True se l'acquisto è andato a buon fine, False se la quantità non è valida o i biglietti non bastano
     """
     from ..InterfacciaPersistenza import EventoPubblico
-    eventi = db['Evento']
-    biglietti = db["Biglietto"]
-    evento_data = eventi.find_one({"_id": ObjectId(id_evento)})
-    evento = EventoPubblico.EventoPubblico(evento_data, evento_data)
-
-    biglietto_data = {
-        "Evento_associato": id_evento,
-        "CompratoDa": id_organizzatore,
-        "DataEvento": evento.data,
-        "Dove": evento.luogo,
-        "Ora": evento.ora,
-        "Quantità": numero_biglietti,
-        'NomeEvento': evento.nome
-    }
-    biglietto = int(evento.biglietti_disponibili)
-    numero = int(numero_biglietti)
-    nuovo_num_biglietti = biglietto - numero
-    nuovo_num_biglietti = str(nuovo_num_biglietti)
+    numero = converti_intero(numero_biglietti)
+    if numero is None or numero <= 0 or not ObjectId.is_valid(id_evento):
+        return False
 
-    biglietti.insert_one(biglietto_data)
+    eventi = get_db()['Evento']
+    scalati = eventi.update_one(
+        {"_id": ObjectId(id_evento), "EventoPubblico.BigliettiDisponibili": {"$gte": numero}},
+        {"$inc": {"EventoPubblico.BigliettiDisponibili": -numero}}
+    ).modified_count
+    if not scalati:
+        return False
+
+    try:
+        evento_data = eventi.find_one({"_id": ObjectId(id_evento)}, proiezione('Evento'))
+        evento = EventoPubblico.EventoPubblico(evento_data, evento_data)
+        get_db()["Biglietto"].insert_one({
+            "Evento_associato": id_evento,
+            "CompratoDa": id_organizzatore,
+            "DataEvento": evento.data_evento,
+            "Dove": evento.luogo,
+            "Ora": evento.ora,
+            "Quantità": numero,
+            'NomeEvento': evento.nome
+        })
+    except Exception:
+        eventi.update_one({"_id": ObjectId(id_evento)}, {"$inc": {"EventoPubblico.BigliettiDisponibili": numero}})
+        raise
+    finally:
+        invalida_catalogo()
+    return True
+
+
+class DettagliEvento:
+    """
+    Evento privato letto insieme al suo organizzatore e ai suoi servizi (vedi get_dettagli_evento_con_servizi).
+
+    Attributi:
+        evento (EventoPrivato): l'evento, None se non esiste o non è privato.
+        organizzatore (Organizzatore): l'organizzatore dell'evento, None se non esiste.
+        servizi (list): documenti dei servizi associati all'evento, nell'ordine in cui sono stati scelti.
+    """
 
-    eventi.update_one(
-        {"_id": ObjectId(id_evento)},
-        {"$set": {"EventoPubblico.BigliettiDisponibili": nuovo_num_biglietti}}
-    )
+    def __init__(self, evento=None, organizzatore=None, servizi=None):
+        self.evento = evento
+        self.organizzatore = organizzatore
+        self.servizi = servizi or []
+
+
+def get_dettagli_evento_con_servizi(id_evento, id_fornitore_escluso=None):
+    """
+    Legge un evento con il suo organizzatore e i servizi associati con tre query sull'indice di _id (evento,
+    organizzatore e un solo $in per tutti i servizi), qualunque sia il numero di servizi dell'evento.
+
+    :param id_evento: (str) stringa che rappresenta l'id dell'evento
+    :param id_fornitore_escluso: (str) id del fornitore i cui servizi non vanno restituiti (quello che sta guardando
+        l'evento), None per restituirli tutti
+
+    :return: oggetto di tipo DettagliEvento
+    """
+    if not ObjectId.is_valid(id_evento):
+        return DettagliEvento()
+    db = get_db()
+    evento_data = db['Evento'].find_one({'_id': ObjectId(id_evento)}, proiezione('Evento'))
+    if evento_data is None:
+        return DettagliEvento()
+
+    organizzatore = None
+    id_organizzatore = (evento_data.get('EventoPrivato') or {}).get('Organizzatore')
+    if ObjectId.is_valid(id_organizzatore):
+        organizzatore_data = db['Utente'].find_one({'_id': ObjectId(id_organizzatore)}, proiezione('Utente'))
+        if organizzatore_data:
+            organizzatore = Organizzatore(organizzatore_data, organizzatore_data)
+
+    id_servizi = [str(id_servizio) for id_servizio in evento_data.get('servizi_associati') or []
+                  if ObjectId.is_valid(id_servizio)]
+    servizi_per_id = {}
+    if id_servizi:
+        filtro = {'_id': {'$in': [ObjectId(id_servizio) for id_servizio in id_servizi]}}
+        servizi_data = db['Servizio Offerto'].find(filtro, proiezione('Servizio Offerto'))
+        servizi_per_id = {str(servizio['_id']): servizio for servizio in servizi_data
+                          if not id_fornitore_escluso
+                          or str(servizio.get('fornitore_associato')) != str(id_fornitore_escluso)}
+
+    evento = EventoPrivato(evento_data, evento_data) if evento_data.get('Ruolo') == "2" else None
+    servizi = [servizi_per_id[id_servizio] for id_servizio in id_servizi if id_servizio in servizi_per_id]
+    return DettagliEvento(evento, organizzatore, servizi)
 
 
 def get_dati_servizi_organizzatore(id_evento):
@@ -697,14 +1046,92 @@ def get_dati_servizi_organizzatore(id_evento):
 
     :param id_evento: (str) stringa che rappresenta l'id dell'evento
 
-    :return: servizi_lista (lista di oggetti di tipo Servizio Offerto)
-    """
-    from ..InterfacciaPersistenza import EventoPrivato
-    eventi = db['Evento']
-    evento_data = eventi.find_one({"_id": ObjectId(id_evento)})
-    evento = EventoPrivato.EventoPrivato(evento_data, evento_data)
-    servizi_lista = []
-    for servizi in evento.servizi_associati:
-        servizio_data = db['Servizio Offerto'].find_one({"_id": ObjectId(servizi)})
-        servizi_lista.append(servizio_data)
-    return servizi_lista
+    :return: servizi_lista (lista di documenti di Servizio Offerto)
+    """
+    return get_dettagli_evento_con_servizi(id_evento).servizi
+
+
+def _valore_campo(documento, campo):
+    """
+    Legge da un documento il valore di un campo, anche annidato ('EventoPubblico.Prezzo').
+    """
+    for chiave in campo.split('.'):
+        if not isinstance(documento, dict):
+            return None
+        documento = documento.get(chiave)
+    return documento
+
+
+def _converti_campo(collezione, campo, conversione, dimensione_blocco):
+    """
+    Converte con la funzione indicata i valori di un campo salvati come stringa, raggruppando le scritture in blocchi
+    con bulk_write.
+
+    :param collezione: collezione da migrare
+    :param campo: (str) nome del campo, anche annidato
+    :param conversione: funzione che converte il valore e restituisce None se non è valido
+    :param dimensione_blocco: (int) numero di documenti aggiornati con una sola bulk_write
+
+    :return: dizionario con il numero di valori convertiti e di quelli non validi
+    """
+    convertiti, non_validi = 0, 0
+    operazioni = []
+    for documento in collezione.find({campo: {'$type': 'string'}}, {campo: 1}, batch_size=dimensione_blocco):
+        valore = conversione(_valore_campo(documento, campo))
+        if valore is None:
+            non_validi += 1
+            continue
+        operazioni.append(UpdateOne({'_id': documento['_id']}, {'$set': {campo: valore}}))
+        if len(operazioni) >= dimensione_blocco:
+            convertiti += collezione.bulk_write(operazioni, ordered=False).modified_count
+            operazioni = []
+    if operazioni:
+        convertiti += collezione.bulk_write(operazioni, ordered=False).modified_count
+    return {'convertiti': convertiti, 'non_validi': non_validi}
+
+
+def migra_date_eventi(dimensione_blocco=500):
+    """
+    Converte le date salvate come stringa dd-mm-yyyy (campo 'Data' degli eventi e 'DataEvento' dei biglietti) in
+    datetime, così che i filtri sulla data e l'ordinamento vengano eseguiti dal database (con gli indici dichiarati in
+    InterfacciaPersistenza.Indici).
+
+    :param dimensione_blocco: (int) numero di documenti aggiornati con una sola bulk_write
+
+    :return: dizionario che per ogni campo indica i valori convertiti e quelli con una data non valida
+    """
+    db = get_db()
+    risultato = {
+        'Evento.Data': _converti_campo(db['Evento'], 'Data', converti_data, dimensione_blocco),
+        'Biglietto.DataEvento': _converti_campo(db['Biglietto'], 'DataEvento', converti_data, dimensione_blocco)
+    }
+    return risultato
+
+
+# campi numerici salvati in passato come stringa, con la conversione da applicare
+CAMPI_NUMERICI = (
+    ('Evento', 'Invitati/Posti', converti_intero),
+    ('Evento', 'EventoPubblico.Prezzo', converti_prezzo),
+    ('Evento', 'EventoPubblico.BigliettiDisponibili', converti_intero),
+    ('Evento', 'EventoPrivato.Prezzo', converti_prezzo),
+    ('Servizio Offerto', 'Prezzo', converti_prezzo),
+    ('Servizio Offerto', 'Quantità', converti_intero),
+    ('Utente', 'Fornitore.EventiMassimiGiornaliero', converti_intero),
+    ('Biglietto', 'Quantità', converti_intero),
+)
+
+
+def migra_campi_numerici(dimensione_blocco=500):
+    """
+    Converte prezzi, posti, biglietti disponibili e numero massimo di eventi giornalieri salvati come stringa nei tipi
+    numerici, così che i filtri per prezzo e disponibilità siano query di intervallo eseguite dal database.
+
+    :param dimensione_blocco: (int) numero di documenti aggiornati con una sola bulk_write
+
+    :return: dizionario che per ogni campo indica i valori convertiti e quelli non validi
+    """
+    db = get_db()
+    risultato = {}
+    for collezione, campo, conversione in CAMPI_NUMERICI:
+        risultato[f'{collezione}.{campo}'] = _converti_campo(db[collezione], campo, conversione, dimensione_blocco)
+    return risultato
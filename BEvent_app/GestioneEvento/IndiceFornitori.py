@@ -0,0 +1,224 @@
+"""
+Indice in memoria per la ricerca approssimata dei fornitori (per nome e descrizione) e dei loro servizi (per tipo e
+descrizione).
+
+L'indice viene costruito alla prima ricerca e poi aggiornato un documento alla volta dai service che creano, modificano
+o eliminano fornitori e servizi. Ogni processo ha il proprio indice: per raccogliere anche le modifiche fatte da altri
+processi viene ricostruito da zero quando è più vecchio di DURATA_INDICE secondi. La ricostruzione avviene in un
+thread in background mentre le ricerche continuano a usare l'indice precedente; i fornitori e i servizi aggiornati nel
+frattempo vengono riletti e riapplicati al nuovo indice subito dopo la sostituzione, così nessuna modifica va persa.
+"""
+import os
+import threading
+import time
+
+from bson import ObjectId
+
+from ..db import get_db
+from ..Utils.IndiceTrigrammi import IndiceTrigrammi
+
+DURATA_INDICE = 600
+
+_CAMPI_FORNITORE = {'nome_utente': 1, 'Ruolo': 1, 'Fornitore.Descrizione': 1}
+_CAMPI_SERVIZIO = {'Tipo': 1, 'Descrizione': 1, 'fornitore_associato': 1, 'isCurrentVersion': 1, 'isDeleted': 1}
+
+_indice_fornitori = IndiceTrigrammi()
+_indice_servizi = IndiceTrigrammi()
+_fornitore_del_servizio = {}
+_costruito_il = None
+# protegge la sostituzione dell'indice e gli aggiornamenti incrementali, che non devono finire nell'indice sostituito
+_lock = threading.Lock()
+# una sola ricostruzione alla volta
+_lock_ricostruzione = threading.Lock()
+# id aggiornati durante una ricostruzione, da riapplicare al nuovo indice: None se non è in corso una ricostruzione
+_in_sospeso = None
+_ricostruzione_avviata = False
+
+
+def _testo_fornitore(dati):
+    return f"{dati.get('nome_utente') or ''} {(dati.get('Fornitore') or {}).get('Descrizione') or ''}"
+
+
+def _testo_servizio(dati):
+    return f"{dati.get('Tipo') or ''} {dati.get('Descrizione') or ''}"
+
+
+def _servizio_ricercabile(dati):
+    return not dati.get('isCurrentVersion') and not dati.get('isDeleted')
+
+
+def _applica_fornitore(id_fornitore, dati):
+    if dati and dati.get('Ruolo') == '3':
+        _indice_fornitori.aggiorna(id_fornitore, _testo_fornitore(dati))
+    else:
+        _indice_fornitori.rimuovi(id_fornitore)
+
+
+def _applica_servizio(id_servizio, dati):
+    if dati and _servizio_ricercabile(dati):
+        _indice_servizi.aggiorna(id_servizio, _testo_servizio(dati))
+        _fornitore_del_servizio[id_servizio] = dati.get('fornitore_associato')
+    else:
+        _indice_servizi.rimuovi(id_servizio)
+        _fornitore_del_servizio.pop(id_servizio, None)
+
+
+def _leggi_fornitore(id_fornitore):
+    return get_db()['Utente'].find_one({'_id': ObjectId(id_fornitore)}, _CAMPI_FORNITORE)
+
+
+def _leggi_servizio(id_servizio):
+    return get_db()['Servizio Offerto'].find_one({'_id': ObjectId(id_servizio)}, _CAMPI_SERVIZIO)
+
+
+def ricostruisci_indice():
+    """
+    Ricostruisce da zero l'indice di fornitori e servizi leggendo i soli campi testuali dal database. Il nuovo indice
+    sostituisce il precedente solo quando è completo, quindi le ricerche in corso non vedono mai un indice a metà; i
+    fornitori e i servizi aggiornati durante la lettura vengono riletti e riapplicati al nuovo indice.
+
+    :return: dizionario con il numero di fornitori e di servizi indicizzati
+    """
+    global _indice_fornitori, _indice_servizi, _fornitore_del_servizio, _costruito_il, _in_sospeso
+    with _lock_ricostruzione:
+        with _lock:
+            _in_sospeso = set()
+        try:
+            db = get_db()
+            indice_fornitori, indice_servizi, fornitore_del_servizio = IndiceTrigrammi(), IndiceTrigrammi(), {}
+            for dati in db['Utente'].find({'Ruolo': '3'}, _CAMPI_FORNITORE):
+                indice_fornitori.aggiorna(str(dati['_id']), _testo_fornitore(dati))
+            for dati in db['Servizio Offerto'].find({'$or': [{'isCurrentVersion': None},
+                                                             {'isCurrentVersion': {'$exists': False}}],
+                                                     'isDeleted': {'$ne': True}}, _CAMPI_SERVIZIO):
+                id_servizio = str(dati['_id'])
+                indice_servizi.aggiorna(id_servizio, _testo_servizio(dati))
+                fornitore_del_servizio[id_servizio] = dati.get('fornitore_associato')
+
+            with _lock:
+                _indice_fornitori, _indice_servizi, _fornitore_del_servizio = indice_fornitori, indice_servizi, \
+                    fornitore_del_servizio
+                # le modifiche arrivate durante la lettura potrebbero mancare nel nuovo indice: si rileggono dal
+                # database, tenendo il lock così un aggiornamento successivo non viene sovrascritto da uno più vecchio
+                for tipo, id_documento in _in_sospeso:
+                    if tipo == 'fornitore':
+                        _applica_fornitore(id_documento, _leggi_fornitore(id_documento))
+                    else:
+                        _applica_servizio(id_documento, _leggi_servizio(id_documento))
+                _costruito_il = time.monotonic()
+        finally:
+            with _lock:
+                _in_sospeso = None
+    _ricostruzione_avviata = False
+    return {'fornitori': len(indice_fornitori), 'servizi': len(indice_servizi)}
+
+
+def _scaduto():
+    return _costruito_il is None or time.monotonic() - _costruito_il > DURATA_INDICE
+
+
+def _assicura_indice():
+    """
+    Alla prima ricerca costruisce l'indice e attende che sia pronto; quando è scaduto avvia la ricostruzione in
+    background e continua a usare quello attuale.
+    """
+    global _ricostruzione_avviata
+    if _costruito_il is None:
+        with _lock_ricostruzione:
+            pronto = _costruito_il is not None
+        if not pronto:
+            ricostruisci_indice()
+    elif _scaduto():
+        with _lock:
+            avvia, _ricostruzione_avviata = not _ricostruzione_avviata, True
+        if avvia:
+            threading.Thread(target=_ricostruisci_in_background, name='indice-fornitori', daemon=True).start()
+
+
+def _ricostruisci_in_background():
+    global _ricostruzione_avviata
+    try:
+        ricostruisci_indice()
+    finally:
+        with _lock:
+            _ricostruzione_avviata = False
+
+
+def _registra_aggiornamento(tipo, id_documento, applica, dati):
+    with _lock:
+        applica(id_documento, dati)
+        if _in_sospeso is not None:
+            _in_sospeso.add((tipo, id_documento))
+
+
+def aggiorna_fornitore(id_fornitore):
+    """
+    Aggiorna nell'indice un fornitore appena creato o modificato. Se l'indice non è ancora stato costruito non fa
+    nulla: il fornitore verrà letto alla prima ricerca.
+
+    :param id_fornitore: (str) id del fornitore
+    """
+    if _costruito_il is None and _in_sospeso is None:
+        return
+    id_fornitore = str(id_fornitore)
+    _registra_aggiornamento('fornitore', id_fornitore, _applica_fornitore, _leggi_fornitore(id_fornitore))
+
+
+def aggiorna_servizio(id_servizio):
+    """
+    Aggiorna nell'indice un servizio appena creato, modificato o eliminato: un servizio eliminato o sostituito da una
+    nuova versione viene tolto dall'indice.
+
+    :param id_servizio: (str) id del servizio
+    """
+    if _costruito_il is None and _in_sospeso is None:
+        return
+    id_servizio = str(id_servizio)
+    _registra_aggiornamento('servizio', id_servizio, _applica_servizio, _leggi_servizio(id_servizio))
+
+
+def cerca_fornitori(ricerca, limite=200):
+    """
+    Cerca i fornitori il cui nome o descrizione, o il tipo o la descrizione di uno dei loro servizi, è simile alla
+    ricerca (anche con errori di battitura).
+
+    :param ricerca: (str) testo cercato
+    :param limite: (int) numero massimo di fornitori e di servizi considerati
+
+    :return: dizionario id fornitore -> punteggio (0-100), con il punteggio migliore tra fornitore e servizi
+    """
+    _assicura_indice()
+    punteggi = dict(_indice_fornitori.cerca(ricerca, limite))
+    for id_servizio, punteggio in _indice_servizi.cerca(ricerca, limite):
+        id_fornitore = _fornitore_del_servizio.get(id_servizio)
+        if id_fornitore and punteggio > punteggi.get(id_fornitore, 0):
+            punteggi[id_fornitore] = punteggio
+    return punteggi
+
+
+def get_statistiche_indice():
+    """
+    :return: dizionario con il numero di fornitori e servizi indicizzati e l'età dell'indice in secondi
+    """
+    return {
+        'fornitori': len(_indice_fornitori),
+        'servizi': len(_indice_servizi),
+        'eta_secondi': None if _costruito_il is None else round(time.monotonic() - _costruito_il, 1),
+    }
+
+
+def _dopo_fork():
+    global _indice_fornitori, _indice_servizi, _fornitore_del_servizio, _costruito_il, _lock, _lock_ricostruzione, \
+        _in_sospeso, _ricostruzione_avviata
+    _indice_fornitori = IndiceTrigrammi()
+    _indice_servizi = IndiceTrigrammi()
+    _fornitore_del_servizio = {}
+    _costruito_il = None
+    _lock = threading.Lock()
+    _lock_ricostruzione = threading.Lock()
+    _in_sospeso = None
+    _ricostruzione_avviata = False
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_dopo_fork)
@@ -0,0 +1,214 @@
+"""
+Prenotazioni temporanee dei biglietti degli eventi pubblici, salvate nella collezione ticket_holds: un documento per
+prenotazione ({'evento': id, 'acquirente': id, 'quantita': biglietti, 'scadenza': datetime}).
+
+Prenotare scala i biglietti disponibili dell'evento con un solo aggiornamento atomico sull'_id ($inc condizionato da
+$gte, come acquista_biglietto); la conferma trasforma la prenotazione in un Biglietto senza scrivere sull'evento. Le
+prenotazioni scadute restituiscono i biglietti all'evento:
+- ogni PRENOTAZIONI_INTERVALLO secondi (default 60) il worker in background avviato da init_prenotazioni_biglietti
+  rilascia tutte quelle scadute, quindi un biglietto resta bloccato al massimo DURATA_PRENOTAZIONE più un intervallo;
+- quelle di un evento esaurito vengono rilasciate subito quando qualcuno prova a prenotarlo;
+- il comando 'flask rilascia-biglietti' le rilascia a mano (es. da cron, se il worker è disattivato con
+  PRENOTAZIONI_INTERVALLO=0).
+Non si usa un indice TTL perché la cancellazione automatica non restituirebbe i biglietti all'evento.
+"""
+import os
+import threading
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from ..db import get_db
+from ..InterfacciaPersistenza.Proiezioni import proiezione
+from ..RicercaEvento.RicercaEventoService import invalida_catalogo
+from ..Utils.Conversioni import converti_intero
+
+COLLEZIONE_PRENOTAZIONI_BIGLIETTI = 'ticket_holds'
+DURATA_PRENOTAZIONE = timedelta(minutes=10)
+# secondi tra due rilasci automatici delle prenotazioni scadute, 0 per non avviare il worker
+INTERVALLO_RILASCIO = 60
+
+_worker = None
+
+
+def _scala_biglietti(id_evento, numero):
+    return get_db()['Evento'].update_one(
+        {"_id": id_evento, "EventoPubblico.BigliettiDisponibili": {"$gte": numero}},
+        {"$inc": {"EventoPubblico.BigliettiDisponibili": -numero}}
+    ).modified_count == 1
+
+
+def _restituisci_biglietti(id_evento, numero):
+    get_db()['Evento'].update_one({"_id": ObjectId(id_evento)},
+                                  {"$inc": {"EventoPubblico.BigliettiDisponibili": numero}})
+
+
+def riserva_biglietti(id_evento, id_acquirente, numero_biglietti, durata=DURATA_PRENOTAZIONE):
+    """
+    Prenota dei biglietti per un tempo limitato. Se l'evento è esaurito vengono prima rilasciate le sue prenotazioni
+    scadute e la prenotazione viene ritentata una volta.
+
+    :param id_evento: (str) id dell'evento pubblico
+    :param id_acquirente: (str) id dell'utente che prenota
+    :param numero_biglietti: (str) numero di biglietti da prenotare
+    :param durata: (timedelta) per quanto tempo i biglietti restano riservati
+
+    :return: dizionario con 'id' e 'scadenza' della prenotazione, None se la quantità non è valida o i biglietti non
+        bastano
+    """
+    numero = converti_intero(numero_biglietti)
+    if numero is None or numero <= 0 or not ObjectId.is_valid(id_evento):
+        return None
+
+    if not _scala_biglietti(ObjectId(id_evento), numero):
+        if not rilascia_prenotazioni_scadute(id_evento) or not _scala_biglietti(ObjectId(id_evento), numero):
+            return None
+
+    prenotazione = {
+        'evento': str(id_evento),
+        'acquirente': id_acquirente,
+        'quantita': numero,
+        'scadenza': datetime.now() + durata
+    }
+    try:
+        prenotazione['_id'] = get_db()[COLLEZIONE_PRENOTAZIONI_BIGLIETTI].insert_one(prenotazione).inserted_id
+    except Exception:
+        _restituisci_biglietti(id_evento, numero)
+        raise
+    finally:
+        invalida_catalogo()
+    return {'id': str(prenotazione['_id']), 'scadenza': prenotazione['scadenza']}
+
+
+def conferma_prenotazione(id_prenotazione, id_acquirente):
+    """
+    Trasforma una prenotazione non ancora scaduta nel Biglietto dell'acquirente.
+
+    :param id_prenotazione: (str) id della prenotazione
+    :param id_acquirente: (str) id dell'utente che ha prenotato
+
+    :return: True se il biglietto è stato salvato, False se la prenotazione non esiste, è di un altro utente o è
+        scaduta
+    """
+    from ..InterfacciaPersistenza import EventoPubblico
+    if not ObjectId.is_valid(id_prenotazione):
+        return False
+    db = get_db()
+    prenotazioni = db[COLLEZIONE_PRENOTAZIONI_BIGLIETTI]
+    prenotazione = prenotazioni.find_one_and_delete({'_id': ObjectId(id_prenotazione), 'acquirente': id_acquirente,
+                                                     'scadenza': {'$gt': datetime.now()}})
+    if prenotazione is None:
+        return False
+
+    try:
+        evento_data = db['Evento'].find_one({'_id': ObjectId(prenotazione['evento'])}, proiezione('Evento'))
+        evento = EventoPubblico.EventoPubblico(evento_data, evento_data)
+        db['Biglietto'].insert_one({
+            "Evento_associato": prenotazione['evento'],
+            "CompratoDa": id_acquirente,
+            "DataEvento": evento.data_evento,
+            "Dove": evento.luogo,
+            "Ora": evento.ora,
+            "Quantità": prenotazione['quantita'],
+            'NomeEvento': evento.nome
+        })
+    except Exception:
+        prenotazioni.insert_one(prenotazione)
+        raise
+    return True
+
+
+def annulla_prenotazione(id_prenotazione, id_acquirente):
+    """
+    Annulla una prenotazione e restituisce i suoi biglietti all'evento.
+
+    :param id_prenotazione: (str) id della prenotazione
+    :param id_acquirente: (str) id dell'utente che ha prenotato
+
+    :return: True se la prenotazione è stata annullata
+    """
+    if not ObjectId.is_valid(id_prenotazione):
+        return False
+    prenotazione = get_db()[COLLEZIONE_PRENOTAZIONI_BIGLIETTI].find_one_and_delete(
+        {'_id': ObjectId(id_prenotazione), 'acquirente': id_acquirente})
+    if prenotazione is None:
+        return False
+    _restituisci_biglietti(prenotazione['evento'], prenotazione['quantita'])
+    invalida_catalogo()
+    return True
+
+
+def rilascia_prenotazioni_scadute(id_evento=None, adesso=None):
+    """
+    Cancella le prenotazioni scadute e restituisce i loro biglietti agli eventi. Ogni prenotazione viene tolta con
+    find_one_and_delete, così anche con più processi che rilasciano insieme i biglietti vengono restituiti una volta
+    sola.
+
+    :param id_evento: (str) rilascia solo le prenotazioni di questo evento, None per tutti gli eventi
+    :param adesso: (datetime) istante rispetto a cui valutare la scadenza, di default l'ora corrente
+
+    :return: numero di prenotazioni rilasciate
+    """
+    filtro = {'scadenza': {'$lte': adesso or datetime.now()}}
+    if id_evento is not None:
+        filtro['evento'] = str(id_evento)
+
+    prenotazioni = get_db()[COLLEZIONE_PRENOTAZIONI_BIGLIETTI]
+    rilasciate = 0
+    while True:
+        prenotazione = prenotazioni.find_one_and_delete(filtro)
+        if prenotazione is None:
+            break
+        _restituisci_biglietti(prenotazione['evento'], prenotazione['quantita'])
+        rilasciate += 1
+    if rilasciate:
+        invalida_catalogo()
+    return rilasciate
+
+
+class WorkerPrenotazioni(threading.Thread):
+    """
+    Thread che ogni intervallo secondi rilascia le prenotazioni scadute di tutti gli eventi, finché non viene fermato.
+
+    Args:
+        intervallo (float): secondi tra un rilascio e il successivo.
+        logger: logger su cui registrare gli errori imprevisti, di default nessuno.
+    """
+
+    def __init__(self, intervallo=INTERVALLO_RILASCIO, logger=None):
+        super().__init__(name='prenotazioni-biglietti', daemon=True)
+        self.intervallo = intervallo
+        self.logger = logger
+        self._fermo = threading.Event()
+
+    def run(self):
+        while not self._fermo.wait(self.intervallo):
+            try:
+                rilascia_prenotazioni_scadute()
+            except Exception as e:
+                if self.logger:
+                    self.logger.warning("Rilascio delle prenotazioni scadute non riuscito: %s", e)
+
+    def ferma(self, attesa=None):
+        self._fermo.set()
+        self.join(attesa)
+
+
+def init_prenotazioni_biglietti(app):
+    """
+    Avvia il worker che rilascia le prenotazioni scadute ogni PRENOTAZIONI_INTERVALLO secondi (da app.config o dalla
+    variabile d'ambiente BEVENT_PRENOTAZIONI_INTERVALLO, default INTERVALLO_RILASCIO); con 0 il worker non viene
+    avviato e le prenotazioni scadute vanno rilasciate con 'flask rilascia-biglietti'.
+
+    :param app: applicazione Flask
+    """
+    global _worker
+    intervallo = float(app.config.get('PRENOTAZIONI_INTERVALLO',
+                                      os.environ.get('BEVENT_PRENOTAZIONI_INTERVALLO', INTERVALLO_RILASCIO)))
+    app.config.setdefault('PRENOTAZIONI_INTERVALLO', intervallo)
+    if intervallo <= 0:
+        app.logger.info("Rilascio automatico delle prenotazioni scadute disattivato")
+        return
+    if _worker is None or not _worker.is_alive():
+        _worker = WorkerPrenotazioni(intervallo, logger=app.logger)
+        _worker.start()
@@ -0,0 +1,114 @@
+"""
+Contatori delle prenotazioni giornaliere dei fornitori, salvati nella collezione supplier_day_bookings: un documento per
+fornitore e giorno ({'fornitore': id, 'data': inizio del giorno, 'prenotazioni': numero di eventi pagati}).
+
+I contatori vengono aggiornati con $inc dai service che salvano, sponsorizzano o eliminano un evento pagato, così la
+disponibilità di un fornitore in una data si verifica con una lettura sull'indice (data, fornitore) invece di contare
+ogni volta gli eventi. registra_prenotazioni incrementa un contatore solo se è ancora sotto EventiMassimiGiornaliero
+del fornitore, nello stesso aggiornamento atomico: due eventi salvati insieme non possono superare il limite anche se
+entrambi hanno trovato il fornitore disponibile. ricostruisci_prenotazioni li ricalcola da zero dagli eventi (comando
+'flask ricostruisci-prenotazioni').
+"""
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from ..db import get_db
+from ..Utils.Conversioni import intervallo_giorno, converti_intero
+
+COLLEZIONE_PRENOTAZIONI = 'supplier_day_bookings'
+
+
+def _giorno_e_fornitori(evento):
+    if not evento or not evento.get('isPagato'):
+        return None, set()
+    giorno, _ = intervallo_giorno(evento.get('Data'))
+    if giorno is None:
+        return None, set()
+    return giorno, {str(id_fornitore) for id_fornitore in evento.get('fornitori_associati') or []}
+
+
+def _aggiorna(giorno, fornitori, variazione):
+    if giorno is None or not fornitori:
+        return
+    operazioni = [UpdateOne({'data': giorno, 'fornitore': id_fornitore},
+                            {'$inc': {'prenotazioni': variazione}}, upsert=True)
+                  for id_fornitore in fornitori]
+    get_db()[COLLEZIONE_PRENOTAZIONI].bulk_write(operazioni, ordered=False)
+
+
+def _massimi_giornalieri(fornitori):
+    id_validi = [ObjectId(id_fornitore) for id_fornitore in fornitori if ObjectId.is_valid(id_fornitore)]
+    massimi = {str(dati['_id']): converti_intero((dati.get('Fornitore') or {}).get('EventiMassimiGiornaliero'))
+               for dati in get_db()['Utente'].find({'_id': {'$in': id_validi}},
+                                                   {'Fornitore.EventiMassimiGiornaliero': 1})}
+    return {id_fornitore: massimi.get(id_fornitore) or 0 for id_fornitore in fornitori}
+
+
+def _prenota_giorno(collezione, giorno, id_fornitore, massimo):
+    filtro = {'data': giorno, 'fornitore': id_fornitore, 'prenotazioni': {'$lt': massimo}}
+    try:
+        # se il contatore del giorno non esiste ancora l'upsert lo crea con 1
+        collezione.update_one(filtro, {'$inc': {'prenotazioni': 1}}, upsert=True)
+        return True
+    except DuplicateKeyError:
+        # il contatore esiste ma non rispetta il filtro (fornitore al completo), oppure è stato appena creato da un
+        # altro evento: in quel caso l'incremento condizionato si può ritentare senza upsert
+        return collezione.update_one(filtro, {'$inc': {'prenotazioni': 1}}).modified_count == 1
+
+
+def registra_prenotazioni(evento):
+    """
+    Conta un evento pagato nelle prenotazioni del giorno di ciascuno dei suoi fornitori. Ogni contatore viene
+    incrementato solo se è sotto EventiMassimiGiornaliero del fornitore; se uno dei fornitori è già al completo gli
+    incrementi fatti vengono annullati e l'evento non viene contato.
+
+    :param evento: (dict) documento dell'evento, con 'Data', 'isPagato' e 'fornitori_associati'
+
+    :return: True se l'evento è stato contato (o non va contato perché non è pagato), False se uno dei fornitori
+        non è più disponibile nel giorno dell'evento
+    """
+    giorno, fornitori = _giorno_e_fornitori(evento)
+    if giorno is None or not fornitori:
+        return True
+    collezione = get_db()[COLLEZIONE_PRENOTAZIONI]
+    prenotati = set()
+    for id_fornitore, massimo in _massimi_giornalieri(fornitori).items():
+        if massimo <= 0 or not _prenota_giorno(collezione, giorno, id_fornitore, massimo):
+            _aggiorna(giorno, prenotati, -1)
+            return False
+        prenotati.add(id_fornitore)
+    return True
+
+
+def annulla_prenotazioni(evento):
+    """
+    Toglie un evento pagato dalle prenotazioni del giorno di ciascuno dei suoi fornitori.
+
+    :param evento: (dict) documento dell'evento, con 'Data', 'isPagato' e 'fornitori_associati'
+    """
+    _aggiorna(*_giorno_e_fornitori(evento), -1)
+
+
+def ricostruisci_prenotazioni():
+    """
+    Ricalcola tutti i contatori dagli eventi pagati (con la data già salvata come datetime, vedi 'flask migra-date') e
+    sostituisce il contenuto della collezione; gli indici della collezione vengono mantenuti.
+
+    :return: numero di coppie (fornitore, giorno) con almeno una prenotazione
+    """
+    db = get_db()
+    db['Evento'].aggregate([
+        {'$match': {'isPagato': True, 'Data': {'$type': 'date'}}},
+        {'$project': {
+            'data': {'$dateFromParts': {'year': {'$year': '$Data'}, 'month': {'$month': '$Data'},
+                                        'day': {'$dayOfMonth': '$Data'}}},
+            # un fornitore ripetuto nello stesso evento viene contato una volta sola
+            'fornitore': {'$setUnion': [{'$ifNull': ['$fornitori_associati', []]}]}
+        }},
+        {'$unwind': '$fornitore'},
+        {'$group': {'_id': {'data': '$data', 'fornitore': '$fornitore'}, 'prenotazioni': {'$sum': 1}}},
+        {'$project': {'_id': 0, 'data': '$_id.data', 'fornitore': '$_id.fornitore', 'prenotazioni': 1}},
+        {'$out': COLLEZIONE_PRENOTAZIONI}
+    ])
+    return db[COLLEZIONE_PRENOTAZIONI].count_documents({})
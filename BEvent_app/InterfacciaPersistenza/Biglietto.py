@@ -1,3 +1,6 @@
+from ..Utils.Conversioni import formatta_data
+
+
 class Biglietto:
     """
         Classe che rappresenta un biglietto per un evento.
@@ -9,7 +12,7 @@ class Biglietto:
             id (str): Identificatore univoco del biglietto.
             evento_associato (str): ID dell'evento associato al biglietto.
             compratore (str): Nome del compratore del biglietto.
-            data_evento (str): Data dell'evento associato al biglietto.
+            data_evento (str): Data dell'evento associato al biglietto nel formato dd-mm-yyyy.
             nome_evento (str): Nome dell'evento associato al biglietto.
             dove (str): Luogo dell'evento associato al biglietto.
             ora (str): Ora dell'evento associato al biglietto.
@@ -24,7 +27,7 @@ class Biglietto:
         self.id = str(biglietto_data['_id'])
         self.evento_associato = biglietto_data['Evento_associato']
         self.compratore = biglietto_data['CompratoDa']
-        self.data_evento = biglietto_data['DataEvento']
+        self.data_evento = formatta_data(biglietto_data['DataEvento'])
         self.nome_evento = biglietto_data['NomeEvento']
         self.dove = biglietto_data['Dove']
         self.ora = biglietto_data['Ora']
@@ -1,5 +1,8 @@
+from functools import cached_property
+
 from ..Fornitori.FornitoriService import get_fornitori
 from ..Utils import Image
+from ..Utils.Conversioni import converti_data, formatta_data
 from ..Utils.Observable import Observable
 
 
@@ -12,14 +15,18 @@ class Evento(Observable):
 
         Attributi:
             id (str): Identificatore univoco dell'evento.
-            data (str): Data dell'evento.
+            data (str): Data dell'evento nel formato dd-mm-yyyy.
+            data_evento (datetime or None): Data dell'evento come salvata nel database.
             n_persone (int): Numero di invitati o posti disponibili per l'evento.
             descrizione (str): Descrizione dell'evento.
-            locandina (Image or None): Locandina dell'evento, convertita da un bytearray.
+            locandina (Image or None): Locandina dell'evento in base64 (solo se caricata), calcolata al primo accesso.
+            url_locandina (str or None): Url da cui scaricare la locandina, None se l'evento non ne ha una.
             ruolo (str): Ruolo dell'evento.
             tipo (str): Tipo dell'evento.
             isPagato (bool): Indica se l'evento è stato pagato.
             fornitori_associati (list): Lista di fornitori associati all'evento.
+            observers (list): Fornitori da avvisare se l'evento viene annullato, caricati dal database solo al primo
+                accesso (ad esempio da notify_observers).
             servizi_associati (list): Lista di servizi associati all'evento.
         """
     def __init__(self, evento_data):
@@ -30,23 +37,37 @@ class Evento(Observable):
                    evento_data (dict): Dati dell'evento.
                """
         self.id = str(evento_data['_id'])
-        self.data = evento_data['Data']
+        self.data_evento = converti_data(evento_data['Data'])
+        self.data = formatta_data(evento_data['Data'])
         self.n_persone = evento_data['Invitati/Posti']
         self.descrizione = evento_data['Descrizione']
 
-        if evento_data.get('Locandina'):
-            try:
-                self.locandina = Image.convert_byte_array_to_image(evento_data['Locandina'])
-            except Exception as e:
-                messaggio = "Errore nella conversione del bytearray in immagine:" + str(e)
-                print(messaggio)
-                self.locandina = None
+        self._locandina_byte = Image.vista_byte(evento_data.get('Locandina'))
+
+        if evento_data.get('LocandinaId'):
+            self.url_locandina = Image.url_media(evento_data['LocandinaId'])
+        elif evento_data.get('HaLocandina', bool(evento_data.get('Locandina'))):
+            self.url_locandina = Image.url_immagine('evento', self.id)
         else:
-            self.locandina = None
+            self.url_locandina = None
 
         self.ruolo = evento_data['Ruolo']
         self.tipo = evento_data['Tipo']
         self.isPagato = bool(evento_data['isPagato'])
         self.fornitori_associati = evento_data.get('fornitori_associati', [])
-        Observable.__init__(self, get_fornitori(self.fornitori_associati))
+        Observable.__init__(self)
         self.servizi_associati = evento_data.get('servizi_associati', [])
+
+    def carica_observers(self):
+        return get_fornitori(self.fornitori_associati)
+
+    @cached_property
+    def locandina(self):
+        if self._locandina_byte is None:
+            return None
+        try:
+            return Image.convert_byte_array_to_image(self._locandina_byte)
+        except Exception as e:
+            messaggio = "Errore nella conversione del bytearray in immagine:" + str(e)
+            print(messaggio)
+            return None
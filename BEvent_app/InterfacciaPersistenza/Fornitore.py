@@ -1,8 +1,8 @@
-import smtplib
-from email.mime.text import MIMEText
+from functools import cached_property
 from ..Utils.Observer import Observer
 from .Utente import Utente
 from ..Utils import Image
+from ..Notifiche.NotificheService import accoda_notifica
 
 
 class Fornitore(Utente, Observer):
@@ -17,7 +17,9 @@ class Fornitore(Utente, Observer):
             descrizione (str): Descrizione del fornitore.
             eventi_max_giornalieri (int): Numero massimo di eventi che il fornitore può gestire al giorno.
             orario_lavoro (str): Orario di lavoro del fornitore.
-            foto (list): Elenco di immagini associate al fornitore.
+            foto (list): Elenco di immagini associate al fornitore in base64 (solo se caricate), calcolato al primo
+                accesso.
+            url_foto (list): Url da cui scaricare le immagini del fornitore.
             citta (str): Città del fornitore.
             via (str): Via del fornitore.
             p_Iva (str): Partita IVA del fornitore.
@@ -39,14 +41,12 @@ class Fornitore(Utente, Observer):
         self.eventi_max_giornalieri = fornitore_info.get('EventiMassimiGiornaliero', 0)
         self.orario_lavoro = fornitore_info.get('OrarioDiLavoro', "Non specificato")
 
-        # Lista foto – se mancano, nessun crash
-        self.foto = []
-        for foto_base64 in fornitore_info.get('Foto', []):
-            try:
-                immagine = Image.convert_byte_array_to_image(foto_base64)
-                self.foto.append(immagine)
-            except Exception as e:
-                print(f"Errore nella conversione dell'immagine: {str(e)}")
+        # Lista foto – se mancano, nessun crash; la conversione in base64 avviene solo se servono
+        self._foto_byte = [Image.vista_byte(foto) for foto in fornitore_info.get('Foto') or []]
+
+        numero_foto = fornitore_data.get('NumeroFoto', len(self._foto_byte))
+        self.url_foto = [Image.url_immagine('fornitore', self.id, indice) for indice in range(numero_foto)]
+        self.url_foto += [Image.url_media(id_foto) for id_foto in fornitore_info.get('FotoIds', [])]
 
         # Altri campi – sicuri
         self.citta = fornitore_info.get('Citta', "Non specificata")
@@ -54,29 +54,21 @@ class Fornitore(Utente, Observer):
         self.p_Iva = fornitore_info.get('Partita_Iva', "Non specificata")
         self.isLocation = fornitore_info.get('isLocation', False)
 
+    @cached_property
+    def foto(self):
+        return Image.converti_immagini(self._foto_byte)
+
     def update(self, observable):
         """
-               Metodo di callback chiamato quando l'evento osservato è stato annullato.
+               Metodo di callback chiamato quando l'evento osservato è stato annullato. L'email al fornitore viene
+               salvata nella outbox delle notifiche e inviata in background.
 
                Args:
                    observable (Observable): L'oggetto osservato che ha emesso l'evento di annullamento.
                """
 
         oggetto = "Annullamento dell'evento"
-        messaggio_corpo = "L'evento in data " + observable.data + ("è stato annullato! Controlla la tua area fornitore "
-                                                                   "per saperne di più! Stiamo avviando le pratiche "
-                                                                   "per il rimborso dell'utente :)")
-        messaggio = MIMEText(messaggio_corpo, 'plain', 'utf-8')
-        messaggio["Subject"] = oggetto
-
-        # Configura la connessione SMTP
-        email = smtplib.SMTP("smtp.gmail.com", 587)
-        email.ehlo()
-        email.starttls()
-        email.login("beventc13@gmail.com", "hmbq mcps rmom oiou")
-
-        # Invia l'email
-        email.sendmail("beventc13@gmail.com", "simonettidaria@gmail.com", messaggio.as_string())
-
-        # Chiudi la connessione SMTP
-        email.quit()
+        messaggio_corpo = "L'evento in data " + observable.data + (" è stato annullato! Controlla la tua area "
+                                                                   "fornitore per saperne di più! Stiamo avviando le "
+                                                                   "pratiche per il rimborso dell'utente :)")
+        accoda_notifica(self.email, oggetto, messaggio_corpo)
@@ -0,0 +1,183 @@
+"""
+Indici delle collezioni del database, dichiarati in un solo punto.
+
+Ogni indice ha un nome esplicito: assicura_indici li crea se mancano (l'operazione è idempotente e viene eseguita
+all'avvio dell'applicazione e dal comando 'flask indici'), verifica_indici confronta quelli presenti nel database con
+quelli dichiarati e riporta i mancanti, quelli non dichiarati e quelli mai usati dalle query.
+"""
+import os
+
+from pymongo import ASCENDING, TEXT, IndexModel
+from pymongo.errors import OperationFailure, PyMongoError
+
+from ..db import get_db
+
+INDICI = {
+    'Utente': [
+        # login e registrazione
+        IndexModel([('email', ASCENDING)], name='email'),
+        # fornitori disponibili (Ruolo "3")
+        IndexModel([('Ruolo', ASCENDING)], name='ruolo'),
+    ],
+    'Evento': [
+        # eventi futuri, ordinati per data e _id (l'ordinamento della paginazione con il cursore)
+        IndexModel([('Ruolo', ASCENDING), ('Data', ASCENDING), ('_id', ASCENDING)], name='ruolo_data_id'),
+        # ricerca degli eventi pubblici per categoria e per regione
+        IndexModel([('Ruolo', ASCENDING), ('Tipo', ASCENDING), ('Data', ASCENDING)], name='ruolo_tipo_data'),
+        IndexModel([('Ruolo', ASCENDING), ('EventoPubblico.Regione', ASCENDING), ('Data', ASCENDING)],
+                   name='ruolo_regione_data'),
+        # ricerca degli eventi pubblici per prezzo
+        IndexModel([('Ruolo', ASCENDING), ('EventoPubblico.Prezzo', ASCENDING)], name='ruolo_prezzo'),
+        # eventi di un fornitore e fornitori occupati in una data
+        IndexModel([('fornitori_associati', ASCENDING), ('Data', ASCENDING)], name='fornitori_associati_data'),
+        # servizi già prenotati
+        IndexModel([('servizi_associati', ASCENDING)], name='servizi_associati'),
+        # ricerca per parola nel nome e nella descrizione (una sola per collezione), con lo stemming italiano
+        IndexModel([('EventoPubblico.Nome', TEXT), ('Descrizione', TEXT)], name='testo_eventi',
+                   default_language='italian', weights={'EventoPubblico.Nome': 3, 'Descrizione': 1}),
+        # eventi privati di un organizzatore
+        IndexModel([('EventoPrivato.Organizzatore', ASCENDING), ('Data', ASCENDING)], name='organizzatore_data'),
+    ],
+    'Servizio Offerto': [
+        # servizi correnti di un fornitore
+        IndexModel([('fornitore_associato', ASCENDING), ('isCurrentVersion', ASCENDING)],
+                   name='fornitore_versione'),
+        # filtro dei servizi per prezzo
+        IndexModel([('Prezzo', ASCENDING)], name='prezzo'),
+    ],
+    'Recensione': [
+        IndexModel([('id_valutato', ASCENDING)], name='id_valutato'),
+    ],
+    'Biglietto': [
+        IndexModel([('CompratoDa', ASCENDING)], name='comprato_da'),
+    ],
+    'supplier_day_bookings': [
+        # un contatore per fornitore e giorno, letto per verificare la disponibilità dei fornitori in una data
+        IndexModel([('data', ASCENDING), ('fornitore', ASCENDING)], name='data_fornitore', unique=True),
+    ],
+    'ticket_holds': [
+        # prenotazioni scadute di un evento esaurito, rilasciate quando qualcuno prova a prenotarlo
+        IndexModel([('evento', ASCENDING), ('scadenza', ASCENDING)], name='evento_scadenza'),
+        # prenotazioni scadute di tutti gli eventi, rilasciate da 'flask rilascia-biglietti'
+        IndexModel([('scadenza', ASCENDING)], name='scadenza'),
+    ],
+    'notification_outbox': [
+        # notifiche da consegnare, prese in ordine di prossimo tentativo dal worker delle notifiche
+        IndexModel([('stato', ASCENDING), ('prossimo_tentativo', ASCENDING)], name='stato_prossimo_tentativo'),
+    ],
+}
+
+
+def _chiavi(indice):
+    chiavi = []
+    for campo, verso in indice.items():
+        if verso == TEXT or campo in ('_fts', '_ftsx'):
+            # nel database un indice di testo ha le chiavi _fts/_ftsx al posto dei campi indicizzati
+            if ('_fts', TEXT) not in chiavi:
+                chiavi += [('_fts', TEXT), ('_ftsx', 1)]
+        else:
+            chiavi.append((campo, verso if isinstance(verso, str) else int(verso)))
+    return tuple(chiavi)
+
+
+def _indici_presenti(collezione):
+    """
+    Restituisce gli indici della collezione (escluso quello su _id) come dizionario nome -> chiavi.
+    """
+    return {nome: _chiavi(dict(informazioni['key'])) for nome, informazioni in collezione.index_information().items()
+            if nome != '_id_'}
+
+
+def _trova(indice, presenti):
+    """
+    Restituisce il nome con cui l'indice dichiarato è presente nel database (stesso nome o stesse chiavi), None se manca.
+    """
+    nome = indice.document['name']
+    if nome in presenti:
+        return nome
+    chiavi = _chiavi(indice.document['key'])
+    return next((presente for presente, chiavi_presenti in presenti.items() if chiavi_presenti == chiavi), None)
+
+
+def assicura_indici(db=None):
+    """
+    Crea gli indici dichiarati in INDICI che non esistono ancora. Un indice già presente con le stesse chiavi (anche
+    con un altro nome) viene considerato esistente; un indice con lo stesso nome ma chiavi diverse non viene modificato
+    e viene riportato come conflitto.
+
+    :param db: database su cui creare gli indici (di default quello dell'applicazione)
+
+    :return: dizionario con, per ogni collezione, gli indici creati e quelli in conflitto
+    """
+    db = get_db() if db is None else db
+    risultato = {}
+    for collezione, indici in INDICI.items():
+        presenti = _indici_presenti(db[collezione])
+        creati, conflitti = [], []
+        for indice in indici:
+            nome = indice.document['name']
+            if _trova(indice, presenti):
+                continue
+            try:
+                db[collezione].create_indexes([indice])
+                creati.append(nome)
+            except OperationFailure as e:
+                conflitti.append(f"{nome}: {e.details.get('errmsg', str(e)) if e.details else str(e)}")
+        risultato[collezione] = {'creati': creati, 'conflitti': conflitti}
+    return risultato
+
+
+def init_indici(app):
+    """
+    Crea all'avvio dell'applicazione gli indici mancanti. Si disattiva impostando ASSICURA_INDICI a False in app.config
+    oppure la variabile d'ambiente BEVENT_ASSICURA_INDICI=0. Se il database non è raggiungibile l'avvio prosegue e
+    l'errore viene solo registrato nel log.
+
+    :param app: applicazione Flask
+    """
+    attivo = app.config.get('ASSICURA_INDICI', os.environ.get('BEVENT_ASSICURA_INDICI', '1'))
+    if attivo in (False, '0', 'false', 'False'):
+        return
+    try:
+        for collezione, stato in assicura_indici().items():
+            if stato['creati']:
+                app.logger.info("Indici creati su %s: %s", collezione, stato['creati'])
+            for conflitto in stato['conflitti']:
+                app.logger.warning("Indice in conflitto su %s: %s", collezione, conflitto)
+    except PyMongoError as e:
+        app.logger.warning("Impossibile verificare gli indici all'avvio: %s", e)
+
+
+def _accessi_indici(collezione):
+    """
+    Restituisce il numero di operazioni che hanno usato ciascun indice dall'avvio del server ($indexStats), oppure
+    None se l'utente del database non ha i permessi per leggerlo.
+    """
+    try:
+        return {statistica['name']: statistica['accesses']['ops']
+                for statistica in collezione.aggregate([{'$indexStats': {}}])}
+    except OperationFailure:
+        return None
+
+
+def verifica_indici(db=None):
+    """
+    Confronta gli indici presenti nel database con quelli dichiarati in INDICI.
+
+    :param db: database da controllare (di default quello dell'applicazione)
+
+    :return: dizionario con, per ogni collezione, gli indici dichiarati ma mancanti ('mancanti'), quelli presenti ma
+    non dichiarati ('non_dichiarati') e quelli mai usati da una query dall'avvio del server ('inutilizzati')
+    """
+    db = get_db() if db is None else db
+    risultato = {}
+    for collezione, indici in INDICI.items():
+        presenti = _indici_presenti(db[collezione])
+        trovati = {indice.document['name']: _trova(indice, presenti) for indice in indici}
+        accessi = _accessi_indici(db[collezione]) or {}
+        risultato[collezione] = {
+            'mancanti': [nome for nome, presente in trovati.items() if presente is None],
+            'non_dichiarati': [nome for nome in presenti if nome not in trovati.values()],
+            'inutilizzati': [nome for nome in presenti if accessi.get(nome) == 0],
+        }
+    return risultato
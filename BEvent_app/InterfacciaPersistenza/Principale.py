@@ -0,0 +1,27 @@
+from flask_login import UserMixin
+
+
+class Principale(UserMixin):
+    """
+        Utente autenticato come lo vede Flask-Login a ogni richiesta: contiene solo i dati che servono a riconoscerlo,
+        senza le foto e gli altri campi del profilo.
+
+        Args:
+            user_data (dict): Dati dell'utente, letti con la proiezione PRINCIPALE.
+
+        Attributi:
+            id (str): Identificatore univoco dell'utente.
+            ruolo (str): Ruolo dell'utente.
+            nome_utente (str): Nome utente dell'utente.
+            regione (str): Regione di residenza dell'utente.
+            is_location (bool): Indica se il fornitore è una location (False per gli altri ruoli).
+        """
+    def __init__(self, user_data):
+        self.id = str(user_data['_id'])
+        self.ruolo = user_data['Ruolo']
+        self.nome_utente = user_data.get('nome_utente')
+        self.regione = user_data.get('regione')
+        self.is_location = user_data.get('Fornitore', {}).get('isLocation', False)
+
+    def get_id(self):
+        return self.id
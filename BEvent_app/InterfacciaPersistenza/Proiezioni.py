@@ -0,0 +1,102 @@
+"""
+Insiemi di campi (proiezioni) da usare nelle query sulle collezioni del database.
+
+Ogni collezione ha tre livelli:
+    card (CARD): solo i campi testuali necessari a costruire gli oggetti del modello e a mostrarli nelle liste; le
+        immagini non vengono mai caricate, al loro posto ci sono gli id dei file dell'archivio media (e, per i
+        documenti non ancora migrati, solo l'informazione su quante immagini contengono).
+    detail (DETTAGLIO): i campi della card più le immagini.
+    full (COMPLETA): il documento intero (nessuna proiezione).
+
+Per gli utenti c'è anche il livello principal (PRINCIPALE), con i soli campi dell'utente autenticato usati da
+Flask-Login a ogni richiesta.
+"""
+
+CARD = 'card'
+DETTAGLIO = 'detail'
+COMPLETA = 'full'
+PRINCIPALE = 'principal'
+
+
+def _numero_elementi(campo):
+    return {'$cond': [{'$isArray': '$' + campo}, {'$size': '$' + campo}, 0]}
+
+
+_CARD_UTENTE = {
+    'nome': 1,
+    'cognome': 1,
+    'data_di_nascita': 1,
+    'email': 1,
+    'telefono': 1,
+    'nome_utente': 1,
+    'password': 1,
+    'Ruolo': 1,
+    'regione': 1,
+    'Organizzatore': 1,
+    'Fornitore.Descrizione': 1,
+    'Fornitore.EventiMassimiGiornaliero': 1,
+    'Fornitore.OrarioDiLavoro': 1,
+    'Fornitore.Citta': 1,
+    'Fornitore.Via': 1,
+    'Fornitore.Partita_Iva': 1,
+    'Fornitore.isLocation': 1,
+    'Fornitore.FotoIds': 1,
+    'NumeroFoto': _numero_elementi('Fornitore.Foto')
+}
+
+_CARD_EVENTO = {
+    'Data': 1,
+    'Descrizione': 1,
+    'Tipo': 1,
+    'Invitati/Posti': 1,
+    'Ruolo': 1,
+    'isPagato': 1,
+    'fornitori_associati': 1,
+    'servizi_associati': 1,
+    'EventoPubblico': 1,
+    'EventoPrivato': 1,
+    'LocandinaId': 1,
+    'HaLocandina': {'$gt': [{'$binarySize': {'$ifNull': ['$Locandina', '']}}, 0]}
+}
+
+_CARD_SERVIZIO = {
+    'Descrizione': 1,
+    'Tipo': 1,
+    'Prezzo': 1,
+    'Quantità': 1,
+    'isCurrentVersion': 1,
+    'isDeleted': 1,
+    'fornitore_associato': 1,
+    'FotoServizioIds': 1,
+    'NumeroFoto': _numero_elementi('FotoServizio')
+}
+
+_PROIEZIONI = {
+    'Utente': {
+        CARD: _CARD_UTENTE,
+        DETTAGLIO: {**_CARD_UTENTE, 'Fornitore.Foto': 1},
+        PRINCIPALE: {'Ruolo': 1, 'nome_utente': 1, 'regione': 1, 'Fornitore.isLocation': 1},
+    },
+    'Evento': {
+        CARD: _CARD_EVENTO,
+        DETTAGLIO: {**_CARD_EVENTO, 'Locandina': 1},
+    },
+    'Servizio Offerto': {
+        CARD: _CARD_SERVIZIO,
+        DETTAGLIO: {**_CARD_SERVIZIO, 'FotoServizio': 1},
+    },
+}
+
+
+def proiezione(collezione, livello=CARD):
+    """
+    Restituisce la proiezione da passare a find/find_one (o a uno stage $project) per una collezione.
+
+    :param collezione: (str) nome della collezione, es. 'Evento'
+    :param livello: (str) CARD, DETTAGLIO, COMPLETA (o PRINCIPALE per gli utenti)
+
+    :return: dizionario della proiezione, oppure None per il livello COMPLETA (documento intero)
+    """
+    if livello == COMPLETA:
+        return None
+    return dict(_PROIEZIONI[collezione][livello])
@@ -1,4 +1,6 @@
 
+from functools import cached_property
+
 from ..Utils import Image
 
 
@@ -14,7 +16,9 @@ class ServizioOfferto:
            descrizione (str): Descrizione del servizio.
            tipo (str): Tipo del servizio.
            prezzo (float): Prezzo del servizio.
-           foto_servizio (list): Elenco di immagini associate al servizio.
+           foto_servizio (list): Elenco di immagini associate al servizio in base64 (solo se caricate), calcolato al
+               primo accesso.
+           url_foto_servizio (list): Url da cui scaricare le immagini del servizio.
            isCurrentVersion (bool): Indica se il servizio è la versione corrente.
            isDeleted (bool): Indica se il servizio è stato eliminato.
            fornitore_associato (str): ID del fornitore associato al servizio.
@@ -30,14 +34,17 @@ class ServizioOfferto:
         self.descrizione = service_data['Descrizione']
         self.tipo = service_data['Tipo']
         self.prezzo = service_data['Prezzo']
-        self.foto_servizio = []
         self.isCurrentVersion = service_data['isCurrentVersion'],
         self.isDeleted = service_data['isDeleted'],
-        for foto_base64 in service_data['FotoServizio']:
-            try:
-                immagine = Image.convert_byte_array_to_image(foto_base64)
-                self.foto_servizio.append(immagine)
-            except Exception as e:
-                print(f"Errore nella conversione dell'array di byte in immagine: {str(e)}")
+        foto = service_data.get('FotoServizio')
+        self._foto_servizio_byte = [Image.vista_byte(dati) for dati in foto] if isinstance(foto, list) else []
+
+        numero_foto = service_data.get('NumeroFoto', len(self._foto_servizio_byte))
+        self.url_foto_servizio = [Image.url_immagine('servizio', self._id, indice) for indice in range(numero_foto)]
+        self.url_foto_servizio += [Image.url_media(id_foto) for id_foto in service_data.get('FotoServizioIds', [])]
 
         self.fornitore_associato = service_data['fornitore_associato']
+
+    @cached_property
+    def foto_servizio(self):
+        return Image.converti_immagini(self._foto_servizio_byte)
@@ -0,0 +1,102 @@
+from flask import Blueprint, Response, abort, request
+from werkzeug.wsgi import wrap_file
+
+from .MediaService import apri_media, apri_variante, get_locandina_evento, get_foto_fornitore, get_foto_servizio
+from ..Utils import Image
+
+media = Blueprint('media', __name__)
+
+# un file dell'archivio non cambia mai, quindi il browser può tenerlo in cache per un anno
+DURATA_CACHE_MEDIA = 365 * 24 * 60 * 60
+# al posto di una variante non ancora generata si restituisce l'originale, ma solo per poco: la variante arriverà
+DURATA_CACHE_SENZA_VARIANTE = 60 * 60
+
+
+@media.route('/media/<id_media>')
+def scarica_media(id_media):
+    """
+    Restituisce un'immagine dell'archivio leggendola a blocchi. La risposta ha ETag, Last-Modified e Cache-Control,
+    e alle richieste condizionali (If-None-Match, If-Modified-Since) risponde 304 senza inviare il contenuto.
+
+    :return: immagine, 404 se il file non esiste
+    """
+    file_media = apri_media(id_media)
+    if file_media is None:
+        abort(404)
+    return _risposta_media(file_media, id_media)
+
+
+@media.route('/media/<id_media>/<variante>')
+def scarica_variante_media(id_media, variante):
+    """
+    Restituisce una variante ridotta di un'immagine dell'archivio: WebP se il browser lo accetta, altrimenti JPEG
+    progressivo. Le immagini che non hanno ancora varianti vengono restituite a dimensione piena.
+
+    :return: immagine, 404 se la variante non è prevista o l'immagine non esiste
+    """
+    if variante not in Image.VARIANTI:
+        abort(404)
+    formati = ['webp', 'jpeg'] if request.accept_mimetypes['image/webp'] else ['jpeg']
+    file_media = apri_variante(id_media, variante, formati)
+    durata = DURATA_CACHE_MEDIA
+    if file_media is None:
+        file_media = apri_media(id_media)
+        durata = DURATA_CACHE_SENZA_VARIANTE
+    if file_media is None:
+        abort(404)
+    risposta = _risposta_media(file_media, id_media, durata)
+    risposta.vary.add('Accept')
+    return risposta
+
+
+def _risposta_media(file_media, id_media, durata=DURATA_CACHE_MEDIA):
+    metadati = file_media.metadata or {}
+    # GridOut iterato direttamente si divide sulle righe (b'\n'): per i file binari si legge a blocchi di dimensione
+    # fissa con wrap_file, che usa anche il file_wrapper del server WSGI se disponibile
+    risposta = Response(wrap_file(request.environ, file_media), mimetype=metadati.get('content_type', 'image/jpeg'),
+                        direct_passthrough=True)
+    risposta.content_length = file_media.length
+    risposta.set_etag(metadati.get('etag', id_media))
+    risposta.last_modified = file_media.upload_date
+    risposta.cache_control.public = True
+    risposta.cache_control.max_age = durata
+    risposta.cache_control.immutable = durata == DURATA_CACHE_MEDIA
+    return risposta.make_conditional(request)
+
+
+# Le route /immagine/... leggono le immagini ancora salvate dentro i documenti, finché non vengono spostate
+# nell'archivio con il comando 'flask migra-media'.
+def _risposta_immagine(immagine):
+    if immagine is None:
+        abort(404)
+    return Response(immagine, mimetype='image/jpeg')
+
+
+@media.route('/immagine/evento/<id_evento>')
+def locandina_evento(id_evento):
+    """
+    Restituisce la locandina di un evento.
+
+    :return: immagine jpeg, 404 se l'evento non ha una locandina
+    """
+    return _risposta_immagine(get_locandina_evento(id_evento))
+
+
+@media.route('/immagine/fornitore/<id_fornitore>/<int:indice>')
+def foto_fornitore(id_fornitore, indice):
+    """
+    Restituisce una foto del fornitore.
+
+    :return: immagine jpeg, 404 se la foto non esiste
+    """
+    return _risposta_immagine(get_foto_fornitore(id_fornitore, indice))
+
+
+@media.route('/immagine/servizio/<id_servizio>/<int:indice>')
+def foto_servizio(id_servizio, indice):
+    """
+    Restituisce una foto di un servizio offerto.
+
+    :return: immagine jpeg, 404 se la foto non esiste
+    """
+    return _risposta_immagine(get_foto_servizio(id_servizio, indice))
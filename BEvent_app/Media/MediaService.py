@@ -0,0 +1,286 @@
+"""
+Archivio delle immagini (locandine degli eventi, foto dei fornitori e dei servizi).
+
+Le immagini sono salvate in GridFS (bucket 'media') e i documenti di Evento, Utente e Servizio Offerto conservano
+solo gli id dei file. Ogni file ha nei metadati un etag (sha1 del contenuto) e il content type, usati dall'endpoint
+/media/<id> per rispondere con header di cache. I file non vengono mai modificati: un'immagine nuova ha un id nuovo.
+
+Le varianti ridotte di un'immagine (vedi Utils.Image.VARIANTI) sono file a parte con nome '<id>/<variante>.<formato>'
+e l'id dell'immagine originale nei metadati; i documenti continuano a conservare solo l'id dell'originale.
+"""
+import hashlib
+import re
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from gridfs import GridFSBucket
+from gridfs.errors import NoFile
+from ..db import get_db
+from ..Utils import Image
+
+BUCKET_MEDIA = 'media'
+
+
+def _id_valido(id_documento):
+    try:
+        return ObjectId(id_documento)
+    except (InvalidId, TypeError):
+        return None
+
+
+def _bucket():
+    return GridFSBucket(get_db(), bucket_name=BUCKET_MEDIA)
+
+
+def _nome_variante(id_media, variante, formato):
+    return f"{id_media}/{variante}.{formato}"
+
+
+def _carica(bucket, id_file, nome, dati, content_type, originale=None):
+    dati = bytes(dati)
+    metadati = {'etag': hashlib.sha1(dati).hexdigest(), 'content_type': content_type}
+    if originale is not None:
+        metadati['originale'] = originale
+    bucket.upload_from_stream_with_id(id_file, nome, dati, metadata=metadati)
+
+
+def salva_varianti(id_media, varianti):
+    """
+    Salva nell'archivio le varianti ridotte di un'immagine già salvata.
+
+    :param id_media: (str) id dell'immagine originale
+    :param varianti: (dict) {(variante, formato): bytes}, come restituito da Utils.Image.genera_varianti
+    """
+    bucket = _bucket()
+    for (variante, formato), dati in varianti.items():
+        _carica(bucket, ObjectId(), _nome_variante(id_media, variante, formato), dati, Image.FORMATI[formato],
+                originale=ObjectId(id_media))
+
+
+def salva_immagine(dati, content_type='image/jpeg', varianti=None):
+    """
+    Salva un'immagine nell'archivio, insieme alle sue varianti ridotte se fornite.
+
+    :param dati: (bytes) contenuto dell'immagine
+    :param content_type: (str) tipo MIME dell'immagine
+    :param varianti: (dict) varianti ridotte, come restituite da Utils.Image.genera_varianti
+
+    :return: (str) id del file salvato
+    """
+    id_file = ObjectId()
+    _carica(_bucket(), id_file, str(id_file), dati, content_type)
+    if varianti:
+        salva_varianti(str(id_file), varianti)
+    return str(id_file)
+
+
+def salva_immagini(immagini):
+    """
+    Salva più immagini nell'archivio.
+
+    :param immagini: (list) immagini elaborate, cioè tuple (jpeg, varianti) come restituite da
+    Utils.Image.elabora_immagini, oppure contenuti jpeg senza varianti
+
+    :return: (list) id dei file salvati, nello stesso ordine
+    """
+    id_salvati = []
+    for immagine in immagini:
+        if isinstance(immagine, tuple):
+            id_salvati.append(salva_immagine(immagine[0], varianti=immagine[1]))
+        elif immagine:
+            id_salvati.append(salva_immagine(immagine))
+    return id_salvati
+
+
+def apri_media(id_media):
+    """
+    Apre in lettura un file dell'archivio. Il contenuto viene letto a blocchi solo quando si itera sul file.
+
+    :param id_media: (str) id del file
+
+    :return: GridOut con length, upload_date e metadata, None se il file non esiste
+    """
+    id_obj = _id_valido(id_media)
+    if id_obj is None:
+        return None
+    try:
+        return _bucket().open_download_stream(id_obj)
+    except NoFile:
+        return None
+
+
+def apri_variante(id_media, variante, formati):
+    """
+    Apre in lettura una variante ridotta di un'immagine, nel primo dei formati richiesti che è disponibile.
+
+    :param id_media: (str) id dell'immagine originale
+    :param variante: (str) una delle chiavi di Utils.Image.VARIANTI
+    :param formati: (list) formati accettati, in ordine di preferenza (chiavi di Utils.Image.FORMATI)
+
+    :return: GridOut della variante, None se l'immagine non ha varianti
+    """
+    if _id_valido(id_media) is None:
+        return None
+    bucket = _bucket()
+    for formato in formati:
+        try:
+            return bucket.open_download_stream_by_name(_nome_variante(id_media, variante, formato))
+        except NoFile:
+            continue
+    return None
+
+
+def elimina_media(id_media):
+    """
+    Elimina un file dall'archivio, insieme alle sue varianti, se esiste.
+
+    :param id_media: (str) id del file
+    """
+    id_obj = _id_valido(id_media)
+    if id_obj is None:
+        return
+    bucket = _bucket()
+    varianti = get_db()[BUCKET_MEDIA + '.files'].find(
+        {'filename': {'$regex': '^' + re.escape(str(id_obj)) + '/'}}, {'_id': 1})
+    for id_file in [id_obj] + [variante['_id'] for variante in varianti]:
+        try:
+            bucket.delete(id_file)
+        except NoFile:
+            pass
+
+
+def genera_varianti_mancanti(dimensione_blocco=8):
+    """
+    Genera le varianti ridotte delle immagini dell'archivio che non le hanno ancora (ad esempio quelle spostate dalla
+    migrazione o caricate prima che esistessero le varianti). Le immagini vengono elaborate a blocchi sul pool di
+    processi di Utils.Image.
+
+    :param dimensione_blocco: (int) numero di immagini elaborate insieme
+
+    :return: (int) numero di immagini per cui sono state generate le varianti
+    """
+    file_media = get_db()[BUCKET_MEDIA + '.files']
+    bucket = _bucket()
+    originali = file_media.find({'metadata.originale': {'$exists': False}}, {'_id': 1})
+
+    def senza_varianti():
+        for originale in originali:
+            id_media = str(originale['_id'])
+            if not file_media.find_one({'filename': {'$regex': '^' + id_media + '/'}}, {'_id': 1}):
+                yield id_media
+
+    generate = 0
+    blocco = []
+    for id_media in senza_varianti():
+        blocco.append(id_media)
+        if len(blocco) == dimensione_blocco:
+            generate += _genera_blocco(bucket, blocco)
+            blocco = []
+    if blocco:
+        generate += _genera_blocco(bucket, blocco)
+    return generate
+
+
+def _genera_blocco(bucket, id_media):
+    contenuti = [bucket.open_download_stream(ObjectId(id_file)).read() for id_file in id_media]
+    for id_file, varianti in zip(id_media, Image.genera_varianti_immagini(contenuti)):
+        if varianti:
+            salva_varianti(id_file, varianti)
+    return len(id_media)
+
+
+def _estrai_immagine(collezione, id_documento, espressione):
+    """
+    Legge dal database una sola immagine di un documento, senza trasferire gli altri campi né le altre immagini.
+    Serve per i documenti le cui immagini non sono ancora state spostate nell'archivio.
+
+    :param collezione: (str) nome della collezione
+    :param id_documento: (str) id del documento
+    :param espressione: espressione di aggregazione che individua l'immagine nel documento
+
+    :return: i byte dell'immagine, None se il documento o l'immagine non esistono
+    """
+    id_obj = _id_valido(id_documento)
+    if id_obj is None:
+        return None
+
+    db = get_db()
+    risultato = list(db[collezione].aggregate([
+        {"$match": {"_id": id_obj}},
+        {"$project": {"_id": 0, "immagine": espressione}}
+    ]))
+    if not risultato or not risultato[0].get('immagine'):
+        return None
+    return bytes(risultato[0]['immagine'])
+
+
+def get_locandina_evento(id_evento):
+    """
+    Recupera la locandina di un evento.
+
+    :param id_evento: (str) id dell'evento
+    :return: byte dell'immagine o None
+    """
+    return _estrai_immagine('Evento', id_evento, '$Locandina')
+
+
+def get_foto_fornitore(id_fornitore, indice):
+    """
+    Recupera una delle foto di un fornitore.
+
+    :param id_fornitore: (str) id del fornitore
+    :param indice: (int) posizione della foto nella lista delle foto del fornitore
+    :return: byte dell'immagine o None
+    """
+    return _estrai_immagine('Utente', id_fornitore, {"$arrayElemAt": ["$Fornitore.Foto", indice]})
+
+
+def get_foto_servizio(id_servizio, indice):
+    """
+    Recupera una delle foto di un servizio offerto.
+
+    :param id_servizio: (str) id del servizio
+    :param indice: (int) posizione della foto nella lista delle foto del servizio
+    :return: byte dell'immagine o None
+    """
+    return _estrai_immagine('Servizio Offerto', id_servizio, {"$arrayElemAt": ["$FotoServizio", indice]})
+
+
+def migra_immagini():
+    """
+    Sposta nell'archivio le immagini ancora salvate dentro i documenti (Locandina, Fornitore.Foto, FotoServizio),
+    sostituendole con gli id dei file (LocandinaId, Fornitore.FotoIds, FotoServizioIds). Ogni documento viene
+    aggiornato appena le sue immagini sono state salvate, quindi la migrazione può essere interrotta e rilanciata.
+    Le varianti ridotte si generano poi con genera_varianti_mancanti.
+
+    :return: (dict) numero di documenti migrati per collezione
+    """
+    db = get_db()
+    migrati = {'Evento': 0, 'Utente': 0, 'Servizio Offerto': 0}
+
+    for evento in db['Evento'].find({'Locandina': {'$exists': True}}, {'Locandina': 1}, batch_size=20):
+        aggiornamento = {'$unset': {'Locandina': ''}}
+        if evento['Locandina']:
+            aggiornamento['$set'] = {'LocandinaId': salva_immagine(evento['Locandina'])}
+        db['Evento'].update_one({'_id': evento['_id']}, aggiornamento)
+        migrati['Evento'] += 1
+
+    for utente in db['Utente'].find({'Fornitore.Foto': {'$exists': True}}, {'Fornitore.Foto': 1}, batch_size=5):
+        id_foto = salva_immagini(utente['Fornitore']['Foto'] or [])
+        db['Utente'].update_one({'_id': utente['_id']}, {
+            '$unset': {'Fornitore.Foto': ''},
+            '$push': {'Fornitore.FotoIds': {'$each': id_foto, '$position': 0}}
+        })
+        migrati['Utente'] += 1
+
+    servizi = db['Servizio Offerto']
+    for servizio in servizi.find({'FotoServizio': {'$exists': True}}, {'FotoServizio': 1}, batch_size=5):
+        foto = servizio['FotoServizio']
+        id_foto = salva_immagini(foto if isinstance(foto, list) else [])
+        servizi.update_one({'_id': servizio['_id']}, {
+            '$unset': {'FotoServizio': ''},
+            '$push': {'FotoServizioIds': {'$each': id_foto, '$position': 0}}
+        })
+        migrati['Servizio Offerto'] += 1
+
+    return migrati
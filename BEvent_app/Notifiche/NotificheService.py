@@ -0,0 +1,270 @@
+"""
+Notifiche email inviate in background tramite una outbox.
+
+Chi deve avvisare un utente (es. Fornitore.update quando un evento viene annullato) salva il messaggio nella collezione
+notification_outbox con accoda_notifica e torna subito; la consegna la fa consegna_notifiche, richiamata dal worker in
+background (WorkerNotifiche, avviato da init_notifiche se NOTIFICHE_WORKER è attivo; se non lo è l'avvio lo segnala
+nel log) oppure dal comando 'flask invia-notifiche'. Il worker tiene aperta una sola connessione SMTP e la riusa tra un
+lotto e l'altro; un messaggio non consegnato viene ritentato con un'attesa che raddoppia a ogni tentativo, fino a
+NOTIFICHE_TENTATIVI.
+
+Ogni chiave di configurazione può essere impostata in app.config oppure come variabile d'ambiente con prefisso BEVENT_
+(es. BEVENT_SMTP_PASSWORD); le credenziali non hanno un valore di default.
+"""
+import os
+import smtplib
+import threading
+from datetime import datetime, timedelta
+from email.mime.text import MIMEText
+
+from ..db import get_db
+
+COLLEZIONE_NOTIFICHE = 'notification_outbox'
+
+IN_ATTESA = 'in_attesa'
+IN_INVIO = 'in_invio'
+FALLITA = 'fallita'
+
+CONFIGURAZIONE_DEFAULT = {
+    'SMTP_HOST': "smtp.gmail.com",
+    'SMTP_PORT': 587,
+    'SMTP_STARTTLS': True,
+    'SMTP_UTENTE': None,
+    'SMTP_PASSWORD': None,
+    'SMTP_MITTENTE': None,
+    'SMTP_TIMEOUT': 30,
+    'NOTIFICHE_LOTTO': 50,
+    'NOTIFICHE_TENTATIVI': 5,
+    'NOTIFICHE_ATTESA_BASE': 30,
+    'NOTIFICHE_INTERVALLO': 5,
+    'NOTIFICHE_WORKER': False,
+}
+
+# errori SMTP che riguardano un solo messaggio: gli altri OSError (connessione, autenticazione) fermano il lotto,
+# perché colpirebbero allo stesso modo anche i messaggi successivi
+ERRORI_DEL_MESSAGGIO = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+
+# un messaggio preso da un worker che non lo ha più aggiornato entro questo tempo (es. processo terminato durante
+# l'invio) torna disponibile per gli altri
+ATTESA_MASSIMA_INVIO = timedelta(minutes=10)
+
+_configurazione = dict(CONFIGURAZIONE_DEFAULT)
+_worker = None
+
+
+def _converti(valore, default):
+    if isinstance(default, bool):
+        return valore not in (False, None, '0', 'false', 'False')
+    if isinstance(default, int):
+        return int(valore)
+    return valore
+
+
+def configura_notifiche(**opzioni):
+    """
+    Aggiorna la configurazione di invio delle notifiche; le opzioni a None mantengono il valore attuale.
+    """
+    for chiave, valore in opzioni.items():
+        if valore is not None:
+            _configurazione[chiave] = _converti(valore, CONFIGURAZIONE_DEFAULT[chiave])
+
+
+def init_notifiche(app):
+    """
+    Legge la configurazione SMTP e dell'outbox dall'applicazione Flask (o dalle variabili d'ambiente BEVENT_) e, se
+    NOTIFICHE_WORKER è attivo, avvia il worker che consegna le notifiche in background; altrimenti lo segnala nel log,
+    perché senza worker le notifiche vengono consegnate solo dal comando 'flask invia-notifiche'.
+
+    :param app: applicazione Flask
+    """
+    configura_notifiche(**{chiave: app.config.get(chiave, os.environ.get('BEVENT_' + chiave))
+                           for chiave in CONFIGURAZIONE_DEFAULT})
+    for chiave, valore in _configurazione.items():
+        app.config.setdefault(chiave, valore)
+    if _configurazione['NOTIFICHE_WORKER']:
+        avvia_worker(logger=app.logger)
+    else:
+        app.logger.warning("Worker delle notifiche disattivato: le email restano nella outbox finché non si esegue "
+                           "'flask invia-notifiche' (o si imposta NOTIFICHE_WORKER=1)")
+
+
+def accoda_notifica(destinatario, oggetto, corpo):
+    """
+    Salva un'email nella outbox, da cui verrà consegnata in background.
+
+    :param destinatario: (str) indirizzo email del destinatario
+    :param oggetto: (str) oggetto dell'email
+    :param corpo: (str) testo dell'email
+
+    :return: id della notifica
+    """
+    adesso = datetime.now()
+    return get_db()[COLLEZIONE_NOTIFICHE].insert_one({
+        'destinatario': destinatario,
+        'oggetto': oggetto,
+        'corpo': corpo,
+        'stato': IN_ATTESA,
+        'tentativi': 0,
+        'prossimo_tentativo': adesso,
+        'creata': adesso
+    }).inserted_id
+
+
+class InviatoreSMTP:
+    """
+    Connessione SMTP aperta alla prima email e riusata per quelle successive; se il server l'ha chiusa viene riaperta.
+
+    Args:
+        configurazione (dict): chiavi SMTP_* da usare, di default quelle impostate con init_notifiche.
+    """
+
+    def __init__(self, configurazione=None):
+        self.configurazione = dict(configurazione or _configurazione)
+        self._smtp = None
+
+    def _connetti(self):
+        configurazione = self.configurazione
+        smtp = smtplib.SMTP(configurazione['SMTP_HOST'], configurazione['SMTP_PORT'],
+                            timeout=configurazione['SMTP_TIMEOUT'])
+        smtp.ehlo()
+        if configurazione['SMTP_STARTTLS']:
+            smtp.starttls()
+            smtp.ehlo()
+        if configurazione['SMTP_UTENTE']:
+            smtp.login(configurazione['SMTP_UTENTE'], configurazione['SMTP_PASSWORD'])
+        return smtp
+
+    def _connessione(self):
+        if self._smtp is None:
+            self._smtp = self._connetti()
+        return self._smtp
+
+    def invia(self, destinatario, oggetto, corpo):
+        """
+        Invia un'email; solleva smtplib.SMTPException (o un altro OSError) se l'invio non riesce.
+        """
+        messaggio = MIMEText(corpo, 'plain', 'utf-8')
+        mittente = self.configurazione['SMTP_MITTENTE'] or self.configurazione['SMTP_UTENTE']
+        messaggio["Subject"] = oggetto
+        messaggio["From"] = mittente
+        messaggio["To"] = destinatario
+        try:
+            self._connessione().sendmail(mittente, [destinatario], messaggio.as_string())
+        except (smtplib.SMTPServerDisconnected, ConnectionError):
+            # il server può aver chiuso la connessione rimasta inattiva: la si riapre una volta sola
+            self.chiudi()
+            self._connessione().sendmail(mittente, [destinatario], messaggio.as_string())
+
+    def chiudi(self):
+        if self._smtp is None:
+            return
+        try:
+            self._smtp.quit()
+        except OSError:
+            self._smtp.close()
+        self._smtp = None
+
+
+def _prendi_notifica(collezione, adesso):
+    return collezione.find_one_and_update(
+        {'$or': [{'stato': IN_ATTESA, 'prossimo_tentativo': {'$lte': adesso}},
+                 {'stato': IN_INVIO, 'preso_il': {'$lte': adesso - ATTESA_MASSIMA_INVIO}}]},
+        {'$set': {'stato': IN_INVIO, 'preso_il': adesso}},
+        sort=[('prossimo_tentativo', 1)]
+    )
+
+
+def consegna_notifiche(inviatore=None, lotto=None):
+    """
+    Consegna un lotto di notifiche in attesa. Ogni notifica viene prima segnata come in invio con
+    find_one_and_update, così più worker possono lavorare sulla stessa outbox senza inviare due volte lo stesso
+    messaggio. Le notifiche consegnate vengono tolte dalla outbox; quelle non consegnate vengono riprogrammate dopo
+    NOTIFICHE_ATTESA_BASE * 2^(tentativi - 1) secondi, oppure segnate come fallite dopo NOTIFICHE_TENTATIVI tentativi.
+    Se il server SMTP non è raggiungibile il lotto si ferma al primo errore; gli altri errori (es. un messaggio che non
+    si riesce a comporre) riguardano solo il messaggio e contano comunque come un tentativo.
+
+    :param inviatore: (InviatoreSMTP) connessione da usare, se None ne viene aperta una solo per questo lotto
+    :param lotto: (int) numero massimo di notifiche da consegnare, di default NOTIFICHE_LOTTO
+
+    :return: dizionario con il numero di notifiche inviate, da ritentare e fallite
+    """
+    collezione = get_db()[COLLEZIONE_NOTIFICHE]
+    esito = {'inviate': 0, 'ritentate': 0, 'fallite': 0}
+    inviatore_del_lotto = inviatore is None
+    inviatore = inviatore or InviatoreSMTP()
+    try:
+        for _ in range(lotto or _configurazione['NOTIFICHE_LOTTO']):
+            notifica = _prendi_notifica(collezione, datetime.now())
+            if notifica is None:
+                break
+            try:
+                inviatore.invia(notifica['destinatario'], notifica['oggetto'], notifica['corpo'])
+            except Exception as e:
+                # ogni errore conta come un tentativo, altrimenti il messaggio resterebbe in invio senza mai fallire
+                tentativi = notifica.get('tentativi', 0) + 1
+                aggiornamento = {'tentativi': tentativi, 'ultimo_errore': str(e)}
+                if tentativi >= _configurazione['NOTIFICHE_TENTATIVI']:
+                    aggiornamento['stato'] = FALLITA
+                    esito['fallite'] += 1
+                else:
+                    attesa = _configurazione['NOTIFICHE_ATTESA_BASE'] * 2 ** (tentativi - 1)
+                    aggiornamento.update(stato=IN_ATTESA, prossimo_tentativo=datetime.now() + timedelta(seconds=attesa))
+                    esito['ritentate'] += 1
+                collezione.update_one({'_id': notifica['_id']}, {'$set': aggiornamento, '$unset': {'preso_il': ''}})
+                if isinstance(e, OSError) and not isinstance(e, ERRORI_DEL_MESSAGGIO):
+                    inviatore.chiudi()
+                    break
+            else:
+                collezione.delete_one({'_id': notifica['_id']})
+                esito['inviate'] += 1
+    finally:
+        if inviatore_del_lotto:
+            inviatore.chiudi()
+    return esito
+
+
+class WorkerNotifiche(threading.Thread):
+    """
+    Thread che consegna le notifiche della outbox finché non viene fermato, riusando la stessa connessione SMTP; quando
+    la outbox è vuota attende NOTIFICHE_INTERVALLO secondi prima di controllarla di nuovo.
+
+    Args:
+        logger: logger su cui registrare gli errori imprevisti, di default nessuno.
+    """
+
+    def __init__(self, logger=None):
+        super().__init__(name='notifiche', daemon=True)
+        self.logger = logger
+        self._fermo = threading.Event()
+
+    def run(self):
+        inviatore = InviatoreSMTP()
+        try:
+            while not self._fermo.is_set():
+                try:
+                    esito = consegna_notifiche(inviatore)
+                except Exception as e:
+                    if self.logger:
+                        self.logger.warning("Consegna delle notifiche non riuscita: %s", e)
+                    esito = None
+                if not esito or not any(esito.values()):
+                    self._fermo.wait(_configurazione['NOTIFICHE_INTERVALLO'])
+        finally:
+            inviatore.chiudi()
+
+    def ferma(self, attesa=None):
+        self._fermo.set()
+        self.join(attesa)
+
+
+def avvia_worker(logger=None):
+    """
+    Avvia il worker delle notifiche del processo corrente, se non è già attivo.
+
+    :return: il worker
+    """
+    global _worker
+    if _worker is None or not _worker.is_alive():
+        _worker = WorkerNotifiche(logger)
+        _worker.start()
+    return _worker
@@ -1,10 +1,11 @@
 from flask import Blueprint, flash, request, jsonify, session
 from flask_login import current_user
 
-from BEvent_app.RicercaEvento.RicercaEventoService import get_eventi, ricerca_eventi_per_parola, serializza_eventi, \
+from BEvent_app.RicercaEvento.RicercaEventoService import ricerca_eventi_per_parola, serializza_eventi, \
     ricerca_eventi_per_categoria, ricerca_eventi_per_regione, ricerca_eventi_per_prezzo, get_evento_by_id, \
-    serializza_eventi_column, get_eventi_sponsorizzati
+    serializza_eventi_column, get_eventi_sponsorizzati, ricerca_eventi_faccette
 from BEvent_app.Routes import ricerca_eventi_page, home
+from BEvent_app.Utils.Paginazione import leggi_paginazione, leggi_cursore
 
 re = Blueprint('re', __name__)
 
@@ -12,15 +13,16 @@ re = Blueprint('re', __name__)
 @re.route('/visualizza_eventi', methods=['GET', 'POST'])
 def visualizza_eventi():
     """
-    Serve a visualizzare la pagina di ricerca degli eventi pubblici. Prende gli eventi pubblici e li restituisce come
-    risposa nella pagina
+    Serve a visualizzare la pagina di ricerca degli eventi pubblici. Prende la prima pagina degli eventi pubblici e i
+    conteggi dei filtri e li restituisce come risposa nella pagina; le pagine successive vengono caricate in Ajax
+    scorrendo la pagina.
 
-    :return: ricercaeventi.html, con la lista di oggetti di tipo evento pubblico passata come parametro
+    :return: ricercaeventi.html, con la pagina di oggetti di tipo evento pubblico e i conteggi passati come parametro
     """
     eventi_sponsorizzati = get_eventi_sponsorizzati()
-    eventi = get_eventi()
+    eventi, faccette = ricerca_eventi_faccette({})
     if eventi:
-        return ricerca_eventi_page(eventi=eventi, eventi_sponsorizzati=eventi_sponsorizzati)
+        return ricerca_eventi_page(eventi=eventi, eventi_sponsorizzati=eventi_sponsorizzati, faccette=faccette)
     else:
         flash("Errore di sissstema")
         return home()
@@ -30,21 +32,26 @@ def visualizza_eventi():
 def filtro_barra_ricerca():
     """
     Serve  a elaborare una richiesta in Ajax e in base ad una parola passata come parametro restituisce la lista degli
-    eventi che contengono tale parola.
+    eventi che contengono tale parola, ordinati per pertinenza. I parametri opzionali 'pagina' e 'dimensione_pagina'
+    scelgono la pagina.
 
-    :return:  Risposta in formato JSON che contiene una lista di oggetti: eventi_filtrati(di tipo Evento Pubblico)
+    :return:  Risposta in formato JSON che contiene una pagina di oggetti: eventi_filtrati(di tipo Evento Pubblico) e i
+    dati della paginazione (totale, pagina, dimensione_pagina, pagine,
+    cursore_successivo)
     """
     try:
         data = request.get_json()
         if 'ricerca' in data:
             ricerca = data['ricerca']
-            eventi_filtrati = ricerca_eventi_per_parola(ricerca)
+            pagina, dimensione_pagina = leggi_paginazione(data)
+            eventi_filtrati = ricerca_eventi_per_parola(ricerca, pagina, dimensione_pagina)
 
             if eventi_filtrati:
                 eventi_serializzati = [serializza_eventi(evento) for evento in eventi_filtrati]
 
                 return jsonify({
-                    'eventi_filtrati': eventi_serializzati
+                    'eventi_filtrati': eventi_serializzati,
+                    **eventi_filtrati.come_dizionario()
                 }), 200
             else:
                 return jsonify({"errore": "nessuna corrispondenza nel db"}), 200
@@ -55,26 +62,57 @@ def filtro_barra_ricerca():
         return jsonify({"errore": str(e)}), 500
 
 
+@re.route('/ricerca_eventi', methods=['POST'])
+def ricerca_eventi():
+    """
+    Serve a elaborare una richiesta in Ajax che combina tutti i filtri degli eventi ('ricerca', 'categoria', 'regione',
+    'prezzo_min', 'prezzo_max', tutti opzionali) e restituisce in una sola risposta la pagina di eventi trovati e i
+    conteggi di ogni filtro. I parametri opzionali 'pagina' e 'dimensione_pagina' scelgono la pagina; per le pagine
+    successive si può passare il 'cursore' ricevuto con la pagina precedente (senza ricalcolare totale e conteggi).
+
+    :return: Risposta in formato JSON che contiene una pagina di oggetti: eventi_filtrati (di tipo Evento Pubblico), i
+    dati della paginazione (totale, pagina, dimensione_pagina, pagine, cursore_successivo) e i conteggi: faccette
+    (categorie, regioni, prezzi). Per le pagine chieste con il cursore totale, pagine e faccette sono null
+    """
+    try:
+        data = request.get_json() or {}
+        pagina, dimensione_pagina = leggi_paginazione(data)
+        eventi_filtrati, faccette = ricerca_eventi_faccette(data, pagina, dimensione_pagina, leggi_cursore(data))
+
+        return jsonify({
+            'eventi_filtrati': [serializza_eventi(evento) for evento in eventi_filtrati],
+            **eventi_filtrati.come_dizionario(),
+            'faccette': faccette
+        }), 200
+
+    except Exception as e:
+        return jsonify({"errore": str(e)}), 500
+
+
 @re.route('/filtro_categorie_eventi', methods=['POST'])
 def filtro_categorie_eventi():
     """
     Serve  a elaborare una richiesta in Ajax e in base alla categoria passata come parametro restituisce la lista degli
-    eventi che appartengono a quel tipo
+    eventi che appartengono a quel tipo. I parametri opzionali 'pagina' e 'dimensione_pagina' scelgono la pagina, il
+    parametro opzionale 'cursore' (ricevuto con la pagina precedente) chiede la pagina successiva.
 
-    :return: risposta in formato JSON che continene una lista di eventi filtrati: eventi_filtrati(lista di oggetti di
-    tipo evento Pubblico)
+    :return: risposta in formato JSON che continene una pagina di eventi filtrati: eventi_filtrati(lista di oggetti di
+    tipo evento Pubblico) e i dati della paginazione (totale, pagina, dimensione_pagina, pagine,
+    cursore_successivo)
     """
     try:
         data = request.get_json()
         if 'categoria' in data:
             categoria = data['categoria']
-            eventi_filtrati = ricerca_eventi_per_categoria(categoria)
+            pagina, dimensione_pagina = leggi_paginazione(data)
+            eventi_filtrati = ricerca_eventi_per_categoria(categoria, pagina, dimensione_pagina, leggi_cursore(data))
 
             if eventi_filtrati:
                 eventi_serializzati = [serializza_eventi(evento) for evento in eventi_filtrati]
 
                 return jsonify({
-                    'eventi_filtrati': eventi_serializzati
+                    'eventi_filtrati': eventi_serializzati,
+                    **eventi_filtrati.come_dizionario()
                 }), 200
 
             else:
@@ -91,22 +129,27 @@ def filtro_categorie_eventi():
 def filtro_regione_eventi():
     """
     Serve  a elaborare una richiesta in Ajax e in base alla regione passata come parametro restituisce la lista degli
-    eventi che si trovano in quella regione
+    eventi che si trovano in quella regione. I parametri opzionali 'pagina' e 'dimensione_pagina' scelgono la pagina,
+    il parametro opzionale 'cursore' (ricevuto con la pagina precedente) chiede la pagina successiva.
 
-    :return: Risposta in formato JSON che continene una lista di oggetti: eventi_filtrati (di tipo Evento Pubblico)
+    :return: Risposta in formato JSON che continene una pagina di oggetti: eventi_filtrati (di tipo Evento Pubblico) e
+    i dati della paginazione (totale, pagina, dimensione_pagina, pagine,
+    cursore_successivo)
     """
     try:
         data = request.get_json()
         if 'regione' in data:
             regione = data['regione']
 
-            eventi_filtrati = ricerca_eventi_per_regione(regione)
+            pagina, dimensione_pagina = leggi_paginazione(data)
+            eventi_filtrati = ricerca_eventi_per_regione(regione, pagina, dimensione_pagina, leggi_cursore(data))
 
             if eventi_filtrati:
                 eventi_serializzati = [serializza_eventi(evento) for evento in eventi_filtrati]
 
                 return jsonify({
-                    'eventi_filtrati': eventi_serializzati
+                    'eventi_filtrati': eventi_serializzati,
+                    **eventi_filtrati.come_dizionario()
                 }), 200
 
             else:
@@ -123,9 +166,13 @@ def filtro_regione_eventi():
 def filtro_prezzo_eventi():
     """
     Serve  a elaborare una richiesta in Ajax e in base a un prezzo minimo e un prezzo massimo passati come parametri
-    restituisce la lista dei eventi che hanno un prezzo compreso nel range
+    restituisce la lista dei eventi che hanno un prezzo compreso nel range. I parametri opzionali 'pagina' e
+    'dimensione_pagina' scelgono la pagina, il parametro opzionale 'cursore' (ricevuto con la pagina precedente) chiede
+    la pagina successiva.
 
-    :return: Risposta in formato JSON che continene una lista di oggetti: eventi_filtrati(di tipo Evento Pubblico)
+    :return: Risposta in formato JSON che continene una pagina di oggetti: eventi_filtrati(di tipo Evento Pubblico) e
+    i dati della paginazione (totale, pagina, dimensione_pagina, pagine,
+    cursore_successivo)
     """
     try:
         data = request.get_json()
@@ -133,13 +180,16 @@ def filtro_prezzo_eventi():
             prezzo_max = data['prezzo_max']
             prezzo_min = data['prezzo_min']
 
-            eventi_filtrati = ricerca_eventi_per_prezzo(prezzo_min, prezzo_max)
+            pagina, dimensione_pagina = leggi_paginazione(data)
+            eventi_filtrati = ricerca_eventi_per_prezzo(prezzo_min, prezzo_max, pagina, dimensione_pagina,
+                                                        leggi_cursore(data))
 
             if eventi_filtrati:
                 eventi_serializzati = [serializza_eventi(evento) for evento in eventi_filtrati]
 
                 return jsonify({
-                    'eventi_filtrati': eventi_serializzati
+                    'eventi_filtrati': eventi_serializzati,
+                    **eventi_filtrati.come_dizionario()
                 }), 200
 
             else:
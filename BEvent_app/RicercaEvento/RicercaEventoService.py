@@ -1,105 +1,165 @@
+import copy
 from datetime import datetime
 from flask import flash
 from bson import ObjectId
 from ..db import get_db
 from ..InterfacciaPersistenza.EventoPubblico import EventoPubblico
+from ..InterfacciaPersistenza.Proiezioni import proiezione
+from ..Utils import Image
+from ..Utils.Cache import CacheTTL
+from ..Utils.Conversioni import intervallo_numerico
+from ..Utils.Paginazione import Pagina, DIMENSIONE_PAGINA, codifica_cursore
+from ..Utils.Faccette import valore_filtro, faccetta_valori, faccetta_prezzo, match_tranne, conteggi, \
+    conteggi_prezzo
+
+# Catalogo pubblico già letto e convertito in oggetti, condiviso tra i visitatori. Viene svuotato da invalida_catalogo
+# quando un evento pubblico viene creato, sponsorizzato, cancellato o cambia il numero di biglietti; la durata limita
+# quanto restano visibili le modifiche fatte da altri worker (e gli eventi appena passati).
+_cache_catalogo = CacheTTL(dimensione_massima=512, durata=60)
+_ASSENTE = object()
+# numero massimo di eventi sponsorizzati mostrati nella colonna "Eventi in Evidenza"
+EVENTI_SPONSORIZZATI_MASSIMI = 10
+
+
+def _in_cache(chiave, calcola):
+    """
+    Restituisce il risultato in cache per la chiave, calcolandolo e salvandolo se manca o è scaduto.
+    La cache conserva una copia del risultato e ogni lettura ne restituisce un'altra, così le pagine e gli eventi
+    modificati da chi li riceve non cambiano quelli condivisi con le altre richieste.
+
+    :param chiave: chiave della ricerca (deve essere hashable)
+    :param calcola: funzione senza parametri che esegue la ricerca sul database
+    """
+    risultato = _cache_catalogo.get(chiave, _ASSENTE)
+    if risultato is _ASSENTE:
+        risultato = calcola()
+        _cache_catalogo.set(chiave, copy.deepcopy(risultato))
+        return risultato
+    return copy.deepcopy(risultato)
 
 
-def get_eventi():
+def invalida_catalogo():
     """
-    Recupera tutti gli eventi pubblici futuri con biglietti disponibili.
-    Gestisce automaticamente i diversi formati di data (stringa, datetime, None).
+    Svuota la cache del catalogo pubblico, da chiamare dopo ogni modifica agli eventi pubblici.
     """
-    db = get_db()
-    eventi_collection = db['Evento']
+    _cache_catalogo.svuota()
+
+
+def get_statistiche_cache_catalogo():
+    return _cache_catalogo.statistiche()
 
-    eventi_data = list(eventi_collection.find({
+
+def _query_eventi(filtro=None):
+    """
+    Restituisce la query degli eventi pubblici futuri con biglietti disponibili, con le condizioni aggiuntive indicate.
+    """
+    return {
         "Ruolo": "1",
-        "EventoPubblico.BigliettiDisponibili": {"$ne": "0"}
-    }))
-
-    lista_eventi = []
-    oggi = datetime.now()
-
-    for data in eventi_data:
-        data_evento_raw = data.get("Data")
-
-        try:
-            # Se la data è già datetime
-            if isinstance(data_evento_raw, datetime):
-                data_evento = data_evento_raw
-            # Se è stringa
-            elif isinstance(data_evento_raw, str):
-                # prova diversi formati (a volte cambia)
-                for fmt in ("%d-%m-%Y", "%Y-%m-%d"):
-                    try:
-                        data_evento = datetime.strptime(data_evento_raw, fmt)
-                        break
-                    except ValueError:
-                        data_evento = None
-            else:
-                data_evento = None
-
-            # Ignora eventi con data non valida o passata
-            if not data_evento or data_evento < oggi:
-                continue
-
-            evento = EventoPubblico(data, data)
-            lista_eventi.append(evento)
-
-        except Exception as e:
-            print(f"⚠️ Errore parsing data evento: {data_evento_raw} -> {e}")
-            continue
-
-    return lista_eventi
-
-
-def get_eventi_sponsorizzati():
+        "Data": {"$gte": datetime.now()},
+        "EventoPubblico.BigliettiDisponibili": {"$gt": 0},
+        **(filtro or {})
+    }
+
+
+def get_eventi(filtro=None):
     """
-    Recupera gli eventi sponsorizzati (isPagato=True) futuri con biglietti disponibili.
-    Gestisce automaticamente date non stringa o malformate.
+    Recupera tutti gli eventi pubblici futuri con biglietti disponibili, ordinati per data. Il filtro sulla data e
+    l'ordinamento vengono eseguiti dal database.
+
+    :param filtro: (dict) condizioni aggiuntive della query, ad esempio l'intervallo di prezzo
     """
-    db = get_db()
-    eventi_collection = db['Evento']
+    def calcola():
+        eventi_data = get_db()['Evento'].find(_query_eventi(filtro), proiezione('Evento')).sort("Data", 1)
+        return [EventoPubblico(data, data) for data in eventi_data]
 
-    eventi_data = list(eventi_collection.find({
-        "Ruolo": "1",
-        "isPagato": True,
-        "EventoPubblico.BigliettiDisponibili": {"$ne": "0"}
-    }))
+    return _in_cache(('get_eventi', repr(filtro)), calcola)
 
-    lista_eventi_sponsorizzati = []
-    oggi = datetime.now()
 
-    for data in eventi_data:
-        data_evento_raw = data.get("Data")
+def _condizione_cursore(cursore):
+    """
+    Restituisce la condizione che seleziona gli eventi che seguono il cursore nell'ordinamento per (Data, _id), None se
+    il cursore non è valido.
 
-        try:
-            if isinstance(data_evento_raw, datetime):
-                data_evento = data_evento_raw
-            elif isinstance(data_evento_raw, str):
-                for fmt in ("%d-%m-%Y", "%Y-%m-%d"):
-                    try:
-                        data_evento = datetime.strptime(data_evento_raw, fmt)
-                        break
-                    except ValueError:
-                        data_evento = None
-            else:
-                data_evento = None
+    :param cursore: tupla (data, id) letta con leggi_cursore
+    """
+    if not cursore or not ObjectId.is_valid(cursore[1]):
+        return None
+    data, id_evento = cursore[0], ObjectId(cursore[1])
+    return {"$or": [{"Data": {"$gt": data}}, {"Data": data, "_id": {"$gt": id_evento}}]}
 
-            if not data_evento or data_evento < oggi:
-                continue
 
-            evento = EventoPubblico(data, data)
-            lista_eventi_sponsorizzati.append(evento)
+def _pagina_eventi(eventi_data, totale, pagina, dimensione_pagina, con_cursore=True):
+    """
+    Costruisce la Pagina di eventi a partire dai documenti letti, che devono essere al massimo dimensione_pagina + 1:
+    l'elemento in più indica che esiste una pagina successiva e non viene restituito.
+
+    :param con_cursore: (bool) False se i documenti non sono ordinati per (Data, _id), quindi la pagina successiva non
+    si può chiedere con un cursore
+    """
+    eventi = [EventoPubblico(data, data) for data in eventi_data]
+    cursore_successivo = None
+    if len(eventi) > dimensione_pagina:
+        eventi = eventi[:dimensione_pagina]
+        if con_cursore:
+            cursore_successivo = codifica_cursore(eventi[-1].data_evento, eventi[-1].id)
+    return Pagina(eventi, totale, pagina, dimensione_pagina, cursore_successivo)
 
-        except Exception as e:
-            print(f"⚠️ Errore parsing data evento sponsorizzato: {data_evento_raw} -> {e}")
-            continue
 
-    return lista_eventi_sponsorizzati
+def cerca_eventi(filtro=None, pagina=1, dimensione_pagina=DIMENSIONE_PAGINA, cursore=None):
+    """
+    Recupera una pagina degli eventi pubblici futuri con biglietti disponibili che rispettano il filtro, ordinati per
+    data. Filtro, ordinamento, conteggio e paginazione vengono eseguiti dal database, quindi vengono costruiti solo gli
+    oggetti della pagina richiesta.
+    Se è indicato un cursore la pagina parte dall'evento successivo (paginazione keyset su Data e _id, che usa l'indice
+    invece di scorrere le pagine precedenti), altrimenti dal numero di pagina.
+
+    :param filtro: (dict) condizioni aggiuntive della query (categoria, regione, intervallo di prezzo)
+    :param pagina: (int) numero della pagina, a partire da 1
+    :param dimensione_pagina: (int) numero di eventi per pagina
+    :param cursore: tupla (data, id) dell'ultimo evento della pagina precedente, letta con leggi_cursore
+
+    :return: Pagina di oggetti di tipo EventoPubblico, con il numero totale di eventi trovati (None per le pagine
+    chieste con il cursore, che non lo ricontano) e il cursore della pagina successiva
+    """
+    return _in_cache(('cerca_eventi', repr(filtro), pagina, dimensione_pagina, cursore),
+                     lambda: _cerca_eventi(filtro, pagina, dimensione_pagina, cursore))
 
 
+def _cerca_eventi(filtro, pagina, dimensione_pagina, cursore):
+    db = get_db()
+    eventi_collection = db['Evento']
+    query = _query_eventi(filtro)
+
+    condizione_cursore = _condizione_cursore(cursore)
+    if condizione_cursore:
+        # il totale non cambia scorrendo i risultati: il client lo ha già ricevuto con la prima pagina
+        totale = None
+        eventi_data = eventi_collection.find({"$and": [query, condizione_cursore]}, proiezione('Evento'))
+    else:
+        totale = eventi_collection.count_documents(query)
+        salto = (pagina - 1) * dimensione_pagina
+        if salto >= totale:
+            return Pagina([], totale, pagina, dimensione_pagina)
+        eventi_data = eventi_collection.find(query, proiezione('Evento')).skip(salto)
+
+    eventi_data = eventi_data.sort([("Data", 1), ("_id", 1)]).limit(dimensione_pagina + 1)
+
+    return _pagina_eventi(eventi_data, totale, pagina, dimensione_pagina)
+
+
+def get_eventi_sponsorizzati(limite=EVENTI_SPONSORIZZATI_MASSIMI):
+    """
+    Recupera i primi eventi sponsorizzati (isPagato=True) futuri con biglietti disponibili, ordinati per data.
+
+    :param limite: (int) numero massimo di eventi restituiti
+    """
+    def calcola():
+        eventi_data = get_db()['Evento'].find(_query_eventi({"isPagato": True}), proiezione('Evento')) \
+            .sort([("Data", 1), ("_id", 1)]).limit(limite)
+        return [EventoPubblico(data, data) for data in eventi_data]
+
+    return _in_cache(('get_eventi_sponsorizzati', limite), calcola)
+
 
 def serializza_eventi(evento):
     """
@@ -114,7 +174,7 @@ def serializza_eventi(evento):
         'data': evento.data,
         'descrizione': evento.descrizione,
         'n_persone': evento.n_persone,
-        'locandina': evento.locandina,
+        'locandina': Image.url_variante(evento.url_locandina, 'miniatura'),
         'tipo': evento.tipo,
         'fornitori_associati': evento.fornitori_associati,
         'servizi_associati': evento.servizi_associati,
@@ -148,7 +208,7 @@ def serializza_eventi_column(evento, nome_utente):
         'data': evento.data,
         'descrizione': evento.descrizione,
         'n_persone': evento.n_persone,
-        'locandina': evento.locandina,
+        'locandina': Image.url_variante(evento.url_locandina, 'media'),
         'tipo': evento.tipo,
         'fornitori_associati': evento.fornitori_associati,
         'servizi_associati': evento.servizi_associati,
@@ -164,143 +224,145 @@ def serializza_eventi_column(evento, nome_utente):
     return evento
 
 
-def ricerca_eventi_per_parola(ricerca):
+def ricerca_eventi_per_parola(ricerca, pagina=1, dimensione_pagina=DIMENSIONE_PAGINA):
     """
-    Funzione per ottenere dal database la lista eventi pubblici la cui descrizione o nome contiene la parola inserita
+    Funzione per ottenere dal database la lista eventi pubblici il cui nome o descrizione contiene le parole inserite
     dall'organizzatore.
-    -Viene presa la lista di eventi successivi alla data odierna.
-    -Vengono filtrati gli eventi cercando la parola sia nel nome che nella descrizione, creando la lista di eventi da
-    restituire
+    -La ricerca usa l'indice di testo su nome e descrizione (con lo stemming italiano, quindi "concerto" trova anche
+    "concerti"), limitata agli eventi successivi alla data odierna.
+    -Gli eventi sono ordinati per pertinenza (le parole nel nome pesano più di quelle nella descrizione) e poi per data,
+    e restituiti una pagina alla volta.
 
-    :param ricerca: (str) stringa che indica la parola da ricercare
+    :param ricerca: (str) stringa che indica le parole da ricercare
+    :param pagina: (int) numero della pagina, a partire da 1
+    :param dimensione_pagina: (int) numero di eventi per pagina
 
-    :return: una lista filtrata di oggetti: eventi_filtrati (lista di oggetti di tipo Evento Pubblico)
+    :return: Pagina di oggetti di tipo Evento Pubblico, con il numero totale di eventi trovati; None se nessun evento
+    corrisponde alla ricerca
    """
-    eventi_non_filtrati = get_eventi()
+    # una ricerca vuota non filtra gli eventi
+    ricerca = ricerca.strip()
+    eventi = _in_cache(('ricerca_eventi_per_parola', ricerca, pagina, dimensione_pagina),
+                       lambda: _ricerca_eventi_per_parola(ricerca, pagina, dimensione_pagina))
+    if eventi is None:
+        flash("nessun evento trovato", category="warning")
+        return None
 
-    eventi_filtrati_nome = [evento for evento in eventi_non_filtrati if ricerca.lower() in evento.nome.lower()]
+    flash("evento trovato", category="success")
+    return eventi
 
-    eventi_filtrati_descrizione = [evento for evento in eventi_non_filtrati if
-                                   ricerca.lower() in evento.descrizione.lower()]
 
-    eventi_filtrati = None
-    if eventi_filtrati_nome and eventi_filtrati_descrizione:
-        eventi_unici = {}
-        for evento in eventi_filtrati_nome + eventi_filtrati_descrizione:
-            eventi_unici[evento.id] = evento
+def _ricerca_eventi_per_parola(ricerca, pagina, dimensione_pagina):
+    eventi_collection = get_db()['Evento']
+    query = _query_eventi({"$text": {"$search": ricerca}} if ricerca else None)
 
-        eventi_filtrati = list(eventi_unici.values())
-        flash("evento trovato", category="success")
+    totale = eventi_collection.count_documents(query)
+    if totale == 0:
+        return None
 
-    elif eventi_filtrati_nome:
-        eventi_filtrati = eventi_filtrati_nome
-        flash("evento trovato", category="success")
+    salto = (pagina - 1) * dimensione_pagina
+    if salto >= totale:
+        return Pagina([], totale, pagina, dimensione_pagina)
 
-    elif eventi_filtrati_descrizione:
-        eventi_filtrati = eventi_filtrati_descrizione
-        flash("evento trovato", category="success")
+    if "$text" in query:
+        pertinenza = {"$meta": "textScore"}
+        eventi_data = eventi_collection.find(query, {**proiezione('Evento'), "pertinenza": pertinenza}) \
+            .sort([("pertinenza", pertinenza), ("Data", 1), ("_id", 1)])
     else:
-        flash("nessun evento trovato", category="warning")
+        eventi_data = eventi_collection.find(query, proiezione('Evento')).sort([("Data", 1), ("_id", 1)])
+    eventi_data = eventi_data.skip(salto).limit(dimensione_pagina + 1)
 
-    return eventi_filtrati
+    return _pagina_eventi(eventi_data, totale, pagina, dimensione_pagina, con_cursore="$text" not in query)
 
 
-def ricerca_eventi_per_categoria(categoria):
+def ricerca_eventi_per_categoria(categoria, pagina=1, dimensione_pagina=DIMENSIONE_PAGINA, cursore=None):
     """
     Funzione per ottenere dal database la lista di eventi che appartengono alla categoria inserita dall'utente.
-    -Viene presa la lista di tutti gli eventi successivi alla data odierna.
-    -La lista degli eventi viene filtrata per prendere gli eventi che hanno il parametro "tipo" che corrisponde
-    alla categoria indicata.
+    -Vengono presi dal database gli eventi successivi alla data odierna il cui "Tipo" corrisponde alla categoria
+    indicata, una pagina alla volta.
 
     :param categoria: (str) stringa che indica la categoria di eventi che si vuole filtrare
+    :param pagina: (int) numero della pagina, a partire da 1
+    :param dimensione_pagina: (int) numero di eventi per pagina
+    :param cursore: tupla (data, id) dell'ultimo evento della pagina precedente, letta con leggi_cursore
 
-    :return: una lista filtrata di oggetti: eventi_filtrati (lista di oggetti di tipo Evento Pubblico)
+    :return: Pagina di oggetti di tipo Evento Pubblico, con il numero totale di eventi trovati
    """
     if categoria not in ['Conferenze e Seminari', 'Concerti e Spettacoli', 'Mostre ed Esposizioni', 'Corsi e Workshop',
                          'Eventi Benefici', 'Eventi Sociali']:
         if categoria == "Annulla":
-            return get_eventi()
+            return cerca_eventi(pagina=pagina, dimensione_pagina=dimensione_pagina, cursore=cursore)
         else:
             flash("La categoria non esiste", category="error")
-            return []
+            return Pagina()
     elif categoria in ['Conferenze e Seminari', 'Concerti e Spettacoli', 'Mostre ed Esposizioni', 'Corsi e Workshop',
                        'Eventi Benefici', 'Eventi Sociali']:
         flash("La categoria esiste", category="success")
 
-        eventi_non_filtrati = get_eventi()
+        return cerca_eventi({"Tipo": categoria}, pagina, dimensione_pagina, cursore)
 
-        eventi_filtrati = [evento for evento in eventi_non_filtrati if categoria.lower() == evento.tipo.lower()]
-        return eventi_filtrati
 
-
-def ricerca_eventi_per_regione(regione):
+def ricerca_eventi_per_regione(regione, pagina=1, dimensione_pagina=DIMENSIONE_PAGINA, cursore=None):
     """
     Funzione per ottenere dal database la lista di eventi che si trovano nella regione inserita dall' organizzatore.
-    -Viene presa la lista di tutti gli eventi successivi alla data odierna.
-    -La lista degli eventi viene filtrata per prendere gli eventi che hanno il parametro "regione" che corrisponde alla
-    regione indicata.
+    -Vengono presi dal database gli eventi successivi alla data odierna che si trovano nella regione indicata, una
+    pagina alla volta.
 
     :param regione: (str) stringa che indica la regione a cui devono appartenere gli eventi
+    :param pagina: (int) numero della pagina, a partire da 1
+    :param dimensione_pagina: (int) numero di eventi per pagina
+    :param cursore: tupla (data, id) dell'ultimo evento della pagina precedente, letta con leggi_cursore
 
-    :return: una lista filtrata di oggetti: eventi_filtrati (lista di oggetti di tipo Evento Pubblico)
+    :return: Pagina di oggetti di tipo Evento Pubblico, con il numero totale di eventi trovati
     """
     if regione not in ['Abruzzo', 'Basilicata', 'Calabria', 'Campania', 'Emilia Romagna', 'Friuli Venezia Giulia',
                        'Lazio', 'Liguria', 'Lombardia', 'Marche', 'Molise', 'Piemonte', 'Puglia', 'Sardegna', 'Sicilia',
                        'Toscana', 'Trentino Alto Adige', 'Umbria', 'Valle d Aosta', 'Veneto']:
         if regione == 'Annulla':
-            return get_eventi()
+            return cerca_eventi(pagina=pagina, dimensione_pagina=dimensione_pagina, cursore=cursore)
         else:
             flash("La regione non esiste", category="error")
-            return []
+            return Pagina()
     elif regione in ['Abruzzo', 'Basilicata', 'Calabria', 'Campania', 'Emilia Romagna', 'Friuli Venezia Giulia',
                      'Lazio', 'Liguria', 'Lombardia', 'Marche', 'Molise', 'Piemonte', 'Puglia', 'Sardegna', 'Sicilia',
                      'Toscana', 'Trentino Alto Adige', 'Umbria', 'Valle d Aosta', 'Veneto']:
         flash("La regione esiste", category="success")
 
-    eventi_non_filtrati = get_eventi()
-
-    eventi_filtrati = [evento for evento in eventi_non_filtrati if regione.lower() == evento.regione.lower()]
-
-    return eventi_filtrati
+    return cerca_eventi({"EventoPubblico.Regione": regione}, pagina, dimensione_pagina, cursore)
 
 
-def ricerca_eventi_per_prezzo(prezzo_min, prezzo_max):
+def ricerca_eventi_per_prezzo(prezzo_min, prezzo_max, pagina=1, dimensione_pagina=DIMENSIONE_PAGINA,
+                              cursore=None):
     """
     Funzione per ottenere dal database la lista eventi il cui prezzo si trova nel range di prezzo
     inserito dall'organizzatore.
-    -Viene presa la lista di tutti gli eventi successivi alla data odierna.
-    -La lista degli eventi viene filtrata per prendere gli eventi che rientrano nel range di prezzi indicati dall'
-    organizzatore.
+    -Vengono presi dal database gli eventi successivi alla data odierna il cui prezzo rientra nel range indicato dall'
+    organizzatore (query di intervallo sul campo numerico EventoPubblico.Prezzo).
 
     :param prezzo_min: (str) stringa che indica il prezzo minimo del range di prezzo scelto dall'organizzatore
     :param prezzo_max: (str) stringa che indica il prezzo massimo del range di prezzo scelto dall'organizzatore
+    :param pagina: (int) numero della pagina, a partire da 1
+    :param dimensione_pagina: (int) numero di eventi per pagina
+    :param cursore: tupla (data, id) dell'ultimo evento della pagina precedente, letta con leggi_cursore
 
-    :return: una lista filtrata di oggetti: eventi_filtrati (lista di oggetti di tipo Evento Pubblico)
+    :return: Pagina di oggetti di tipo Evento Pubblico, con il numero totale di eventi trovati
    """
     if prezzo_min == "" and prezzo_max == "":
-        return get_eventi()
+        return cerca_eventi(pagina=pagina, dimensione_pagina=dimensione_pagina, cursore=cursore)
     elif prezzo_min == "" and int(prezzo_max) >= 0:
-        prezzo_min = 0
-        eventi_non_filtrati = get_eventi()
-        eventi_filtrati = [evento for evento in eventi_non_filtrati if float(prezzo_min) <= float(evento.prezzo) <=
-                           float(prezzo_max)]
-        return eventi_filtrati
+        return cerca_eventi({"EventoPubblico.Prezzo": intervallo_numerico(0, prezzo_max)}, pagina, dimensione_pagina,
+                            cursore)
     elif int(prezzo_min) >= 0 and prezzo_max == "":
-
-        eventi_non_filtrati = get_eventi()
-        eventi_filtrati = [evento for evento in eventi_non_filtrati if float(prezzo_min) <= float(evento.prezzo)]
-        return eventi_filtrati
+        return cerca_eventi({"EventoPubblico.Prezzo": intervallo_numerico(prezzo_min, None)}, pagina,
+                            dimensione_pagina, cursore)
     if int(prezzo_min) <= 0 or int(prezzo_max) <= 0:
         flash("il prezzo minore o massimo è negativo", category="error")
-        return []
+        return Pagina()
     elif int(prezzo_min) > 0 and int(prezzo_max) > 0:
         flash("il prezzo minore o massimo non è negativo", category="success")
 
-        eventi_non_filtrati = get_eventi()
-        eventi_filtrati = [evento for evento in eventi_non_filtrati if float(prezzo_min) <= float(evento.prezzo) <=
-                           float(prezzo_max)]
-
-        return eventi_filtrati
+        return cerca_eventi({"EventoPubblico.Prezzo": intervallo_numerico(prezzo_min, prezzo_max)}, pagina,
+                            dimensione_pagina, cursore)
 
 
 def get_evento_by_id(id_evento):
@@ -313,6 +375,79 @@ def get_evento_by_id(id_evento):
 
     """
     db = get_db()
-    evento_scelto_data = db['Evento'].find_one({'_id': ObjectId(id_evento)})
+    evento_scelto_data = db['Evento'].find_one({'_id': ObjectId(id_evento)}, proiezione('Evento'))
     evento = EventoPubblico(evento_scelto_data, evento_scelto_data)
     return evento
+
+
+def ricerca_eventi_faccette(filtri, pagina=1, dimensione_pagina=DIMENSIONE_PAGINA, cursore=None):
+    """
+    Ricerca degli eventi pubblici futuri che combina tutti i filtri (parole, categoria, regione, intervallo di prezzo).
+    La pagina di eventi richiesta viene letta con una find ordinata per (Data, _id), che usa gli indici; il numero
+    totale e i conteggi per categoria, regione e fascia di prezzo da mostrare nella barra laterale vengono calcolati
+    da un'unica aggregazione con $facet.
+    Senza parole da cercare le pagine successive si possono chiedere con il cursore: in quel caso totale e conteggi,
+    che non cambiano scorrendo i risultati, non vengono ricalcolati.
+
+    :param filtri: (dict) filtri della ricerca, tutti opzionali: 'ricerca', 'categoria', 'regione', 'prezzo_min',
+    'prezzo_max' (i valori vuoti o "Annulla" non filtrano)
+    :param pagina: (int) numero della pagina, a partire da 1
+    :param dimensione_pagina: (int) numero di eventi per pagina
+    :param cursore: tupla (data, id) dell'ultimo evento della pagina precedente, letta con leggi_cursore
+
+    :return: tupla (Pagina di oggetti di tipo EventoPubblico, dizionario con i conteggi di ogni faccetta); con il
+    cursore il totale della Pagina e i conteggi sono None
+    """
+    ricerca = valore_filtro(filtri, 'ricerca')
+    categoria = valore_filtro(filtri, 'categoria')
+    regione = valore_filtro(filtri, 'regione')
+    intervallo_prezzo = intervallo_numerico(filtri.get('prezzo_min'), filtri.get('prezzo_max'))
+
+    chiave = ('ricerca_eventi_faccette', ricerca, categoria, regione, repr(intervallo_prezzo), pagina,
+              dimensione_pagina, cursore)
+    return _in_cache(chiave, lambda: _ricerca_eventi_faccette(ricerca, categoria, regione, intervallo_prezzo, pagina,
+                                                              dimensione_pagina, cursore))
+
+
+def _ricerca_eventi_faccette(ricerca, categoria, regione, intervallo_prezzo, pagina, dimensione_pagina, cursore):
+    eventi_collection = get_db()['Evento']
+    condizioni = {
+        'categoria': {"Tipo": categoria} if categoria else None,
+        'regione': {"EventoPubblico.Regione": regione} if regione else None,
+        'prezzo': {"EventoPubblico.Prezzo": intervallo_prezzo} if intervallo_prezzo else None,
+    }
+    query_base = _query_eventi({"$text": {"$search": ricerca}} if ricerca else None)
+    query = {**query_base, **match_tranne(condizioni)['$match']}
+
+    # la pagina viene letta con find, che usa gli indici per filtro e ordinamento: dentro $facet non si potrebbero usare
+    condizione_cursore = None if ricerca else _condizione_cursore(cursore)
+    if ricerca:
+        eventi_data = eventi_collection.find(query, {**proiezione('Evento'), 'pertinenza': {"$meta": "textScore"}}) \
+            .sort([("pertinenza", {"$meta": "textScore"}), ("Data", 1), ("_id", 1)])
+    elif condizione_cursore:
+        eventi_data = eventi_collection.find({"$and": [query, condizione_cursore]}, proiezione('Evento')) \
+            .sort([("Data", 1), ("_id", 1)])
+    else:
+        eventi_data = eventi_collection.find(query, proiezione('Evento')).sort([("Data", 1), ("_id", 1)])
+    if not condizione_cursore:
+        eventi_data = eventi_data.skip((pagina - 1) * dimensione_pagina)
+    eventi_data = eventi_data.limit(dimensione_pagina + 1)
+
+    if condizione_cursore:
+        # totale e conteggi non cambiano scorrendo i risultati: il client li ha già ricevuti con la prima pagina
+        return _pagina_eventi(eventi_data, None, pagina, dimensione_pagina), None
+
+    risultato = next(eventi_collection.aggregate([{"$match": query_base}, {"$facet": {
+        'totale': [match_tranne(condizioni), {"$count": "numero"}],
+        'categorie': faccetta_valori(condizioni, 'categoria', "Tipo"),
+        'regioni': faccetta_valori(condizioni, 'regione', "EventoPubblico.Regione"),
+        'prezzi': faccetta_prezzo(condizioni, 'prezzo', "EventoPubblico.Prezzo"),
+    }}]))
+    totale = risultato['totale'][0]['numero'] if risultato['totale'] else 0
+    eventi = _pagina_eventi(eventi_data, totale, pagina, dimensione_pagina, con_cursore=not ricerca)
+    faccette = {
+        'categorie': conteggi(risultato['categorie']),
+        'regioni': conteggi(risultato['regioni']),
+        'prezzi': conteggi_prezzo(risultato['prezzi']),
+    }
+    return eventi, faccette
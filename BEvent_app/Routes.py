@@ -53,13 +53,15 @@ def scelta_evento_da_creare_page():
 
 @views.route('/SceltaFornitori_page')
 @login_required
-def sceltafornitori_page(fornitori=None, servizi=None, recensioni=None):
-    return render_template('SceltaFornitori.html', fornitori=fornitori, servizi=servizi, recensioni=recensioni)
+def sceltafornitori_page(fornitori=None, servizi=None, recensioni=None, faccette=None, riepilogo_recensioni=None):
+    return render_template('SceltaFornitori.html', fornitori=fornitori, servizi=servizi, recensioni=recensioni,
+                           faccette=faccette, riepilogo_recensioni=riepilogo_recensioni or {})
 
 
 @views.route('/RicercaEventi_page')
-def ricerca_eventi_page(eventi=None, eventi_sponsorizzati=None):
-    return render_template('RicercaEventi.html', eventi=eventi, eventi_sponsorizzati=eventi_sponsorizzati)
+def ricerca_eventi_page(eventi=None, eventi_sponsorizzati=None, faccette=None):
+    return render_template('RicercaEventi.html', eventi=eventi, eventi_sponsorizzati=eventi_sponsorizzati,
+                           faccette=faccette)
 
 
 @views.route('/RiepilogoScelte_page')
@@ -0,0 +1,89 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheTTL:
+    """
+    Cache in memoria con un numero massimo di elementi e una durata per ogni elemento, sicura tra thread.
+
+    Quando è piena viene eliminato l'elemento usato meno di recente; un elemento scaduto viene trattato come assente.
+    La cache è del singolo processo: ogni worker ne ha una propria.
+
+    Attributi:
+        dimensione_massima (int): numero massimo di elementi conservati.
+        durata (float): secondi dopo i quali un elemento scade.
+        hit (int): letture che hanno trovato un elemento valido.
+        miss (int): letture che non l'hanno trovato.
+    """
+
+    def __init__(self, dimensione_massima=1024, durata=300):
+        self.dimensione_massima = dimensione_massima
+        self.durata = durata
+        self._elementi = OrderedDict()
+        self._lock = threading.Lock()
+        self.hit = 0
+        self.miss = 0
+
+    def get(self, chiave, default=None):
+        """
+        Restituisce il valore associato alla chiave, se presente e non scaduto.
+
+        :param chiave: chiave dell'elemento
+        :param default: valore restituito se l'elemento manca o è scaduto
+
+        :return: il valore in cache oppure default
+        """
+        with self._lock:
+            elemento = self._elementi.get(chiave)
+            if elemento is not None:
+                scadenza, valore = elemento
+                if scadenza > time.monotonic():
+                    self._elementi.move_to_end(chiave)
+                    self.hit += 1
+                    return valore
+                del self._elementi[chiave]
+            self.miss += 1
+            return default
+
+    def set(self, chiave, valore):
+        """
+        Salva un valore nella cache, eliminando l'elemento meno recente se la cache è piena.
+
+        :param chiave: chiave dell'elemento
+        :param valore: valore da salvare
+        """
+        with self._lock:
+            self._elementi[chiave] = (time.monotonic() + self.durata, valore)
+            self._elementi.move_to_end(chiave)
+            while len(self._elementi) > self.dimensione_massima:
+                self._elementi.popitem(last=False)
+
+    def invalida(self, chiave):
+        """
+        Elimina un elemento dalla cache, se presente.
+
+        :param chiave: chiave dell'elemento
+        """
+        with self._lock:
+            self._elementi.pop(chiave, None)
+
+    def svuota(self):
+        """
+        Elimina tutti gli elementi della cache (le statistiche restano).
+        """
+        with self._lock:
+            self._elementi.clear()
+
+    def statistiche(self):
+        """
+        :return: dizionario con numero di elementi, hit, miss e percentuale di hit
+        """
+        with self._lock:
+            letture = self.hit + self.miss
+            return {
+                'elementi': len(self._elementi),
+                'hit': self.hit,
+                'miss': self.miss,
+                'percentuale_hit': round(100 * self.hit / letture, 2) if letture else 0.0,
+            }
@@ -0,0 +1,134 @@
+"""
+Conversioni tra i valori salvati nel database e quelli mostrati o ricevuti dall'applicazione.
+"""
+from datetime import datetime, timedelta
+
+# formato delle date mostrate nelle pagine e usato nei form e nella sessione
+FORMATO_DATA = '%d-%m-%Y'
+_FORMATI_DATA_ACCETTATI = (FORMATO_DATA, '%Y-%m-%d')
+
+
+def converti_data(valore):
+    """
+    Converte una data nel datetime salvato nel database. Accetta un datetime o una stringa nel formato dd-mm-yyyy
+    (o yyyy-mm-dd, quello dei campi date dei form).
+
+    :param valore: (datetime or str) data da convertire
+
+    :return: datetime corrispondente, None se il valore non è una data valida
+    """
+    if isinstance(valore, datetime):
+        return valore
+    if isinstance(valore, str):
+        for formato in _FORMATI_DATA_ACCETTATI:
+            try:
+                return datetime.strptime(valore, formato)
+            except ValueError:
+                continue
+    return None
+
+
+def formatta_data(valore):
+    """
+    Restituisce una data letta dal database nel formato dd-mm-yyyy usato nelle pagine.
+
+    :param valore: (datetime or str) data letta dal database
+
+    :return: stringa dd-mm-yyyy (i valori che non sono date vengono restituiti come stringa invariata)
+    """
+    data = converti_data(valore)
+    if data is None:
+        return "" if valore is None else str(valore)
+    return data.strftime(FORMATO_DATA)
+
+
+def intervallo_giorno(valore):
+    """
+    Restituisce l'inizio del giorno indicato e l'inizio del giorno successivo, da usare in una query di intervallo
+    ({'$gte': inizio, '$lt': fine}) al posto dell'uguaglianza sulla data.
+
+    :param valore: (datetime or str) data del giorno
+
+    :return: tupla (inizio, fine), oppure (None, None) se il valore non è una data valida
+    """
+    data = converti_data(valore)
+    if data is None:
+        return None, None
+    inizio = datetime(data.year, data.month, data.day)
+    return inizio, inizio + timedelta(days=1)
+
+
+def converti_intero(valore):
+    """
+    Converte un numero (posti, biglietti, quantità) nell'intero salvato nel database.
+
+    :param valore: (int or float or str) numero da convertire, anche come stringa
+    :return: intero corrispondente, None se il valore non è un numero intero valido
+    """
+    if isinstance(valore, bool):
+        return None
+    if isinstance(valore, int):
+        return valore
+    if isinstance(valore, float):
+        return int(valore) if valore.is_integer() else None
+    if isinstance(valore, str):
+        try:
+            return int(valore.strip())
+        except ValueError:
+            return None
+    return None
+
+
+def converti_prezzo(valore):
+    """
+    Converte un prezzo nel numero salvato nel database, arrotondato al centesimo. Accetta anche la virgola come
+    separatore dei decimali.
+
+    :param valore: (int or float or str) prezzo da convertire, anche come stringa
+    :return: float corrispondente, None se il valore non è un numero valido
+    """
+    if isinstance(valore, bool):
+        return None
+    if isinstance(valore, str):
+        valore = valore.strip().replace(',', '.')
+    try:
+        prezzo = float(valore)
+    except (TypeError, ValueError):
+        return None
+    if prezzo != prezzo or prezzo in (float('inf'), float('-inf')):
+        return None
+    return round(prezzo, 2)
+
+
+def intervallo_numerico(minimo, massimo, conversione=converti_prezzo):
+    """
+    Costruisce la condizione di una query di intervallo su un campo numerico. Gli estremi vuoti o non validi vengono
+    ignorati.
+
+    :param minimo: estremo inferiore (incluso), anche come stringa
+    :param massimo: estremo superiore (incluso), anche come stringa
+    :param conversione: funzione usata per convertire gli estremi
+    :return: dizionario con '$gte' e/o '$lte', vuoto se nessun estremo è valido
+    """
+    condizione = {}
+    minimo, massimo = conversione(minimo), conversione(massimo)
+    if minimo is not None:
+        condizione['$gte'] = minimo
+    if massimo is not None:
+        condizione['$lte'] = massimo
+    return condizione
+
+
+def nell_intervallo(valore, condizione, conversione=converti_prezzo):
+    """
+    Verifica in memoria la condizione costruita con intervallo_numerico.
+
+    :param valore: valore da verificare, anche come stringa
+    :param condizione: (dict) condizione con '$gte' e/o '$lte'
+    :param conversione: funzione usata per convertire il valore
+    :return: True se il valore è un numero valido compreso nell'intervallo
+    """
+    numero = conversione(valore)
+    if numero is None:
+        return False
+    return condizione.get('$gte', numero) <= numero <= condizione.get('$lte', numero)
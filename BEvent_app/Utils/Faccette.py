@@ -0,0 +1,117 @@
+"""
+Elementi comuni delle ricerche a faccette: ogni ricerca esegue un'unica aggregazione con $facet che restituisce sia
+i risultati con tutti i filtri applicati sia, per ogni faccetta, i conteggi calcolati con tutti i filtri tranne il
+suo (così la barra laterale mostra quanti risultati si otterrebbero cambiando quel filtro).
+raggruppa e raggruppa_prezzi producono gli stessi gruppi in memoria, per i risultati già letti senza filtri.
+"""
+from bisect import bisect_right
+from collections import Counter
+
+# estremi inferiori delle fasce di prezzo mostrate nella barra laterale
+FASCE_PREZZO = [0, 25, 50, 100, 250, 500, 1000]
+_SENZA_PREZZO = 'altro'
+
+
+def valore_filtro(filtri, chiave):
+    """
+    :param filtri: (dict) filtri della ricerca ricevuti dal client
+    :param chiave: (str) nome del filtro
+    :return: valore del filtro senza spazi, None se è vuoto o "Annulla" (cioè se non filtra)
+    """
+    valore = str(filtri.get(chiave) or "").strip()
+    return None if valore in ("", "Annulla") else valore
+
+
+def match_tranne(condizioni, esclusa=None):
+    """
+    Restituisce lo stage $match con tutte le condizioni dei filtri tranne quella indicata.
+
+    :param condizioni: (dict) nome del filtro -> condizione della query (i filtri non usati hanno condizione vuota)
+    :param esclusa: (str) nome del filtro da non applicare
+
+    :return: stage $match dell'aggregazione
+    """
+    query = {}
+    for nome, condizione in condizioni.items():
+        if nome != esclusa and condizione:
+            query.update(condizione)
+    return {'$match': query}
+
+
+def faccetta_valori(condizioni, nome, campo):
+    """
+    Sotto-pipeline che conta i documenti per ciascun valore del campo, con tutti i filtri tranne quello della faccetta.
+
+    :param condizioni: (dict) condizioni dei filtri
+    :param nome: (str) nome del filtro corrispondente alla faccetta
+    :param campo: (str) campo da raggruppare
+    """
+    return [match_tranne(condizioni, nome), {'$group': {'_id': '$' + campo, 'numero': {'$sum': 1}}}]
+
+
+def faccetta_prezzo(condizioni, nome, campo):
+    """
+    Sotto-pipeline che conta i documenti per fascia di prezzo (FASCE_PREZZO), con tutti i filtri tranne quello della
+    faccetta. I documenti senza un prezzo numerico vengono contati nella fascia 'altro'.
+
+    :param condizioni: (dict) condizioni dei filtri
+    :param nome: (str) nome del filtro corrispondente alla faccetta
+    :param campo: (str) campo del prezzo
+    """
+    return [match_tranne(condizioni, nome), {'$bucket': {
+        'groupBy': '$' + campo,
+        'boundaries': FASCE_PREZZO + [float('inf')],
+        'default': _SENZA_PREZZO,
+        'output': {'numero': {'$sum': 1}}
+    }}]
+
+
+def raggruppa(valori):
+    """
+    Conta i valori già letti dal database, con lo stesso risultato della sotto-pipeline di faccetta_valori.
+
+    :param valori: valori del campo, uno per documento
+    """
+    return [{'_id': valore, 'numero': numero} for valore, numero in Counter(valori).items()]
+
+
+def raggruppa_prezzi(prezzi):
+    """
+    Conta i prezzi già letti dal database per fascia, con lo stesso risultato della sotto-pipeline di faccetta_prezzo.
+
+    :param prezzi: prezzi, uno per documento
+    """
+    fasce = Counter()
+    for prezzo in prezzi:
+        if isinstance(prezzo, (int, float)) and not isinstance(prezzo, bool) and prezzo >= FASCE_PREZZO[0]:
+            fasce[FASCE_PREZZO[bisect_right(FASCE_PREZZO, prezzo) - 1]] += 1
+        else:
+            fasce[_SENZA_PREZZO] += 1
+    return [{'_id': fascia, 'numero': numero} for fascia, numero in fasce.items()]
+
+
+def conteggi(gruppi):
+    """
+    :param gruppi: risultato di faccetta_valori
+    :return: dizionario valore -> numero di documenti, dal più frequente
+    """
+    gruppi = sorted((gruppo for gruppo in gruppi if gruppo['_id'] not in (None, "")), key=lambda g: -g['numero'])
+    return {str(gruppo['_id']): gruppo['numero'] for gruppo in gruppi}
+
+
+def conteggi_prezzo(gruppi):
+    """
+    :param gruppi: risultato di faccetta_prezzo
+    :return: dizionario fascia ('0-25', ..., '1000+', 'altro') -> numero di documenti
+    """
+    risultato = {}
+    for gruppo in gruppi:
+        inizio = gruppo['_id']
+        if inizio == _SENZA_PREZZO:
+            etichetta = _SENZA_PREZZO
+        elif inizio == FASCE_PREZZO[-1]:
+            etichetta = f"{FASCE_PREZZO[-1]}+"
+        else:
+            etichetta = f"{inizio}-{FASCE_PREZZO[FASCE_PREZZO.index(inizio) + 1]}"
+        risultato[etichetta] = risultato.get(etichetta, 0) + gruppo['numero']
+    return risultato
@@ -1,8 +1,28 @@
 import base64
 import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
 from PIL import Image
 
+# larghezza massima (in pixel) di ogni variante ridotta; le viste usano la più piccola che basta
+VARIANTI = {
+    'miniatura': 400,
+    'media': 960,
+}
+# formati in cui viene salvata ogni variante: WebP per i browser che lo accettano, JPEG progressivo per gli altri
+FORMATI = {
+    'webp': 'image/webp',
+    'jpeg': 'image/jpeg',
+}
+QUALITA_VARIANTI = 80
+
+_pool = None
+_lock_pool = threading.Lock()
+
 
 def convert_image_to_byte_array(image_content):
     image = Image.open(io.BytesIO(image_content))
@@ -13,3 +33,176 @@ def convert_image_to_byte_array(image_content):
 
 def convert_byte_array_to_image(byte_array):
     return base64.b64encode(byte_array).decode('utf-8')
+
+
+def vista_byte(dati):
+    """
+    Restituisce una memoryview sui byte di un'immagine letta dal database, senza copiarli.
+
+    :param dati: (bytes) contenuto dell'immagine
+
+    :return: memoryview sui byte, None se dati è vuoto o non è un oggetto di byte
+    """
+    if not dati or not isinstance(dati, (bytes, bytearray, memoryview)):
+        return None
+    return memoryview(dati)
+
+
+def converti_immagini(lista_dati):
+    """
+    Converte in base64 una lista di immagini, saltando (e segnalando) quelle che non si riescono a convertire.
+
+    :param lista_dati: (list) contenuti delle immagini
+
+    :return: lista di stringhe base64
+    """
+    immagini = []
+    for dati in lista_dati:
+        try:
+            immagini.append(convert_byte_array_to_image(dati))
+        except Exception as e:
+            print(f"Errore nella conversione dell'immagine: {str(e)}")
+    return immagini
+
+
+def genera_varianti(image_content):
+    """
+    Genera le versioni ridotte di un'immagine, una per ogni coppia variante/formato. L'immagine non viene mai
+    ingrandita: se è già più piccola della variante mantiene le sue dimensioni.
+
+    :param image_content: (bytes) contenuto dell'immagine caricata
+
+    :return: dizionario {(variante, formato): bytes}
+    """
+    originale = Image.open(io.BytesIO(image_content))
+    originale = originale.convert('RGB')
+    varianti = {}
+    for variante, larghezza in VARIANTI.items():
+        ridotta = originale.copy()
+        ridotta.thumbnail((larghezza, larghezza * 4))
+        for formato in FORMATI:
+            buffer = io.BytesIO()
+            if formato == 'webp':
+                ridotta.save(buffer, format="WEBP", quality=QUALITA_VARIANTI, method=4)
+            else:
+                ridotta.save(buffer, format="JPEG", quality=QUALITA_VARIANTI, progressive=True, optimize=True)
+            varianti[(variante, formato)] = buffer.getvalue()
+    return varianti
+
+
+def elabora_immagine(image_content):
+    """
+    Prepara un'immagine caricata per il salvataggio: la converte in JPEG a dimensione piena e ne genera le varianti.
+
+    :param image_content: (bytes) contenuto dell'immagine caricata
+
+    :return: tupla (jpeg a dimensione piena, dizionario delle varianti come in genera_varianti)
+    """
+    return convert_image_to_byte_array(image_content), genera_varianti(image_content)
+
+
+def _get_pool():
+    global _pool
+    with _lock_pool:
+        if _pool is None:
+            # 'spawn' evita di copiare nei processi figli i thread e le connessioni del processo web
+            _pool = ProcessPoolExecutor(max_workers=min(4, os.cpu_count() or 1),
+                                        mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def _genera_varianti_o_niente(image_content):
+    try:
+        return genera_varianti(image_content)
+    except Exception as e:
+        print(f"Errore nella generazione delle varianti: {str(e)}")
+        return None
+
+
+def _mappa_sul_pool(funzione, contenuti):
+    global _pool
+    if not contenuti:
+        return []
+    try:
+        return list(_get_pool().map(funzione, contenuti))
+    except BrokenProcessPool:
+        with _lock_pool:
+            _pool = None
+        return [funzione(contenuto) for contenuto in contenuti]
+
+
+def elabora_immagini(contenuti):
+    """
+    Elabora una lista di immagini caricate (vedi elabora_immagine) su un pool di processi, così la conversione e il
+    ridimensionamento non occupano la CPU del processo web. Se il pool non è utilizzabile le immagini vengono elaborate
+    nel processo corrente.
+
+    :param contenuti: (list) contenuti delle immagini caricate, quelli vuoti vengono ignorati
+
+    :return: lista di tuple (jpeg a dimensione piena, varianti), nello stesso ordine
+    """
+    return _mappa_sul_pool(elabora_immagine, [contenuto for contenuto in contenuti if contenuto])
+
+
+def genera_varianti_immagini(contenuti):
+    """
+    Genera sul pool di processi le varianti di più immagini già salvate.
+
+    :param contenuti: (list) contenuti delle immagini
+
+    :return: lista di dizionari delle varianti (None per le immagini che non si riescono a leggere), nello stesso ordine
+    """
+    return _mappa_sul_pool(_genera_varianti_o_niente, contenuti)
+
+
+def _dopo_fork():
+    global _pool, _lock_pool
+    _pool = None
+    _lock_pool = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_dopo_fork)
+
+
+def url_media(id_media):
+    """
+    Costruisce l'url da cui il browser scarica un'immagine dell'archivio media, così le pagine e le risposte JSON
+    contengono solo il collegamento e non l'immagine codificata.
+
+    :param id_media: (str) id del file nell'archivio
+
+    :return: url dell'immagine
+    """
+    return f"/media/{id_media}"
+
+
+def url_variante(url, variante):
+    """
+    Restituisce l'url della variante ridotta di un'immagine dell'archivio media. Gli url delle immagini non ancora
+    migrate (che non hanno varianti) vengono restituiti invariati. Registrata come filtro 'variante' nei template.
+
+    :param url: (str or None) url dell'immagine, come restituito da url_media o url_immagine
+    :param variante: (str) una delle chiavi di VARIANTI
+
+    :return: url della variante
+    """
+    if url and url.startswith('/media/'):
+        return f"{url}/{variante}"
+    return url
+
+
+def url_immagine(tipo, id_documento, indice=None):
+    """
+    Costruisce l'url di un'immagine ancora salvata dentro il documento (non ancora spostata nell'archivio media).
+
+    :param tipo: (str) 'evento' per la locandina, 'fornitore' per le foto del fornitore, 'servizio' per le foto di un
+    servizio offerto
+    :param id_documento: (str) id del documento che contiene l'immagine
+    :param indice: (int) posizione della foto nella lista, per fornitori e servizi
+
+    :return: url dell'immagine
+    """
+    if indice is None:
+        return f"/immagine/{tipo}/{id_documento}"
+    return f"/immagine/{tipo}/{id_documento}/{indice}"
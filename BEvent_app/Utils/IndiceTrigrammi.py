@@ -0,0 +1,128 @@
+"""
+Indice in memoria per la ricerca approssimata (tollerante agli errori di battitura) su testi brevi.
+"""
+import threading
+import unicodedata
+from collections import Counter, defaultdict
+
+from rapidfuzz import fuzz, process
+
+# numero di candidati valutati con RapidFuzz per ogni risultato richiesto
+CANDIDATI_PER_RISULTATO = 5
+
+
+def normalizza(testo):
+    """
+    Porta il testo in minuscolo e senza accenti, così che "Caffè" e "caffe" vengano confrontati come uguali.
+
+    :param testo: (str) testo da normalizzare
+    :return: testo normalizzato
+    """
+    testo = unicodedata.normalize('NFKD', testo or "")
+    return "".join(carattere for carattere in testo if not unicodedata.combining(carattere)).lower()
+
+
+def trigrammi(testo):
+    """
+    Restituisce l'insieme dei trigrammi (sequenze di tre caratteri) delle parole del testo normalizzato. Ogni parola
+    viene circondata da spazi, così anche le parole di uno o due caratteri producono trigrammi.
+
+    :param testo: (str) testo da scomporre
+    :return: insieme di stringhe di tre caratteri
+    """
+    risultato = set()
+    for parola in normalizza(testo).split():
+        parola = f"  {parola} "
+        risultato.update(parola[i:i + 3] for i in range(len(parola) - 2))
+    return risultato
+
+
+class IndiceTrigrammi:
+    """
+    Indice invertito trigramma -> documenti, sicuro tra thread. Una ricerca usa l'indice per scegliere i soli
+    documenti che hanno abbastanza trigrammi in comune con la parola cercata e calcola la somiglianza (RapidFuzz) solo
+    su quelli, quindi il tempo dipende dai candidati e non dal numero di documenti indicizzati.
+
+    Attributi:
+        quota_minima (float): frazione dei trigrammi della ricerca che un documento deve contenere per essere
+            considerato un candidato.
+    """
+
+    def __init__(self, quota_minima=0.3):
+        self.quota_minima = quota_minima
+        self._testi = {}
+        self._trigrammi_documento = {}
+        self._documenti = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._testi)
+
+    def aggiorna(self, id_documento, testo):
+        """
+        Aggiunge un documento all'indice o ne sostituisce il testo.
+
+        :param id_documento: identificatore del documento
+        :param testo: (str) testo su cui cercare
+        """
+        nuovi = trigrammi(testo)
+        with self._lock:
+            self._rimuovi(id_documento)
+            self._testi[id_documento] = normalizza(testo)
+            self._trigrammi_documento[id_documento] = nuovi
+            for trigramma in nuovi:
+                self._documenti[trigramma].add(id_documento)
+
+    def rimuovi(self, id_documento):
+        """
+        Elimina un documento dall'indice, se presente.
+
+        :param id_documento: identificatore del documento
+        """
+        with self._lock:
+            self._rimuovi(id_documento)
+
+    def _rimuovi(self, id_documento):
+        self._testi.pop(id_documento, None)
+        for trigramma in self._trigrammi_documento.pop(id_documento, ()):
+            documenti = self._documenti[trigramma]
+            documenti.discard(id_documento)
+            if not documenti:
+                del self._documenti[trigramma]
+
+    def svuota(self):
+        """
+        Elimina tutti i documenti dall'indice.
+        """
+        with self._lock:
+            self._testi.clear()
+            self._trigrammi_documento.clear()
+            self._documenti.clear()
+
+    def cerca(self, ricerca, limite=50, punteggio_minimo=75):
+        """
+        Cerca i documenti il cui testo è simile alla ricerca.
+
+        :param ricerca: (str) testo cercato
+        :param limite: (int) numero massimo di risultati
+        :param punteggio_minimo: (float) somiglianza minima (0-100) di un risultato
+
+        :return: lista di tuple (id_documento, punteggio) ordinata per punteggio decrescente
+        """
+        trigrammi_ricerca = trigrammi(ricerca)
+        if not trigrammi_ricerca:
+            return []
+        minimo_in_comune = max(1, int(len(trigrammi_ricerca) * self.quota_minima))
+
+        with self._lock:
+            in_comune = Counter()
+            for trigramma in trigrammi_ricerca:
+                in_comune.update(self._documenti.get(trigramma, ()))
+            # la somiglianza viene calcolata solo sui documenti con più trigrammi in comune
+            candidati = {id_documento: self._testi[id_documento]
+                         for id_documento, numero in in_comune.most_common(limite * CANDIDATI_PER_RISULTATO)
+                         if numero >= minimo_in_comune}
+
+        risultati = process.extract(normalizza(ricerca), candidati, scorer=fuzz.partial_ratio, limit=limite,
+                                    score_cutoff=punteggio_minimo)
+        return [(id_documento, punteggio) for _, punteggio, id_documento in risultati]
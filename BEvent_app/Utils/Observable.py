@@ -2,11 +2,27 @@ from abc import ABC, abstractmethod
 
 
 class Observable:
-    def __init__(self):
-        self.observers = []
+    def __init__(self, observers=None):
+        self._observers = observers
 
-    def __init__(self, observers):
-        self.observers = observers
+    def carica_observers(self):
+        """
+        Restituisce gli observer da usare quando non sono stati passati al costruttore. Viene chiamato solo al primo
+        accesso a observers, quindi le sottoclassi possono sovrascriverlo per caricarli dal database solo se servono.
+
+        :return: lista di observer
+        """
+        return []
+
+    @property
+    def observers(self):
+        if self._observers is None:
+            self._observers = self.carica_observers()
+        return self._observers
+
+    @observers.setter
+    def observers(self, observers):
+        self._observers = observers
 
     def register_observer(self, observer):
         self.observers.append(observer)
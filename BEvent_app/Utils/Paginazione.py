@@ -0,0 +1,104 @@
+"""
+Paginazione dei risultati delle ricerche: per numero di pagina oppure con un cursore (paginazione keyset su data e id),
+che permette di chiedere la pagina successiva senza far scorrere al database tutte quelle precedenti.
+"""
+import base64
+import binascii
+import math
+from datetime import datetime
+
+DIMENSIONE_PAGINA = 12
+DIMENSIONE_PAGINA_MASSIMA = 50
+
+
+class Pagina(list):
+    """
+    Una pagina di risultati: si usa come una lista (gli elementi della pagina) e in più conosce il numero totale di
+    risultati della ricerca.
+
+    Attributi:
+        totale (int): numero di risultati della ricerca, su tutte le pagine; None se non è stato contato (le pagine
+            chieste con il cursore non ricontano i risultati).
+        pagina (int): numero della pagina, a partire da 1.
+        dimensione_pagina (int): numero massimo di elementi in una pagina.
+        cursore_successivo (str): cursore da passare per ottenere la pagina successiva, None se è l'ultima (o se la
+            ricerca non si può scorrere con un cursore).
+    """
+
+    def __init__(self, elementi=(), totale=0, pagina=1, dimensione_pagina=DIMENSIONE_PAGINA, cursore_successivo=None):
+        super().__init__(elementi)
+        self.totale = totale
+        self.pagina = pagina
+        self.dimensione_pagina = dimensione_pagina
+        self.cursore_successivo = cursore_successivo
+
+    @property
+    def pagine(self):
+        if self.totale is None:
+            return None
+        return math.ceil(self.totale / self.dimensione_pagina) if self.dimensione_pagina else 0
+
+    def come_dizionario(self):
+        """
+        :return: dizionario con i dati della paginazione, da aggiungere alle risposte JSON
+        """
+        return {
+            'totale': self.totale,
+            'pagina': self.pagina,
+            'dimensione_pagina': self.dimensione_pagina,
+            'pagine': self.pagine,
+            'cursore_successivo': self.cursore_successivo,
+        }
+
+
+def leggi_paginazione(dati):
+    """
+    Legge numero e dimensione della pagina dai dati di una richiesta, correggendo i valori mancanti o fuori intervallo.
+
+    :param dati: (dict) dati della richiesta con le chiavi opzionali 'pagina' e 'dimensione_pagina'
+
+    :return: tupla (pagina, dimensione_pagina)
+    """
+    dati = dati or {}
+
+    def intero(chiave, default):
+        try:
+            return int(dati.get(chiave, default))
+        except (TypeError, ValueError):
+            return default
+
+    pagina = max(intero('pagina', 1), 1)
+    dimensione_pagina = min(max(intero('dimensione_pagina', DIMENSIONE_PAGINA), 1), DIMENSIONE_PAGINA_MASSIMA)
+    return pagina, dimensione_pagina
+
+
+def codifica_cursore(data, id_documento):
+    """
+    Codifica la posizione dell'ultimo elemento di una pagina ordinata per (data, _id).
+
+    :param data: (datetime) data dell'ultimo elemento della pagina
+    :param id_documento: (str) id dell'ultimo elemento della pagina
+
+    :return: cursore (str) da restituire al client
+    """
+    testo = f"{data.isoformat()}|{id_documento}"
+    return base64.urlsafe_b64encode(testo.encode()).decode().rstrip("=")
+
+
+def leggi_cursore(dati):
+    """
+    Legge il cursore dai dati di una richiesta.
+
+    :param dati: (dict) dati della richiesta con la chiave opzionale 'cursore'
+
+    :return: tupla (data, id) dell'ultimo elemento della pagina precedente, None se il cursore manca o non è valido
+    """
+    cursore = (dati or {}).get('cursore')
+    if not cursore or not isinstance(cursore, str):
+        return None
+    try:
+        testo = base64.urlsafe_b64decode(cursore + "=" * (-len(cursore) % 4)).decode()
+        data, id_documento = testo.split("|", 1)
+        return datetime.fromisoformat(data), id_documento
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
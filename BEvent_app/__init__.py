@@ -1,17 +1,25 @@
-from bson import ObjectId
-from flask import Flask
+import os
+
+from flask import Flask, jsonify, abort
 from flask_login import LoginManager
 from BEvent_app.Routes import home
-from .InterfacciaPersistenza.Fornitore import Fornitore
-from .InterfacciaPersistenza.Organizzatore import Organizzatore
-from .InterfacciaPersistenza.Utente import Utente
 from .Routes import views
-from .db import get_db
+from .db import get_db, init_db, get_statistiche_pool
+from .InterfacciaPersistenza.Indici import init_indici
 from .Autenticazione.AutenticazioneController import aut
+from .Autenticazione.AutenticazioneService import get_principale, get_statistiche_cache_principali
+from .GestioneEvento.IndiceFornitori import get_statistiche_indice
+from .GestioneEvento.GestioneEventoService import get_statistiche_cache_disponibilita
 from .GestioneEvento.GestioneEventoController import ge
+from .GestioneEvento.PrenotazioniBiglietti import init_prenotazioni_biglietti
 from .Fornitori.FornitoriController import Fornitori
 from .RicercaEvento.RicercaEventoController import re
+from .RicercaEvento.RicercaEventoService import get_statistiche_cache_catalogo
 from .FeedBack.FeedBackController import fb
+from .Media.MediaController import media
+from .Comandi import registra_comandi
+from .Notifiche.NotificheService import init_notifiche
+from .Utils.Image import url_variante
 
 
 def create_app():
@@ -20,7 +28,10 @@ def create_app():
     app.secret_key = 'BEvent'  # comando per impostare una password alle session, altrimenti non funziona
 
     app.config['SECRET_KEY'] = "BEVENT"
-    datab = get_db()
+    init_db(app)
+    init_indici(app)
+    init_notifiche(app)
+    init_prenotazioni_biglietti(app)
     login_manager = LoginManager(app)
     login_manager.login_view = 'views.home'
 
@@ -30,24 +41,28 @@ def create_app():
     app.register_blueprint(aut, url_prefix='/')
     app.register_blueprint(ge, url_prefix='/')
     app.register_blueprint(re, url_prefix='/')
-
-    def get_user_by_id(user_id):
-        user_data = datab.Utente.find_one({'_id': ObjectId(user_id)})
-
-        if user_data:
-            if user_data['Ruolo'] == '2':
-                return Organizzatore(user_data, user_data)
-            elif user_data['Ruolo'] == '3':
-                return Fornitore(user_data, user_data)
-
-        return None
+    app.register_blueprint(media, url_prefix='/')
+    registra_comandi(app)
+    app.add_template_filter(url_variante, 'variante')
 
     @login_manager.user_loader
     def load_user(user_id):
-        return get_user_by_id(user_id)
+        return get_principale(user_id)
 
     @app.route('/')
     def index():
         return home()
 
+    @app.route('/statistiche')
+    def statistiche():
+        # espone lo stato interno di pool, cache e indici: disponibile solo in debug oppure se abilitata esplicitamente
+        # con STATISTICHE in app.config o con la variabile d'ambiente BEVENT_STATISTICHE=1
+        abilitata = app.config.get('STATISTICHE', os.environ.get('BEVENT_STATISTICHE', '0'))
+        if not app.debug and abilitata in (False, None, '0', 'false', 'False'):
+            abort(404)
+        return jsonify({'db': get_statistiche_pool(), 'cache_principali': get_statistiche_cache_principali(),
+                        'cache_catalogo': get_statistiche_cache_catalogo(),
+                        'cache_disponibilita': get_statistiche_cache_disponibilita(),
+                        'indice_fornitori': get_statistiche_indice()})
+
     return app
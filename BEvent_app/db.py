@@ -1,6 +1,207 @@
+"""
+Client MongoDB condiviso da tutta l'applicazione.
+
+Il client viene creato una sola volta per processo (in modo pigro, alla prima chiamata di get_db) e riusato da tutti
+i service, così ogni richiesta usa il pool di connessioni già aperto invece di rifare handshake e pool ogni volta.
+Dopo un fork (es. worker gunicorn) il processo figlio crea un proprio client, perché MongoClient non è fork-safe.
+"""
+import os
+import threading
+
 from pymongo import MongoClient
+from pymongo.monitoring import ConnectionPoolListener
+
+CONFIGURAZIONE_DEFAULT = {
+    'MONGO_URI': "mongodb://localhost:27017/BEvent",
+    'MONGO_DBNAME': "BEvent",
+    'MONGO_MAX_POOL_SIZE': 50,
+    'MONGO_MIN_POOL_SIZE': 0,
+    'MONGO_MAX_IDLE_TIME_MS': 60000,
+    'MONGO_CONNECT_TIMEOUT_MS': 5000,
+    'MONGO_SERVER_SELECTION_TIMEOUT_MS': 5000,
+    'MONGO_SOCKET_TIMEOUT_MS': 30000,
+    'MONGO_WAIT_QUEUE_TIMEOUT_MS': 5000,
+}
+
+_configurazione = dict(CONFIGURAZIONE_DEFAULT)
+_lock = threading.Lock()
+_client = None
+_pid = None
+
+
+class StatistichePool(ConnectionPoolListener):
+    """
+    Listener del driver che tiene il conteggio degli eventi del pool di connessioni.
+
+    Attributi:
+        connessioni_create (int): connessioni aperte verso il server.
+        connessioni_chiuse (int): connessioni chiuse.
+        checkout (int): connessioni prese dal pool per eseguire un'operazione.
+        checkout_falliti (int): richieste di connessione fallite (es. timeout della coda di attesa).
+        in_uso (int): connessioni attualmente prese dal pool.
+        pool_svuotati (int): numero di volte in cui il pool è stato svuotato dal driver.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.connessioni_create = 0
+        self.connessioni_chiuse = 0
+        self.checkout = 0
+        self.checkout_falliti = 0
+        self.in_uso = 0
+        self.pool_svuotati = 0
+
+    def _incrementa(self, **valori):
+        with self._lock:
+            for nome, valore in valori.items():
+                setattr(self, nome, getattr(self, nome) + valore)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._incrementa(pool_svuotati=1)
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._incrementa(connessioni_create=1)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._incrementa(connessioni_chiuse=1)
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        self._incrementa(checkout_falliti=1)
+
+    def connection_checked_out(self, event):
+        self._incrementa(checkout=1, in_uso=1)
+
+    def connection_checked_in(self, event):
+        self._incrementa(in_uso=-1)
+
+    def come_dizionario(self):
+        with self._lock:
+            return {
+                'connessioni_create': self.connessioni_create,
+                'connessioni_chiuse': self.connessioni_chiuse,
+                'connessioni_aperte': self.connessioni_create - self.connessioni_chiuse,
+                'checkout': self.checkout,
+                'checkout_falliti': self.checkout_falliti,
+                'in_uso': self.in_uso,
+                'pool_svuotati': self.pool_svuotati,
+            }
+
+
+_statistiche = StatistichePool()
+
+
+def configura_db(**opzioni):
+    """
+    Imposta i parametri del client condiviso (uri, nome del database, dimensione del pool e timeout). Le chiavi sono
+    quelle di CONFIGURAZIONE_DEFAULT; i valori None vengono ignorati. Se la configurazione cambia e il client era già stato creato, viene chiuso
+    e ricreato alla prossima chiamata di get_db.
+
+    :param opzioni: parametri di configurazione, es. MONGO_URI="mongodb://...", MONGO_MAX_POOL_SIZE=100
+    """
+    global _client, _pid
+    with _lock:
+        nuova_configurazione = dict(_configurazione)
+        for chiave, valore in opzioni.items():
+            if chiave in CONFIGURAZIONE_DEFAULT and valore is not None:
+                nuova_configurazione[chiave] = valore
+        if nuova_configurazione == _configurazione:
+            return
+        _configurazione.update(nuova_configurazione)
+        if _client is not None and _pid == os.getpid():
+            _client.close()
+        _client = None
+        _pid = None
+
+
+def init_db(app):
+    """
+    Configura il client condiviso a partire dalla configurazione dell'applicazione Flask. Ogni chiave può essere
+    impostata in app.config oppure come variabile d'ambiente con prefisso BEVENT_ (es. BEVENT_MONGO_URI).
+
+    :param app: applicazione Flask
+    """
+    opzioni = {}
+    for chiave, default in CONFIGURAZIONE_DEFAULT.items():
+        valore = app.config.get(chiave, os.environ.get('BEVENT_' + chiave))
+        if valore is not None and isinstance(default, int):
+            valore = int(valore)
+        opzioni[chiave] = valore
+    configura_db(**opzioni)
+    for chiave, valore in _configurazione.items():
+        app.config.setdefault(chiave, valore)
+
+
+def _crea_client():
+    return MongoClient(
+        _configurazione['MONGO_URI'],
+        maxPoolSize=_configurazione['MONGO_MAX_POOL_SIZE'],
+        minPoolSize=_configurazione['MONGO_MIN_POOL_SIZE'],
+        maxIdleTimeMS=_configurazione['MONGO_MAX_IDLE_TIME_MS'],
+        connectTimeoutMS=_configurazione['MONGO_CONNECT_TIMEOUT_MS'],
+        serverSelectionTimeoutMS=_configurazione['MONGO_SERVER_SELECTION_TIMEOUT_MS'],
+        socketTimeoutMS=_configurazione['MONGO_SOCKET_TIMEOUT_MS'],
+        waitQueueTimeoutMS=_configurazione['MONGO_WAIT_QUEUE_TIMEOUT_MS'],
+        event_listeners=[_statistiche],
+        connect=False
+    )
+
+
+def get_client():
+    """
+    Restituisce il MongoClient condiviso del processo corrente, creandolo se necessario.
+
+    :return: MongoClient con il pool di connessioni dell'applicazione
+    """
+    global _client, _pid
+    pid = os.getpid()
+    if _client is None or _pid != pid:
+        with _lock:
+            if _client is None or _pid != pid:
+                _client = _crea_client()
+                _pid = pid
+    return _client
 
 
 def get_db():
-    client = MongoClient("mongodb://localhost:27017/BEvent")
-    return client['BEvent']
+    return get_client()[_configurazione['MONGO_DBNAME']]
+
+
+def get_statistiche_pool():
+    """
+    Restituisce le statistiche del pool di connessioni del processo corrente e i parametri con cui è configurato.
+
+    :return: dizionario con i contatori del pool e la configurazione (senza l'uri, che può contenere credenziali)
+    """
+    statistiche = _statistiche.come_dizionario()
+    statistiche['pid'] = os.getpid()
+    statistiche['client_attivo'] = _client is not None and _pid == os.getpid()
+    statistiche['configurazione'] = {chiave: valore for chiave, valore in _configurazione.items()
+                                     if chiave != 'MONGO_URI'}
+    return statistiche
+
+
+def _dopo_fork():
+    global _client, _pid, _statistiche, _lock
+    _lock = threading.Lock()
+    _client = None
+    _pid = None
+    _statistiche = StatistichePool()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_dopo_fork)
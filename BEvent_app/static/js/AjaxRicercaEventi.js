@@ -19,56 +19,114 @@ document.querySelector('.search-bar').addEventListener('submit', function(event)
 
 
 
+// ultima ricerca inviata, usata per chiedere le altre pagine degli stessi risultati mentre si scorre la pagina.
+// Il catalogo iniziale viene scorso con la ricerca combinata senza filtri.
+let ultimaRicerca = {endpoint: '/ricerca_eventi', data: {}};
+// cursore (o numero di pagina, per le ricerche ordinate per pertinenza) della pagina successiva, null se è l'ultima
+let paginaSuccessiva = null;
+let caricamentoInCorso = false;
+let osservatoreFineCatalogo = null;
+
+document.addEventListener('DOMContentLoaded', function() {
+    let grid = document.querySelector('.grid-container .grid');
+    if (grid.dataset.cursore) {
+        paginaSuccessiva = {cursore: grid.dataset.cursore, pagina: parseInt(grid.dataset.pagina) + 1};
+    }
+
+    osservatoreFineCatalogo = new IntersectionObserver(function(elementi) {
+        if (elementi[0].isIntersecting) {
+            caricaPaginaSuccessiva();
+        }
+    }, {rootMargin: '400px'});
+    osservaFineCatalogo();
+});
+
+// l'osservatore avvisa solo quando la fine del catalogo entra o esce dalla vista: se dopo una pagina corta è ancora
+// visibile non arriverebbe nessun avviso, quindi la si osserva di nuovo per ricevere subito la sua posizione attuale
+function osservaFineCatalogo() {
+    let fineCatalogo = document.querySelector('.grid-container .fine-catalogo');
+    if (osservatoreFineCatalogo && fineCatalogo) {
+        osservatoreFineCatalogo.unobserve(fineCatalogo);
+        osservatoreFineCatalogo.observe(fineCatalogo);
+    }
+}
+
 function inviaRichiestaGenerica(endpoint, data){
+    ultimaRicerca = {endpoint: endpoint, data: data};
+    paginaSuccessiva = null;
+    richiediPagina({pagina: 1}, false);
+}
+
+function caricaPaginaSuccessiva(){
+    if (paginaSuccessiva && !caricamentoInCorso) {
+        richiediPagina(paginaSuccessiva, true);
+    }
+}
+
+function richiediPagina(posizione, aggiungi){
+    caricamentoInCorso = true;
+    let ricerca = ultimaRicerca;
     let xhr = new XMLHttpRequest();
-    xhr.open('POST', endpoint, true);
+    xhr.open('POST', ricerca.endpoint, true);
     xhr.setRequestHeader('Content-Type', 'application/json');
 
     xhr.onreadystatechange = function() {
-        if (this.readyState === 4 && this.status === 200) {
+        if (this.readyState !== 4) {
+            return;
+        }
+        caricamentoInCorso = false;
+        // ignora le pagine di una ricerca che nel frattempo è stata sostituita
+        if (this.status === 200 && ricerca === ultimaRicerca) {
             let response = JSON.parse(this.responseText);
-            console.log(response);
-            aggiornaDOMConRisultati(response);
+            aggiornaDOMConRisultati(response, aggiungi);
+            aggiornaPaginaSuccessiva(response);
+            // i conteggi arrivano solo con la prima pagina di ogni ricerca
+            mostraFaccette(response.faccette);
+            osservaFineCatalogo();
         }
     };
 
-    xhr.send(JSON.stringify(data));
+    xhr.send(JSON.stringify(Object.assign({}, ricerca.data, posizione)));
+}
+
+function aggiornaPaginaSuccessiva(risposta) {
+    if (risposta.cursore_successivo) {
+        paginaSuccessiva = {cursore: risposta.cursore_successivo, pagina: risposta.pagina + 1};
+    } else if (risposta.pagina && risposta.pagina < risposta.pagine) {
+        paginaSuccessiva = {pagina: risposta.pagina + 1};
+    } else {
+        paginaSuccessiva = null;
+    }
 }
 
 
+// tutti i filtri della barra laterale passano dalla ricerca combinata, che restituisce anche i conteggi
 function inviaRichiestadiRicercaBarra(data){
-    inviaRichiestaGenerica('/filtro_barra_ricerca_eventi', data)
+    inviaRichiestaGenerica('/ricerca_eventi', aggiornaFiltro('ricerca', data.ricerca.trim()))
 }
 
 
 function inviaRichiestaCategoria(categoria){
-    let data= {
-        categoria: categoria
-    }
-    inviaRichiestaGenerica('/filtro_categorie_eventi', data)
+    inviaRichiestaGenerica('/ricerca_eventi', aggiornaFiltro('categoria', categoria))
 }
 
 function inviaRichiestaRegione(regione){
-    let data ={
-        regione: regione
-    }
-    inviaRichiestaGenerica('/filtro_regione_eventi', data)
+    inviaRichiestaGenerica('/ricerca_eventi', aggiornaFiltro('regione', regione))
 }
 
 
 function inviaRichiestaPrezzo(){
     let prezzo_min = document.getElementById("prezzo_min").value;
     let prezzo_max = document.getElementById("prezzo_max").value;
-    let data ={
-        prezzo_min: prezzo_min,
-        prezzo_max: prezzo_max
-    }
-    inviaRichiestaGenerica('/filtro_prezzo_eventi', data)
+    aggiornaFiltro('prezzo_min', prezzo_min);
+    inviaRichiestaGenerica('/ricerca_eventi', aggiornaFiltro('prezzo_max', prezzo_max))
 }
 
-function aggiornaDOMConRisultati(datiFiltrati) {
+function aggiornaDOMConRisultati(datiFiltrati, aggiungi) {
     let containerFornitori = document.querySelector('.grid-container .grid');
-    containerFornitori.innerHTML = '';
+    if (!aggiungi) {
+        containerFornitori.innerHTML = '';
+    }
 
     if (datiFiltrati.eventi_filtrati) {
         datiFiltrati.eventi_filtrati.forEach(function (evento) {
@@ -84,7 +142,7 @@ function aggiornaDOMConRisultati(datiFiltrati) {
                 <div class="card">
                     <div class="face face1">
                         <div class="content">
-                            <img src="data:image/jpeg;base64,${locandina}">
+                            <img src="${locandina}">
                             <h3>${nomeevento} </h3>
                         </div>
                     </div>
@@ -97,7 +155,7 @@ function aggiornaDOMConRisultati(datiFiltrati) {
                 </div>
             </div>`;
 
-            containerFornitori.innerHTML += cardHTML;
+            containerFornitori.insertAdjacentHTML('beforeend', cardHTML);
 
         });
     }
@@ -28,41 +28,33 @@ function inviaRichiestaGenerica(endpoint, data){
     xhr.onreadystatechange = function() {
         if (this.readyState === 4 && this.status === 200) {
             let response = JSON.parse(this.responseText);
-            console.log(response);
             aggiornaDOMConRisultati(response);
+            mostraFaccette(response.faccette);
         }
     };
 
     xhr.send(JSON.stringify(data));
 }
 
+// tutti i filtri della barra laterale passano dalla ricerca combinata, che restituisce anche i conteggi
 function inviaRichiestadiRicercaBarra(data){
-    inviaRichiestaGenerica('/filtro_barra_ricerca', data)
+    inviaRichiestaGenerica('/ricerca_fornitori', aggiornaFiltro('ricerca', data.ricerca.trim()))
 }
 
 function inviaRichiestaCategoria(categoria){
-    let data= {
-        categoria: categoria
-    }
-    inviaRichiestaGenerica('/filtro_categoria', data)
+    inviaRichiestaGenerica('/ricerca_fornitori', aggiornaFiltro('categoria', categoria))
 }
 
 function inviaRichiestaRegione(regione){
-    let data ={
-        regione: regione
-    }
-    inviaRichiestaGenerica('/filtro_regione', data)
+    inviaRichiestaGenerica('/ricerca_fornitori', aggiornaFiltro('regione', regione))
 }
 
 
 function inviaRichiestaPrezzo(){
     let prezzo_min = document.getElementById("prezzo_min").value;
     let prezzo_max = document.getElementById("prezzo_max").value;
-    let data ={
-        prezzo_min: prezzo_min,
-        prezzo_max: prezzo_max
-    }
-    inviaRichiestaGenerica('/filtro_prezzo', data)
+    aggiornaFiltro('prezzo_min', prezzo_min);
+    inviaRichiestaGenerica('/ricerca_fornitori', aggiornaFiltro('prezzo_max', prezzo_max))
 }
 
 function aggiornaDOMConRisultati(datiFiltrati) {
@@ -73,7 +65,7 @@ function aggiornaDOMConRisultati(datiFiltrati) {
         datiFiltrati.fornitori_filtrati.forEach(function (fornitore) {
 
             let nomeFornitore = fornitore.nome_utente;
-            let fotoFornitore = fornitore.foto[0];
+            let fotoFornitore = fornitore.miniature[0];
             let citta = fornitore.citta;
             let regione = fornitore.regione;
 
@@ -99,7 +91,7 @@ function aggiornaDOMConRisultati(datiFiltrati) {
                 <div class="card">
                     <div class="face face1">
                         <div class="content">
-                            <img src="data:image/jpeg;base64,${fotoFornitore}">
+                            <img src="${fotoFornitore}">
                             <h3 style="font-size: 18px;">${nomeFornitore}</h3>
                         </div>
                     </div>
@@ -28,7 +28,7 @@ function aggiornaDOM(data) {
 
         let nuovoContenuto = `
             <div class="watch fade-in" style="display: flex; justify-items:center; justify-content: center;">
-                <img class="img" src="data:image/jpeg;base64,${data.fornitore_scelto.foto[0]}" alt="Immagine">
+                <img class="img" src="${data.fornitore_scelto.foto[0]}" alt="Immagine">
             </div>
             <h1 class="watch fade-in" style="text-align: center">${data.fornitore_scelto.nome_utente}</h1>
             <p class="watch fade-in" style="text-align: center">${data.fornitore_scelto.descrizione}</p>
@@ -43,7 +43,7 @@ function aggiornaDOM(data) {
                     <div class="card2">
                         <div class="face3 face4">
                             <div class="content2">
-                                <img src="data:image/jpeg;base64,${servizio.foto_servizio[0]}">
+                                <img src="${servizio.foto_servizio[0]}">
                                 <h3 style="font-size: 18px;">${servizio.tipo}</h3>
                             </div>
                         </div>
@@ -70,7 +70,7 @@ function aggiornaDOM(data) {
                 <div class="card2">
                     <div class="face3 face4" style="transform: translateY(0px); background:#FFFFFF">
                         <div class="content2" >
-                            <img style="width: 230px; height: 100%" src="data:image/jpeg;base64,${ foto }">
+                            <img style="width: 230px; height: 100%" src="${ foto }">
                         </div>
                     </div>
                 </div>
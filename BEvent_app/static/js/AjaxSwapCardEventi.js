@@ -31,7 +31,7 @@ function aggiornaDOM(data) {
             <p class="projTitle textGradient watch fade-in" style="font-size: 26px; margin-top: 10px;">${ data.evento_scelto.nome }</p>
             <div class="overflow-container">
             <div class="watch fade-in" style="display: flex; justify-items:center; justify-content: center;">
-                <img class="img" src="data:image/jpeg;base64,${data.evento_scelto.locandina}" alt="Immagine">
+                <img class="img" src="${data.evento_scelto.locandina}" alt="Immagine">
             </div>
             <p class="watch fade-in" style="text-align: center">${data.evento_scelto.descrizione}</p>
             <p class="projTitle watch fade-in" style="font-size: 18px; margin-top: 10px;color: black; border-bottom: 3px solid black;"> Biglietto </p>
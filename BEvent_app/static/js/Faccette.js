@@ -0,0 +1,69 @@
+// Filtri della barra laterale (parole, categoria, regione, prezzo), combinati in un'unica ricerca, e conteggi di ogni
+// filtro restituiti dal server (faccette), mostrati accanto alle opzioni delle select e sotto il filtro del prezzo.
+
+let filtriCorrenti = {};
+
+function aggiornaFiltro(nome, valore){
+    if (valore === undefined || valore === null || valore === '' || valore === 'Annulla') {
+        delete filtriCorrenti[nome];
+    } else {
+        filtriCorrenti[nome] = valore;
+    }
+    return Object.assign({}, filtriCorrenti);
+}
+
+function mostraFaccette(faccette){
+    if (!faccette) {
+        return;
+    }
+    mostraConteggiSelect(document.querySelector('select[name="tipo"]'), faccette.categorie || {});
+    mostraConteggiSelect(document.querySelector('select[name="regione"]'), faccette.regioni || {});
+    mostraConteggiPrezzo(faccette.prezzi || {});
+}
+
+function mostraConteggiSelect(select, conteggi){
+    if (!select) {
+        return;
+    }
+    Array.from(select.options).forEach(function (opzione) {
+        if (!opzione.value || opzione.value === 'Annulla') {
+            return;
+        }
+        if (opzione.dataset.etichetta === undefined) {
+            opzione.dataset.etichetta = opzione.textContent;
+        }
+        let numero = conteggi[opzione.value] || 0;
+        opzione.textContent = `${opzione.dataset.etichetta} (${numero})`;
+        opzione.disabled = numero === 0 && !opzione.selected;
+    });
+}
+
+function mostraConteggiPrezzo(conteggi){
+    let contenitore = document.getElementById('faccette-prezzo');
+    if (!contenitore) {
+        return;
+    }
+    contenitore.innerHTML = '';
+    Object.keys(conteggi).forEach(function (fascia) {
+        let etichetta = fascia === 'altro' ? 'Senza prezzo' : `${fascia} €`;
+        let elemento = document.createElement('li');
+        elemento.textContent = `${etichetta} (${conteggi[fascia]})`;
+        if (fascia !== 'altro') {
+            elemento.classList.add('fascia-prezzo');
+            elemento.addEventListener('click', function () {
+                let estremi = fascia.replace('+', '').split('-');
+                document.getElementById('prezzo_min').value = estremi[0];
+                document.getElementById('prezzo_max').value = estremi[1] || '';
+                inviaRichiestaPrezzo();
+            });
+        }
+        contenitore.appendChild(elemento);
+    });
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    let contenitore = document.getElementById('faccette-prezzo');
+    if (contenitore && contenitore.dataset.faccette) {
+        mostraFaccette(JSON.parse(contenitore.dataset.faccette));
+    }
+});
@@ -103,10 +103,11 @@ def create_events(num=NUM_EVENTS):
     for i in range(num):
         ruolo_evento = random.choice(["1","2"])
         organizer = random.choice(utenti)
-        data_evento = (datetime.datetime.now() + datetime.timedelta(days=random.randint(1,365))).strftime("%d-%m-%Y")
+        oggi = datetime.datetime.combine(datetime.date.today(), datetime.time())
+        data_evento = oggi + datetime.timedelta(days=random.randint(1,365))
         prezzo = round(random.uniform(0,100),2)
         is_pagato = random.choice([True, False])
-        biglietti_disponibili = str(random.randint(0,200))
+        biglietti_disponibili = random.randint(0,200)
         evento_doc = {
             "_id": ObjectId(),
             "Nome": "Evento " + random_string(6),
@@ -117,7 +118,7 @@ def create_events(num=NUM_EVENTS):
             "isPagato": is_pagato,
             "EventoPubblico": {
                 "BigliettiDisponibili": biglietti_disponibili,
-                "Prezzo": str(prezzo)
+                "Prezzo": prezzo
             },
             "locandina": gen_large_image_base64() if INCLUDE_LARGE_IMAGES else None,
             "regione": organizer.get("regione", "Lazio"),
@@ -213,8 +214,8 @@ def create_services():
                 "_id": ObjectId(),
                 "Descrizione": random_string(50),
                 "Tipo": random.choice(tipi_servizio),
-                "Prezzo": str(random.randint(50,500)),
-                "Quantità": str(random.randint(1,10)),
+                "Prezzo": float(random.randint(50,500)),
+                "Quantità": random.randint(1,10),
                 "FotoServizio": [],
                 "fornitore_associato": forn["_id"],
                 "isDeleted": False,
@@ -75,7 +75,7 @@ def mock_login_fornitore():
         "regione": "Campania",
         "Fornitore": {
             "Descrizione": "Trattoria elegante con spazio all'aperto e piscina",
-            "EventiMassimiGiornaliero": "2",
+            "EventiMassimiGiornaliero": 2,
             "OrarioDiLavoro": "",
             "Foto": [],
             "Citta": "Caserta",
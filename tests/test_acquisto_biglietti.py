@@ -0,0 +1,164 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from BEvent_app.db import get_db
+from BEvent_app.GestioneEvento.GestioneEventoService import acquista_biglietto
+from BEvent_app.GestioneEvento.PrenotazioniBiglietti import COLLEZIONE_PRENOTAZIONI_BIGLIETTI, riserva_biglietti, \
+    conferma_prenotazione, annulla_prenotazione, rilascia_prenotazioni_scadute, WorkerPrenotazioni
+from mock import mock_app
+
+"""
+test sull'acquisto concorrente e sulle prenotazioni dei biglietti di un evento pubblico, eseguiti sul database
+"""
+
+BIGLIETTI = 50
+THREAD = 16
+TENTATIVI = 200
+
+
+def _evento_pubblico(db, biglietti):
+    return db['Evento'].insert_one({
+        'Data': datetime.now().replace(microsecond=0) + timedelta(days=30),
+        'Descrizione': "evento di prova", 'Tipo': "Concerto", 'Invitati/Posti': biglietti, 'Ruolo': "1",
+        'fornitori_associati': [], 'servizi_associati': [], 'isPagato': False,
+        'EventoPubblico': {'Prezzo': 10.0, 'Nome': "Concerto di prova", 'Luogo': "Via Roma", 'Regione': "Molise",
+                           'Ora': "21:00", 'BigliettiDisponibili': biglietti}
+    }).inserted_id
+
+
+def _elimina(db, id_evento):
+    db[COLLEZIONE_PRENOTAZIONI_BIGLIETTI].delete_many({'evento': str(id_evento)})
+    db['Biglietto'].delete_many({'Evento_associato': str(id_evento)})
+    db['Evento'].delete_one({'_id': id_evento})
+
+
+def test_acquisto_quantita_non_valida(mock_app):
+    with mock_app.app_context():
+        db = get_db()
+        id_evento = _evento_pubblico(db, 2)
+        try:
+            assert not acquista_biglietto(str(id_evento), "organizzatore", "0")
+            assert not acquista_biglietto(str(id_evento), "organizzatore", "tre")
+            assert not acquista_biglietto(str(id_evento), "organizzatore", "3")
+            assert acquista_biglietto(str(id_evento), "organizzatore", "2")
+            assert db['Evento'].find_one({'_id': id_evento})['EventoPubblico']['BigliettiDisponibili'] == 0
+        finally:
+            _elimina(db, id_evento)
+
+
+def test_acquisti_concorrenti_senza_overselling(mock_app):
+    with mock_app.app_context():
+        db = get_db()
+        id_evento = _evento_pubblico(db, BIGLIETTI)
+        try:
+            with ThreadPoolExecutor(max_workers=THREAD) as esecutore:
+                esiti = list(esecutore.map(
+                    lambda indice: acquista_biglietto(str(id_evento), f"acquirente-{indice}", "1"), range(TENTATIVI)))
+
+            venduti = sum(biglietto['Quantità'] for biglietto in
+                          db['Biglietto'].find({'Evento_associato': str(id_evento)}, {'Quantità': 1}))
+            rimasti = db['Evento'].find_one({'_id': id_evento})['EventoPubblico']['BigliettiDisponibili']
+            assert esiti.count(True) == BIGLIETTI
+            assert venduti == BIGLIETTI and rimasti == 0
+        finally:
+            _elimina(db, id_evento)
+
+
+def test_benchmark_acquisti_concorrenti(mock_app, benchmark):
+    with mock_app.app_context():
+        db = get_db()
+        id_evento = ObjectId()
+
+        def prepara():
+            nonlocal id_evento
+            _elimina(db, id_evento)
+            id_evento = _evento_pubblico(db, BIGLIETTI)
+
+        def acquista_in_parallelo():
+            with ThreadPoolExecutor(max_workers=THREAD) as esecutore:
+                return list(esecutore.map(lambda _: acquista_biglietto(str(id_evento), "acquirente", "1"),
+                                          range(TENTATIVI)))
+
+        try:
+            esiti = benchmark.pedantic(acquista_in_parallelo, setup=prepara, rounds=5)
+            assert esiti.count(True) == BIGLIETTI
+        finally:
+            _elimina(db, id_evento)
+
+
+def _disponibili(db, id_evento):
+    return db['Evento'].find_one({'_id': id_evento})['EventoPubblico']['BigliettiDisponibili']
+
+
+def test_prenotazione_confermata(mock_app):
+    with mock_app.app_context():
+        db = get_db()
+        id_evento = _evento_pubblico(db, 3)
+        try:
+            prenotazione = riserva_biglietti(str(id_evento), "acquirente", "2")
+            assert _disponibili(db, id_evento) == 1
+            assert riserva_biglietti(str(id_evento), "altro acquirente", "2") is None
+
+            assert not conferma_prenotazione(prenotazione['id'], "altro acquirente")
+            assert conferma_prenotazione(prenotazione['id'], "acquirente")
+            assert not conferma_prenotazione(prenotazione['id'], "acquirente")
+            assert db['Biglietto'].find_one({'Evento_associato': str(id_evento)})['Quantità'] == 2
+            assert _disponibili(db, id_evento) == 1
+        finally:
+            _elimina(db, id_evento)
+
+
+def test_prenotazione_annullata(mock_app):
+    with mock_app.app_context():
+        db = get_db()
+        id_evento = _evento_pubblico(db, 3)
+        try:
+            prenotazione = riserva_biglietti(str(id_evento), "acquirente", "3")
+            assert annulla_prenotazione(prenotazione['id'], "acquirente")
+            assert _disponibili(db, id_evento) == 3
+            assert not conferma_prenotazione(prenotazione['id'], "acquirente")
+        finally:
+            _elimina(db, id_evento)
+
+
+def test_prenotazioni_scadute_rilasciate(mock_app):
+    with mock_app.app_context():
+        db = get_db()
+        id_evento = _evento_pubblico(db, 2)
+        try:
+            scaduta = riserva_biglietti(str(id_evento), "acquirente", "2", durata=timedelta(seconds=-1))
+            assert not conferma_prenotazione(scaduta['id'], "acquirente")
+
+            # l'evento risulta esaurito, ma la prenotazione scaduta viene rilasciata alla prima nuova richiesta
+            assert riserva_biglietti(str(id_evento), "altro acquirente", "2")
+            assert _disponibili(db, id_evento) == 0
+
+            db[COLLEZIONE_PRENOTAZIONI_BIGLIETTI].update_many({'evento': str(id_evento)},
+                                                              {'$set': {'scadenza': datetime.now()}})
+            # il worker in background può averla già rilasciata: conta solo che i biglietti siano tornati all'evento
+            rilascia_prenotazioni_scadute()
+            assert _disponibili(db, id_evento) == 2
+        finally:
+            _elimina(db, id_evento)
+
+
+def test_worker_rilascia_le_prenotazioni_scadute(mock_app):
+    with mock_app.app_context():
+        db = get_db()
+        id_evento = _evento_pubblico(db, 2)
+        worker = WorkerPrenotazioni(intervallo=0.1)
+        try:
+            riserva_biglietti(str(id_evento), "acquirente", "2", durata=timedelta(seconds=-1))
+            assert _disponibili(db, id_evento) == 0
+            worker.start()
+            for _ in range(50):
+                if _disponibili(db, id_evento) == 2:
+                    break
+                time.sleep(0.1)
+            assert _disponibili(db, id_evento) == 2
+        finally:
+            worker.ferma(5)
+            _elimina(db, id_evento)
@@ -0,0 +1,69 @@
+import time
+
+from BEvent_app.Utils.Cache import CacheTTL
+
+
+def test_hit_e_miss():
+    cache = CacheTTL(dimensione_massima=10, durata=60)
+    assert cache.get("a") is None
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    assert cache.statistiche() == {'elementi': 1, 'hit': 1, 'miss': 1, 'percentuale_hit': 50.0}
+
+
+def test_scadenza():
+    cache = CacheTTL(dimensione_massima=10, durata=0.05)
+    cache.set("a", 1)
+    time.sleep(0.1)
+    assert cache.get("a", "scaduto") == "scaduto"
+    assert cache.statistiche()['elementi'] == 0
+
+
+def test_elimina_il_meno_recente():
+    cache = CacheTTL(dimensione_massima=2, durata=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+
+def test_invalida():
+    cache = CacheTTL()
+    cache.set("a", 1)
+    cache.invalida("a")
+    cache.invalida("mancante")
+    assert cache.get("a") is None
+
+
+def test_cache_catalogo_invalidata():
+    from BEvent_app.RicercaEvento import RicercaEventoService
+
+    letture = []
+
+    def calcola():
+        letture.append(1)
+        return len(letture)
+
+    RicercaEventoService.invalida_catalogo()
+    assert RicercaEventoService._in_cache(('prova',), calcola) == 1
+    assert RicercaEventoService._in_cache(('prova',), calcola) == 1
+    RicercaEventoService.invalida_catalogo()
+    assert RicercaEventoService._in_cache(('prova',), calcola) == 2
+
+
+def test_cache_catalogo_restituisce_copie():
+    from BEvent_app.RicercaEvento import RicercaEventoService
+    from BEvent_app.Utils.Paginazione import Pagina
+
+    RicercaEventoService.invalida_catalogo()
+    pagina = RicercaEventoService._in_cache(('prova_copie',), lambda: Pagina([{'nome': "a"}], totale=1))
+    pagina.append({'nome': "b"})
+    pagina[0]['nome'] = "modificato"
+
+    letta = RicercaEventoService._in_cache(('prova_copie',), lambda: Pagina())
+    assert letta == [{'nome': "a"}] and letta.totale == 1
+    letta.totale = 5
+    assert RicercaEventoService._in_cache(('prova_copie',), lambda: Pagina()).totale == 1
+    RicercaEventoService.invalida_catalogo()
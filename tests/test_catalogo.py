@@ -0,0 +1,258 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from bson import ObjectId
+
+from BEvent_app.db import get_db
+from BEvent_app.GestioneEvento.GestioneEventoService import ricerca_fornitori_faccette, filtro_ricerca, \
+    get_disponibilita, invalida_disponibilita, get_servizi_fornitore, ottieni_servizi_e_fornitori_cookie, \
+    get_dettagli_evento_con_servizi
+from BEvent_app.Media.MediaService import elimina_media
+from BEvent_app.RicercaEvento.RicercaEventoService import cerca_eventi, ricerca_eventi_faccette, invalida_catalogo, \
+    get_eventi_sponsorizzati
+from BEvent_app.Utils.Paginazione import leggi_cursore
+from mock import mock_app
+
+"""
+test su paginazione, faccette e comandi di migrazione, eseguiti sul database
+"""
+
+TIPO_PROVA = "Prova catalogo"
+
+
+def _evento(giorni, regione, prezzo=10.0, **campi):
+    return {
+        '_id': ObjectId(),
+        'Data': datetime.now().replace(microsecond=0) + timedelta(days=giorni),
+        'Descrizione': "evento di prova",
+        'Tipo': TIPO_PROVA,
+        'Invitati/Posti': 100,
+        'Ruolo': "1",
+        'fornitori_associati': [],
+        'servizi_associati': [],
+        'isPagato': False,
+        'EventoPubblico': {
+            'Prezzo': prezzo,
+            'Nome': "Evento di prova",
+            'Luogo': "Via Roma",
+            'Regione': regione,
+            'Ora': "21:00",
+            'BigliettiDisponibili': 100
+        },
+        **campi
+    }
+
+
+def _inserisci_eventi(*eventi):
+    get_db()['Evento'].insert_many(list(eventi))
+    invalida_catalogo()
+    return [evento['_id'] for evento in eventi]
+
+
+def _elimina_eventi(id_eventi):
+    get_db()['Evento'].delete_many({'_id': {'$in': id_eventi}})
+    invalida_catalogo()
+
+
+def test_cerca_eventi_pagine_e_cursore(mock_app):
+    with mock_app.app_context():
+        id_eventi = _inserisci_eventi(_evento(30, "Molise"), _evento(31, "Molise"), _evento(32, "Umbria"))
+        try:
+            prima = cerca_eventi({'Tipo': TIPO_PROVA}, dimensione_pagina=2)
+            assert [evento.id for evento in prima] == [str(id_evento) for id_evento in id_eventi[:2]]
+            assert prima.totale == 3 and prima.pagine == 2
+            assert prima.cursore_successivo
+
+            seconda = cerca_eventi({'Tipo': TIPO_PROVA}, 2, 2, leggi_cursore({'cursore': prima.cursore_successivo}))
+            assert [evento.id for evento in seconda] == [str(id_eventi[2])]
+            assert seconda.totale is None and seconda.cursore_successivo is None
+        finally:
+            _elimina_eventi(id_eventi)
+
+
+def test_eventi_sponsorizzati_limitati(mock_app):
+    with mock_app.app_context():
+        id_eventi = _inserisci_eventi(*[_evento(giorni, "Molise", isPagato=True) for giorni in (1, 2, 3)])
+        try:
+            assert len(get_eventi_sponsorizzati(2)) == 2
+        finally:
+            _elimina_eventi(id_eventi)
+
+
+def test_ricerca_eventi_faccette(mock_app):
+    with mock_app.app_context():
+        id_eventi = _inserisci_eventi(_evento(30, "Molise", 10), _evento(31, "Molise", 60), _evento(32, "Umbria", 10))
+        try:
+            eventi, faccette = ricerca_eventi_faccette({'categoria': TIPO_PROVA, 'regione': "Molise"})
+            assert eventi.totale == 2
+            # il conteggio delle regioni ignora il filtro sulla regione, quello delle categorie no
+            assert faccette['regioni'] == {"Molise": 2, "Umbria": 1}
+            assert faccette['categorie'][TIPO_PROVA] == 2
+            assert faccette['prezzi'] == {'0-25': 1, '50-100': 1}
+
+            prima, _ = ricerca_eventi_faccette({'categoria': TIPO_PROVA}, dimensione_pagina=2)
+            seconda, faccette = ricerca_eventi_faccette({'categoria': TIPO_PROVA}, 2, 2,
+                                                        leggi_cursore({'cursore': prima.cursore_successivo}))
+            assert [evento.id for evento in seconda] == [str(id_eventi[2])]
+            assert seconda.totale is None and faccette is None
+        finally:
+            _elimina_eventi(id_eventi)
+
+
+def _inserisci_fornitore(db):
+    id_fornitore = ObjectId()
+    db['Utente'].insert_one({
+        '_id': id_fornitore, 'nome': "Prova", 'cognome': "Catalogo", 'email': "prova.catalogo@example.com",
+        'telefono': "0123456789", 'nome_utente': "Fornitore di prova", 'data_di_nascita': "01-01-1990",
+        'Ruolo': "3", 'regione': "Molise",
+        'Fornitore': {'Descrizione': "fornitore di prova", 'EventiMassimiGiornaliero': 1}
+    })
+    id_servizio = db['Servizio Offerto'].insert_one({
+        'Descrizione': "servizio di prova", 'Tipo': TIPO_PROVA, 'Prezzo': 30.0, 'Quantità': 1,
+        'fornitore_associato': str(id_fornitore), 'isCurrentVersion': None, 'isDeleted': False
+    }).inserted_id
+    invalida_disponibilita()
+    return id_fornitore, id_servizio
+
+
+def _elimina_fornitore(db, id_fornitore, id_servizio):
+    db['Servizio Offerto'].delete_one({'_id': id_servizio})
+    db['Utente'].delete_one({'_id': id_fornitore})
+    invalida_disponibilita()
+
+
+def test_ricerca_fornitori_faccette(mock_app):
+    with mock_app.app_context():
+        db = get_db()
+        id_fornitore, id_servizio = _inserisci_fornitore(db)
+        try:
+            data = (datetime.now() + timedelta(days=60)).strftime("%d-%m-%Y")
+            servizi, fornitori, faccette = ricerca_fornitori_faccette({'categoria': TIPO_PROVA}, data)
+            assert [servizio._id for servizio in servizi] == [str(id_servizio)]
+            assert [fornitore.id for fornitore in fornitori] == [str(id_fornitore)]
+            assert faccette['categorie'][TIPO_PROVA] == 1
+            assert faccette['regioni']["Molise"] >= 1
+        finally:
+            _elimina_fornitore(db, id_fornitore, id_servizio)
+
+
+def test_disponibilita_con_servizi_e_recensioni(mock_app):
+    with mock_app.app_context():
+        db = get_db()
+        id_fornitore, id_servizio = _inserisci_fornitore(db)
+        id_recensione = db['Recensione'].insert_one({
+            'id_valutato': str(id_servizio), 'id_valutante': "organizzatore", 'Voto': "4", 'Titolo': "Ottimo",
+            'Descrizione': "servizio puntuale", 'Tipo_servizio_valutato': TIPO_PROVA, 'Nome_utente_valutante': "prova"
+        }).inserted_id
+        try:
+            data = (datetime.now() + timedelta(days=60)).strftime("%d-%m-%Y")
+            disponibilita = get_disponibilita(data)
+            assert str(id_fornitore) in [fornitore.id for fornitore in disponibilita.fornitori]
+            assert str(id_servizio) in [servizio._id for servizio in disponibilita.servizi]
+            assert str(id_recensione) in [recensione.id for recensione in disponibilita.recensioni]
+            assert disponibilita.riepilogo_recensioni[str(id_fornitore)] == {'numero': 1, 'media': 4.0}
+            assert disponibilita.faccette['categorie'][TIPO_PROVA] == 1
+        finally:
+            db['Recensione'].delete_one({'_id': id_recensione})
+            _elimina_fornitore(db, id_fornitore, id_servizio)
+
+
+def test_servizi_fornitore_occupati_nella_data(mock_app):
+    with mock_app.app_context():
+        db = get_db()
+        id_fornitore, id_servizio = _inserisci_fornitore(db)
+        id_eventi = _inserisci_eventi(_evento(40, "Molise", servizi_associati=[str(id_servizio)]))
+        try:
+            fornitore = SimpleNamespace(id=str(id_fornitore))
+            data = (datetime.now() + timedelta(days=40)).strftime("%d-%m-%Y")
+            assert get_servizi_fornitore(fornitore, data) == []
+
+            giorno_libero = (datetime.now() + timedelta(days=41)).strftime("%d-%m-%Y")
+            assert [servizio._id for servizio in get_servizi_fornitore(fornitore, giorno_libero)] == [str(id_servizio)]
+        finally:
+            _elimina_eventi(id_eventi)
+            _elimina_fornitore(db, id_fornitore, id_servizio)
+
+
+def test_filtro_ricerca_vuota(mock_app):
+    with mock_app.app_context():
+        db = get_db()
+        id_fornitore, id_servizio = _inserisci_fornitore(db)
+        try:
+            data = (datetime.now() + timedelta(days=60)).strftime("%d-%m-%Y")
+            servizi, fornitori = filtro_ricerca("   ", data)
+            assert str(id_fornitore) in [fornitore.id for fornitore in fornitori]
+            assert str(id_servizio) in [servizio._id for servizio in servizi]
+        finally:
+            _elimina_fornitore(db, id_fornitore, id_servizio)
+
+
+def test_carrello_fornitori_senza_ripetizioni(mock_app):
+    with mock_app.app_context():
+        db = get_db()
+        id_fornitore, id_servizio = _inserisci_fornitore(db)
+        secondo_servizio = db['Servizio Offerto'].insert_one({
+            'Descrizione': "secondo servizio", 'Tipo': TIPO_PROVA, 'Prezzo': 20.0, 'Quantità': 1,
+            'fornitore_associato': str(id_fornitore), 'isCurrentVersion': None, 'isDeleted': False
+        }).inserted_id
+        try:
+            carrello = [str(secondo_servizio), '', str(id_servizio)]
+            servizi, fornitori = ottieni_servizi_e_fornitori_cookie(carrello)
+            assert [servizio._id for servizio in servizi] == [str(secondo_servizio), str(id_servizio)]
+            assert [fornitore.id for fornitore in fornitori] == [str(id_fornitore)]
+        finally:
+            db['Servizio Offerto'].delete_one({'_id': secondo_servizio})
+            _elimina_fornitore(db, id_fornitore, id_servizio)
+
+
+def test_dettagli_evento_con_servizi(mock_app):
+    with mock_app.app_context():
+        db = get_db()
+        id_fornitore, id_servizio = _inserisci_fornitore(db)
+        altro_servizio = db['Servizio Offerto'].insert_one({
+            'Descrizione': "servizio di un altro fornitore", 'Tipo': TIPO_PROVA, 'Prezzo': 20.0, 'Quantità': 1,
+            'fornitore_associato': str(ObjectId()), 'isCurrentVersion': None, 'isDeleted': False
+        }).inserted_id
+        id_organizzatore = db['Utente'].insert_one({
+            'nome': "Prova", 'cognome': "Organizzatore", 'email': "prova.organizzatore@example.com",
+            'telefono': "0123456789", 'nome_utente': "Organizzatore di prova", 'password': "hash",
+            'data_di_nascita': "01-01-1990", 'Ruolo': "2", 'regione': "Molise", 'Organizzatore': {'Citta': "Campobasso"}
+        }).inserted_id
+        evento = _evento(50, "Molise", Ruolo="2", servizi_associati=[str(altro_servizio), str(id_servizio)],
+                         EventoPrivato={'Festeggiato/i': "Prova", 'Prezzo': 50.0,
+                                        'Organizzatore': str(id_organizzatore)})
+        id_eventi = _inserisci_eventi(evento)
+        try:
+            dettagli = get_dettagli_evento_con_servizi(str(id_eventi[0]))
+            assert dettagli.evento.id == str(id_eventi[0])
+            assert dettagli.organizzatore.id == str(id_organizzatore)
+            assert [servizio['_id'] for servizio in dettagli.servizi] == [altro_servizio, id_servizio]
+
+            # i servizi del fornitore che guarda l'evento non vengono restituiti
+            escluso = get_dettagli_evento_con_servizi(str(id_eventi[0]), str(id_fornitore))
+            assert [servizio['_id'] for servizio in escluso.servizi] == [altro_servizio]
+        finally:
+            _elimina_eventi(id_eventi)
+            db['Utente'].delete_one({'_id': id_organizzatore})
+            db['Servizio Offerto'].delete_one({'_id': altro_servizio})
+            _elimina_fornitore(db, id_fornitore, id_servizio)
+
+
+def test_comandi_di_migrazione(mock_app):
+    with mock_app.app_context():
+        evento = _evento(30, "Molise", Locandina=b"locandina di prova")
+        evento['Data'] = "25-12-2030"
+        evento['EventoPubblico']['Prezzo'] = "12,50"
+        id_eventi = _inserisci_eventi(evento)
+        try:
+            runner = mock_app.test_cli_runner()
+            for comando in ('migra-date', 'migra-numeri', 'migra-media'):
+                assert runner.invoke(args=[comando]).exit_code == 0
+
+            migrato = get_db()['Evento'].find_one({'_id': id_eventi[0]})
+            assert migrato['Data'] == datetime(2030, 12, 25)
+            assert migrato['EventoPubblico']['Prezzo'] == 12.5
+            assert 'Locandina' not in migrato and migrato['LocandinaId']
+            elimina_media(migrato['LocandinaId'])
+        finally:
+            _elimina_eventi(id_eventi)
@@ -0,0 +1,45 @@
+from datetime import datetime
+
+from BEvent_app.Utils.Conversioni import converti_data, formatta_data, intervallo_giorno, converti_intero, \
+    converti_prezzo, intervallo_numerico, nell_intervallo
+
+
+def test_converti_data():
+    assert converti_data("25-12-2030") == datetime(2030, 12, 25)
+    assert converti_data("2030-12-25") == datetime(2030, 12, 25)
+    assert converti_data(datetime(2030, 12, 25, 10)) == datetime(2030, 12, 25, 10)
+    assert converti_data("non una data") is None
+    assert converti_data(None) is None
+
+
+def test_formatta_data():
+    assert formatta_data(datetime(2030, 1, 5)) == "05-01-2030"
+    assert formatta_data("05-01-2030") == "05-01-2030"
+    assert formatta_data(None) == ""
+
+
+def test_intervallo_giorno():
+    assert intervallo_giorno(datetime(2030, 12, 31, 18, 30)) == (datetime(2030, 12, 31), datetime(2031, 1, 1))
+    assert intervallo_giorno("sbagliata") == (None, None)
+
+
+def test_converti_numeri():
+    assert converti_intero("12") == 12
+    assert converti_intero(12.0) == 12
+    assert converti_intero("dodici") is None
+    assert converti_prezzo("12,50") == 12.5
+    assert converti_prezzo("abc") is None
+    assert converti_prezzo("nan") is None
+
+
+def test_intervallo_numerico():
+    assert intervallo_numerico("10", "") == {'$gte': 10.0}
+    assert intervallo_numerico(0, "99.9") == {'$gte': 0.0, '$lte': 99.9}
+    assert intervallo_numerico("", None) == {}
+
+
+def test_nell_intervallo():
+    assert nell_intervallo(50, intervallo_numerico("10", "99.9"))
+    assert nell_intervallo("10", intervallo_numerico("10", ""))
+    assert not nell_intervallo(100, intervallo_numerico("", "99.9"))
+    assert not nell_intervallo("gratis", intervallo_numerico("0", ""))
@@ -0,0 +1,54 @@
+import os
+
+from BEvent_app import db as modulo_db
+from BEvent_app.db import configura_db, get_client, get_db, get_statistiche_pool
+
+
+def test_client_condiviso_tra_chiamate():
+    assert get_db().client is get_db().client
+    assert get_client() is get_db().client
+
+
+def test_configurazione_pool():
+    configura_db(MONGO_MAX_POOL_SIZE=7, MONGO_WAIT_QUEUE_TIMEOUT_MS=1234)
+    try:
+        opzioni = get_client().options.pool_options
+        assert opzioni.max_pool_size == 7
+        assert opzioni.wait_queue_timeout == 1.234
+    finally:
+        configura_db(MONGO_MAX_POOL_SIZE=modulo_db.CONFIGURAZIONE_DEFAULT['MONGO_MAX_POOL_SIZE'],
+                     MONGO_WAIT_QUEUE_TIMEOUT_MS=modulo_db.CONFIGURAZIONE_DEFAULT['MONGO_WAIT_QUEUE_TIMEOUT_MS'])
+
+
+def test_nuovo_client_dopo_fork():
+    client_padre = get_client()
+    lettura, scrittura = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(lettura)
+        os.write(scrittura, b"1" if get_client() is not client_padre else b"0")
+        os._exit(0)
+    os.close(scrittura)
+    esito = os.read(lettura, 1)
+    os.waitpid(pid, 0)
+    assert esito == b"1"
+    assert get_client() is client_padre
+
+
+def test_statistiche_pool():
+    statistiche = get_statistiche_pool()
+    for chiave in ('connessioni_create', 'connessioni_aperte', 'checkout', 'in_uso', 'configurazione'):
+        assert chiave in statistiche
+    assert 'MONGO_URI' not in statistiche['configurazione']
+
+
+def test_statistiche_solo_se_abilitate(monkeypatch):
+    from BEvent_app import create_app
+
+    monkeypatch.setenv('BEVENT_ASSICURA_INDICI', '0')
+    monkeypatch.delenv('BEVENT_STATISTICHE', raising=False)
+    app = create_app()
+    assert app.test_client().get('/statistiche').status_code == 404
+
+    app.config['STATISTICHE'] = True
+    assert 'db' in app.test_client().get('/statistiche').get_json()
@@ -0,0 +1,49 @@
+from types import SimpleNamespace
+
+from BEvent_app.GestioneEvento import GestioneEventoService
+from BEvent_app.Utils.Faccette import valore_filtro, match_tranne, faccetta_valori, conteggi, conteggi_prezzo, \
+    raggruppa, raggruppa_prezzi
+
+
+def test_valore_filtro():
+    assert valore_filtro({'categoria': " Musica "}, 'categoria') == "Musica"
+    assert valore_filtro({'categoria': "Annulla"}, 'categoria') is None
+    assert valore_filtro({}, 'categoria') is None
+
+
+def test_match_tranne():
+    condizioni = {'categoria': {'Tipo': "Musica"}, 'regione': None, 'prezzo': {'Prezzo': {'$lte': 50}}}
+    assert match_tranne(condizioni) == {'$match': {'Tipo': "Musica", 'Prezzo': {'$lte': 50}}}
+    assert match_tranne(condizioni, 'categoria') == {'$match': {'Prezzo': {'$lte': 50}}}
+    assert faccetta_valori(condizioni, 'prezzo', 'Tipo') == [
+        {'$match': {'Tipo': "Musica"}}, {'$group': {'_id': '$Tipo', 'numero': {'$sum': 1}}}]
+
+
+def test_conteggi():
+    assert conteggi([{'_id': "Sport", 'numero': 1}, {'_id': None, 'numero': 4}, {'_id': "Musica", 'numero': 3}]) \
+        == {"Musica": 3, "Sport": 1}
+    assert conteggi_prezzo([{'_id': 0, 'numero': 2}, {'_id': 1000, 'numero': 1}, {'_id': 'altro', 'numero': 5}]) \
+        == {'0-25': 2, '1000+': 1, 'altro': 5}
+
+
+def test_raggruppa_in_memoria():
+    assert conteggi(raggruppa(["Musica", "Sport", "Musica", None])) == {"Musica": 2, "Sport": 1}
+    assert conteggi_prezzo(raggruppa_prezzi([10, 24.99, 25, 1500, "12,50", None, -3])) \
+        == {'0-25': 2, '25-50': 1, '1000+': 1, 'altro': 3}
+
+
+def test_ricerca_fornitori_faccette_in_memoria(monkeypatch):
+    fornitori = (SimpleNamespace(id="a", regione="Molise"), SimpleNamespace(id="b", regione="Lazio"))
+    servizi = (SimpleNamespace(_id="1", tipo="Catering", prezzo=30.0, fornitore_associato="a"),
+               SimpleNamespace(_id="2", tipo="Musica", prezzo=300.0, fornitore_associato="b"),
+               SimpleNamespace(_id="3", tipo="Catering", prezzo=60.0, fornitore_associato="b"))
+    monkeypatch.setattr(GestioneEventoService, 'get_disponibilita',
+                        lambda data: SimpleNamespace(fornitori=fornitori, servizi=servizi))
+
+    filtrati, fornitori_filtrati, faccette = GestioneEventoService.ricerca_fornitori_faccette(
+        {'categoria': "Catering", 'regione': "Lazio"}, "10-10-2030")
+    assert [servizio._id for servizio in filtrati] == ["3"]
+    assert [fornitore.id for fornitore in fornitori_filtrati] == ["b"]
+    # ogni faccetta ignora il proprio filtro
+    assert faccette == {'categorie': {"Musica": 1, "Catering": 1}, 'regioni': {"Lazio": 1, "Molise": 1},
+                        'prezzi': {'50-100': 1}}
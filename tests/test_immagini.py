@@ -0,0 +1,52 @@
+import io
+
+from bson import ObjectId
+from PIL import Image as PILImage
+
+from BEvent_app.InterfacciaPersistenza.ServizioOfferto import ServizioOfferto
+from BEvent_app.Utils import Image
+
+
+def _immagine_png(larghezza, altezza):
+    buffer = io.BytesIO()
+    PILImage.new('RGBA', (larghezza, altezza), (200, 30, 30, 128)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def test_genera_varianti():
+    varianti = Image.genera_varianti(_immagine_png(2000, 1000))
+    assert set(varianti) == {(variante, formato) for variante in Image.VARIANTI for formato in Image.FORMATI}
+    for (variante, formato), dati in varianti.items():
+        immagine = PILImage.open(io.BytesIO(dati))
+        assert immagine.format == formato.upper()
+        assert immagine.size == (Image.VARIANTI[variante], Image.VARIANTI[variante] // 2)
+    jpeg = PILImage.open(io.BytesIO(varianti[('miniatura', 'jpeg')]))
+    assert jpeg.info.get('progressive') or jpeg.info.get('progression')
+
+
+def test_varianti_non_ingrandiscono():
+    varianti = Image.genera_varianti(_immagine_png(100, 80))
+    assert PILImage.open(io.BytesIO(varianti[('media', 'webp')])).size == (100, 80)
+
+
+def test_url_variante():
+    assert Image.url_variante("/media/abc", 'miniatura') == "/media/abc/miniatura"
+    assert Image.url_variante("/immagine/evento/abc", 'miniatura') == "/immagine/evento/abc"
+    assert Image.url_variante(None, 'miniatura') is None
+
+
+def test_foto_convertite_solo_al_primo_accesso():
+    foto = b"\xff\xd8 foto di prova"
+    servizio = ServizioOfferto({
+        '_id': ObjectId(),
+        'Descrizione': "Servizio di prova",
+        'Tipo': "Catering",
+        'Prezzo': "100",
+        'isCurrentVersion': None,
+        'isDeleted': False,
+        'fornitore_associato': "fornitore",
+        'FotoServizio': [foto]
+    })
+    assert 'foto_servizio' not in vars(servizio)
+    assert servizio.foto_servizio == [Image.convert_byte_array_to_image(foto)]
+    assert servizio.foto_servizio is servizio.foto_servizio
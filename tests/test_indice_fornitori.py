@@ -0,0 +1,64 @@
+import threading
+import time
+
+from bson import ObjectId
+
+from BEvent_app.GestioneEvento import IndiceFornitori
+
+"""
+test sulla ricostruzione in background dell'indice dei fornitori, con un database in memoria al posto di MongoDB
+"""
+
+
+class CollezioneInMemoria:
+    def __init__(self, documenti=(), attesa=None):
+        self.documenti = list(documenti)
+        # se impostata, find legge i documenti e poi attende, come una lettura lenta che non vede le scritture successive
+        self.attesa = attesa
+        self.iniziata = threading.Event()
+
+    def find(self, query=None, campi=None):
+        letti = list(self.documenti)
+        self.iniziata.set()
+        if self.attesa:
+            self.attesa.wait(5)
+        return iter(letti)
+
+    def find_one(self, query, campi=None):
+        return next((documento for documento in self.documenti if documento['_id'] == query['_id']), None)
+
+
+def _fornitore(nome, descrizione):
+    return {'_id': ObjectId(), 'nome_utente': nome, 'Ruolo': '3', 'Fornitore': {'Descrizione': descrizione}}
+
+
+def test_ricostruzione_in_background_non_perde_gli_aggiornamenti(monkeypatch):
+    fotografo = _fornitore("Fotografo", "Fotografo professionista per matrimoni")
+    utenti = CollezioneInMemoria([fotografo])
+    db = {'Utente': utenti, 'Servizio Offerto': CollezioneInMemoria()}
+    monkeypatch.setattr(IndiceFornitori, 'get_db', lambda: db)
+    IndiceFornitori._dopo_fork()
+    try:
+        assert str(fotografo['_id']) in IndiceFornitori.cerca_fornitori("fotografo")
+
+        # indice scaduto: la ricerca avvia la ricostruzione e risponde subito con l'indice precedente
+        utenti.attesa, utenti.iniziata = threading.Event(), threading.Event()
+        IndiceFornitori._costruito_il = time.monotonic() - IndiceFornitori.DURATA_INDICE - 1
+        assert str(fotografo['_id']) in IndiceFornitori.cerca_fornitori("fotografo")
+        assert utenti.iniziata.wait(5)
+
+        # un fornitore registrato mentre la ricostruzione legge i dati vecchi
+        catering = _fornitore("Catering", "Catering e pasticceria")
+        utenti.documenti.append(catering)
+        IndiceFornitori.aggiorna_fornitore(str(catering['_id']))
+        assert str(catering['_id']) in IndiceFornitori.cerca_fornitori("pasticceria")
+
+        utenti.attesa.set()
+        for thread in threading.enumerate():
+            if thread.name == 'indice-fornitori':
+                thread.join(5)
+        assert not IndiceFornitori._scaduto()
+        assert str(catering['_id']) in IndiceFornitori.cerca_fornitori("pasticceria")
+        assert str(fotografo['_id']) in IndiceFornitori.cerca_fornitori("fotografo")
+    finally:
+        IndiceFornitori._dopo_fork()
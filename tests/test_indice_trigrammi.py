@@ -0,0 +1,31 @@
+from BEvent_app.Utils.IndiceTrigrammi import IndiceTrigrammi, normalizza, trigrammi
+
+
+def _indice():
+    indice = IndiceTrigrammi()
+    indice.aggiorna("1", "Trattoria Da Teresa Trattoria elegante con spazio all'aperto e piscina")
+    indice.aggiorna("2", "Fotografo professionista per matrimoni")
+    indice.aggiorna("3", "Catering e pasticceria")
+    return indice
+
+
+def test_normalizza_e_trigrammi():
+    assert normalizza("Caffè Città") == "caffe citta"
+    assert trigrammi("Ok") == {"  o", " ok", "ok "}
+
+
+def test_ricerca_con_errori_di_battitura():
+    indice = _indice()
+    assert [id_documento for id_documento, _ in indice.cerca("fotgrafo")] == ["2"]
+    assert indice.cerca("catring")[0][0] == "3"
+    assert indice.cerca("astronave") == []
+
+
+def test_aggiorna_e_rimuovi():
+    indice = _indice()
+    indice.aggiorna("2", "Musica e servizio audio")
+    assert indice.cerca("fotografo") == []
+    assert indice.cerca("musica")[0][0] == "2"
+
+    indice.rimuovi("2")
+    assert indice.cerca("musica") == [] and len(indice) == 2
@@ -0,0 +1,44 @@
+from pymongo.errors import OperationFailure
+
+from BEvent_app.InterfacciaPersistenza.Indici import INDICI, assicura_indici, verifica_indici
+
+
+class CollezioneDiProva:
+    def __init__(self, indici=None, accessi=None):
+        self.indici = {'_id_': {'key': [('_id', 1)]}, **(indici or {})}
+        self.accessi = accessi
+
+    def index_information(self):
+        return dict(self.indici)
+
+    def create_indexes(self, modelli):
+        for modello in modelli:
+            self.indici[modello.document['name']] = {'key': list(modello.document['key'].items())}
+
+    def aggregate(self, pipeline):
+        if self.accessi is None:
+            raise OperationFailure("non autorizzato")
+        return [{'name': nome, 'accesses': {'ops': ops}} for nome, ops in self.accessi.items()]
+
+
+def _db(**collezioni):
+    db = {nome: CollezioneDiProva() for nome in INDICI}
+    db.update(collezioni)
+    return db
+
+
+def test_assicura_indici_idempotente():
+    db = _db(Utente=CollezioneDiProva({'email_1': {'key': [('email', 1)]}}))
+
+    risultato = assicura_indici(db)
+    assert risultato['Utente'] == {'creati': ['ruolo'], 'conflitti': []}
+    assert 'ruolo_data_id' in risultato['Evento']['creati']
+
+    assert all(not stato['creati'] for stato in assicura_indici(db).values())
+
+
+def test_verifica_indici():
+    db = _db(Biglietto=CollezioneDiProva({'vecchio': {'key': [('Dove', 1)]}}, accessi={'_id_': 10, 'vecchio': 0}))
+
+    stato = verifica_indici(db)['Biglietto']
+    assert stato == {'mancanti': ['comprato_da'], 'non_dichiarati': ['vecchio'], 'inutilizzati': ['vecchio']}
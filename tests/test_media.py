@@ -0,0 +1,25 @@
+from BEvent_app.Media.MediaService import salva_immagine, elimina_media
+from mock import mock_app
+
+
+def test_scarica_media(mock_app):
+    with mock_app.app_context(), mock_app.test_client() as test_client:
+        id_media = salva_immagine(b"immagine di prova")
+        try:
+            risposta = test_client.get(f"/media/{id_media}")
+            assert risposta.status_code == 200
+            assert risposta.data == b"immagine di prova"
+            assert risposta.headers["ETag"]
+            assert risposta.headers["Last-Modified"]
+            assert "max-age=31536000" in risposta.headers["Cache-Control"]
+
+            risposta = test_client.get(f"/media/{id_media}", headers={"If-None-Match": risposta.headers["ETag"]})
+            assert risposta.status_code == 304 and risposta.data == b""
+        finally:
+            elimina_media(id_media)
+
+
+def test_media_inesistente(mock_app):
+    with mock_app.app_context(), mock_app.test_client() as test_client:
+        assert test_client.get("/media/65a958fc1423cc09d49a4c75").status_code == 404
+        assert test_client.get("/media/non-un-id").status_code == 404
@@ -0,0 +1,156 @@
+import socketserver
+import threading
+from datetime import datetime
+
+import pytest
+
+from BEvent_app.db import get_db
+from BEvent_app.InterfacciaPersistenza import Fornitore as modulo_fornitore
+from BEvent_app.InterfacciaPersistenza.Fornitore import Fornitore
+from BEvent_app.Notifiche.NotificheService import COLLEZIONE_NOTIFICHE, CONFIGURAZIONE_DEFAULT, FALLITA, IN_ATTESA, \
+    InviatoreSMTP, accoda_notifica, consegna_notifiche, configura_notifiche
+from mock import mock_app
+
+"""
+test sulla outbox delle notifiche, con un server SMTP locale al posto di quello reale
+"""
+
+
+class GestoreSMTP(socketserver.StreamRequestHandler):
+    """
+    Server SMTP minimo: accetta i messaggi e li conserva in server.messaggi, rifiuta i destinatari in
+    server.rifiutati e chiude la connessione dopo server.messaggi_per_connessione messaggi.
+    """
+
+    def _rispondi(self, riga):
+        self.wfile.write((riga + "\r\n").encode())
+
+    def handle(self):
+        self.server.connessioni += 1
+        inviati = 0
+        self._rispondi("220 prova")
+        while True:
+            riga = self.rfile.readline().decode().strip()
+            if not riga:
+                return
+            comando = riga.split(" ")[0].upper()
+            if comando == "EHLO":
+                self._rispondi("250 prova")
+            elif comando == "RCPT":
+                if any(rifiutato in riga for rifiutato in self.server.rifiutati):
+                    self._rispondi("550 destinatario sconosciuto")
+                else:
+                    self._rispondi("250 ok")
+            elif comando == "DATA":
+                self._rispondi("354 fine con .")
+                righe = []
+                while (contenuto := self.rfile.readline().decode()) != ".\r\n":
+                    righe.append(contenuto)
+                self.server.messaggi.append("".join(righe))
+                self._rispondi("250 ok")
+                inviati += 1
+                if inviati == self.server.messaggi_per_connessione:
+                    return
+            elif comando == "QUIT":
+                self._rispondi("221 ciao")
+                return
+            else:
+                self._rispondi("250 ok")
+
+
+@pytest.fixture
+def server_smtp():
+    server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), GestoreSMTP)
+    server.daemon_threads = True
+    server.connessioni, server.messaggi, server.rifiutati, server.messaggi_per_connessione = 0, [], [], None
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _configurazione(server):
+    return {**CONFIGURAZIONE_DEFAULT, 'SMTP_HOST': '127.0.0.1', 'SMTP_PORT': server.server_address[1],
+            'SMTP_STARTTLS': False, 'SMTP_MITTENTE': "bevent@example.com", 'SMTP_TIMEOUT': 5}
+
+
+def test_inviatore_riusa_la_connessione(server_smtp):
+    inviatore = InviatoreSMTP(_configurazione(server_smtp))
+    inviatore.invia("uno@example.com", "Oggetto", "primo messaggio")
+    inviatore.invia("due@example.com", "Oggetto", "secondo messaggio")
+    inviatore.chiudi()
+
+    assert server_smtp.connessioni == 1
+    assert len(server_smtp.messaggi) == 2
+    assert "To: due@example.com" in server_smtp.messaggi[1]
+
+
+def test_inviatore_riapre_la_connessione_chiusa(server_smtp):
+    server_smtp.messaggi_per_connessione = 1
+    inviatore = InviatoreSMTP(_configurazione(server_smtp))
+    inviatore.invia("uno@example.com", "Oggetto", "primo messaggio")
+    inviatore.invia("due@example.com", "Oggetto", "secondo messaggio")
+    inviatore.chiudi()
+
+    assert server_smtp.connessioni == 2
+    assert len(server_smtp.messaggi) == 2
+
+
+def test_annullamento_accodato(monkeypatch):
+    accodate = []
+    monkeypatch.setattr(modulo_fornitore, 'accoda_notifica', lambda *notifica: accodate.append(notifica))
+    dati = {'_id': "65a958fc1423cc09d49a4c76", 'nome': "Prova", 'cognome': "Notifiche", 'data_di_nascita': "01-01-1990",
+            'email': "fornitore@example.com", 'telefono': "0123456789", 'nome_utente': "fornitore", 'password': "hash",
+            'Ruolo': "3", 'regione': "Molise", 'Fornitore': {}}
+
+    class EventoAnnullato:
+        data = "10-10-2030"
+
+    Fornitore(dati, dati).update(EventoAnnullato())
+    assert accodate[0][0] == "fornitore@example.com"
+    assert "10-10-2030 è stato annullato" in accodate[0][2]
+
+
+def test_consegna_e_ritenta_le_notifiche(mock_app, server_smtp):
+    with mock_app.app_context():
+        collezione = get_db()[COLLEZIONE_NOTIFICHE]
+        server_smtp.rifiutati = ["sconosciuto@example.com"]
+        configura_notifiche(NOTIFICHE_TENTATIVI=2, NOTIFICHE_ATTESA_BASE=0)
+        id_notifiche = [accoda_notifica("fornitore@example.com", "Annullamento", "evento annullato"),
+                        accoda_notifica("sconosciuto@example.com", "Annullamento", "evento annullato")]
+        try:
+            inviatore = InviatoreSMTP(_configurazione(server_smtp))
+            assert consegna_notifiche(inviatore) == {'inviate': 1, 'ritentate': 1, 'fallite': 0}
+            rifiutata = collezione.find_one({'_id': id_notifiche[1]})
+            assert rifiutata['stato'] == IN_ATTESA and rifiutata['tentativi'] == 1
+            assert rifiutata['prossimo_tentativo'] <= datetime.now()
+
+            assert consegna_notifiche(inviatore) == {'inviate': 0, 'ritentate': 0, 'fallite': 1}
+            assert collezione.find_one({'_id': id_notifiche[1]})['stato'] == FALLITA
+            assert collezione.find_one({'_id': id_notifiche[0]}) is None
+            assert server_smtp.connessioni == 1
+            inviatore.chiudi()
+        finally:
+            configura_notifiche(NOTIFICHE_TENTATIVI=CONFIGURAZIONE_DEFAULT['NOTIFICHE_TENTATIVI'],
+                                NOTIFICHE_ATTESA_BASE=CONFIGURAZIONE_DEFAULT['NOTIFICHE_ATTESA_BASE'])
+            collezione.delete_many({'_id': {'$in': id_notifiche}})
+
+
+def test_errore_imprevisto_conta_come_tentativo(mock_app):
+    class InviatoreGuasto:
+        def invia(self, destinatario, oggetto, corpo):
+            raise ValueError("messaggio non valido")
+
+        def chiudi(self):
+            pass
+
+    with mock_app.app_context():
+        collezione = get_db()[COLLEZIONE_NOTIFICHE]
+        id_notifica = accoda_notifica("fornitore@example.com", "Annullamento", "evento annullato")
+        try:
+            assert consegna_notifiche(InviatoreGuasto(), lotto=1) == {'inviate': 0, 'ritentate': 1, 'fallite': 0}
+            notifica = collezione.find_one({'_id': id_notifica})
+            assert notifica['stato'] == IN_ATTESA and notifica['tentativi'] == 1
+            assert "messaggio non valido" in notifica['ultimo_errore']
+        finally:
+            collezione.delete_one({'_id': id_notifica})
@@ -0,0 +1,47 @@
+from bson import ObjectId
+
+from BEvent_app.InterfacciaPersistenza import Evento as modulo_evento
+from BEvent_app.InterfacciaPersistenza.EventoPrivato import EventoPrivato
+
+
+class FornitoreDiProva:
+    def __init__(self):
+        self.notifiche = []
+
+    def update(self, observable):
+        self.notifiche.append(observable.id)
+
+
+def _evento_privato():
+    dati = {
+        '_id': ObjectId(),
+        'Data': "10-10-2030",
+        'Invitati/Posti': "50",
+        'Descrizione': "Evento di prova",
+        'Ruolo': "2",
+        'Tipo': "Compleanno",
+        'isPagato': True,
+        'fornitori_associati': ["65a958fc1423cc09d49a4c76", "65a958fc1423cc09d49a4c77"],
+        'servizi_associati': [],
+        'EventoPrivato': {'Festeggiato/i': "Mario", 'Prezzo': "100", 'Organizzatore': "65a958fc1423cc09d49a4c75"}
+    }
+    return EventoPrivato(dati, dati)
+
+
+def test_observers_caricati_solo_alla_notifica(monkeypatch):
+    chiamate = []
+    fornitore = FornitoreDiProva()
+
+    def get_fornitori(id_fornitori):
+        chiamate.append(list(id_fornitori))
+        return [fornitore]
+
+    monkeypatch.setattr(modulo_evento, 'get_fornitori', get_fornitori)
+
+    evento = _evento_privato()
+    assert chiamate == []
+
+    evento.notify_observers()
+    evento.notify_observers()
+    assert chiamate == [["65a958fc1423cc09d49a4c76", "65a958fc1423cc09d49a4c77"]]
+    assert fornitore.notifiche == [evento.id, evento.id]
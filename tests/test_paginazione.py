@@ -0,0 +1,29 @@
+from datetime import datetime
+
+from BEvent_app.Utils.Paginazione import Pagina, leggi_paginazione, DIMENSIONE_PAGINA, DIMENSIONE_PAGINA_MASSIMA, \
+    codifica_cursore, leggi_cursore
+
+
+def test_pagina():
+    pagina = Pagina(["a", "b"], totale=25, pagina=2, dimensione_pagina=10)
+    assert pagina == ["a", "b"]
+    assert pagina.come_dizionario() == {'totale': 25, 'pagina': 2, 'dimensione_pagina': 10, 'pagine': 3,
+                                         'cursore_successivo': None}
+    assert len(Pagina()) == 0
+    assert Pagina(["a"], totale=None).pagine is None
+
+
+def test_leggi_paginazione():
+    assert leggi_paginazione({}) == (1, DIMENSIONE_PAGINA)
+    assert leggi_paginazione({'pagina': "3", 'dimensione_pagina': 5}) == (3, 5)
+    assert leggi_paginazione({'pagina': -1, 'dimensione_pagina': 1000}) == (1, DIMENSIONE_PAGINA_MASSIMA)
+    assert leggi_paginazione({'pagina': "x"}) == (1, DIMENSIONE_PAGINA)
+
+
+def test_cursore():
+    data = datetime(2026, 5, 17, 21, 30)
+    cursore = codifica_cursore(data, "65f1c0ffee0000000000abcd")
+    assert leggi_cursore({'cursore': cursore}) == (data, "65f1c0ffee0000000000abcd")
+    assert leggi_cursore({}) is None
+    assert leggi_cursore({'cursore': "non valido"}) is None
+    assert leggi_cursore({'cursore': 12}) is None
@@ -0,0 +1,93 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from BEvent_app.db import get_db
+from BEvent_app.GestioneEvento.GestioneEventoService import get_fornitori_disponibli
+from BEvent_app.GestioneEvento.PrenotazioniFornitori import COLLEZIONE_PRENOTAZIONI, registra_prenotazioni, \
+    annulla_prenotazioni
+from mock import mock_app
+
+"""
+test sui contatori delle prenotazioni giornaliere dei fornitori, eseguiti sul database
+"""
+
+
+def _fornitore(db):
+    id_fornitore = ObjectId()
+    db['Utente'].insert_one({
+        '_id': id_fornitore, 'nome': "Prova", 'cognome': "Prenotazioni", 'email': "prova.prenotazioni@example.com",
+        'telefono': "0123456789", 'nome_utente': "Fornitore prenotazioni", 'data_di_nascita': "01-01-1990",
+        'Ruolo': "3", 'regione': "Molise",
+        'Fornitore': {'Descrizione': "fornitore di prova", 'EventiMassimiGiornaliero': 1}
+    })
+    return id_fornitore
+
+
+def test_fornitore_occupato_e_liberato(mock_app):
+    with mock_app.app_context():
+        db = get_db()
+        id_fornitore = _fornitore(db)
+        data = datetime(2031, 3, 14, 20, 30)
+        evento = {'Data': data, 'isPagato': True, 'fornitori_associati': [str(id_fornitore)]}
+        try:
+            assert get_fornitori_disponibli("14-03-2031", [str(id_fornitore)])
+
+            assert registra_prenotazioni(evento)
+            assert registra_prenotazioni({**evento, 'isPagato': False})
+            # il fornitore ha già raggiunto EventiMassimiGiornaliero: il secondo evento pagato viene rifiutato
+            assert not registra_prenotazioni(evento)
+            contatore = db[COLLEZIONE_PRENOTAZIONI].find_one({'fornitore': str(id_fornitore)})
+            assert contatore['data'] == datetime(2031, 3, 14) and contatore['prenotazioni'] == 1
+            assert not get_fornitori_disponibli("14-03-2031", [str(id_fornitore)])
+            assert get_fornitori_disponibli("15-03-2031", [str(id_fornitore)])
+
+            annulla_prenotazioni(evento)
+            assert get_fornitori_disponibli("14-03-2031", [str(id_fornitore)])
+        finally:
+            db[COLLEZIONE_PRENOTAZIONI].delete_many({'fornitore': str(id_fornitore)})
+            db['Utente'].delete_one({'_id': id_fornitore})
+
+
+def test_prenotazioni_concorrenti_entro_il_limite(mock_app):
+    with mock_app.app_context():
+        db = get_db()
+        id_fornitore, altro_fornitore = _fornitore(db), _fornitore(db)
+        db['Utente'].update_one({'_id': id_fornitore}, {'$set': {'Fornitore.EventiMassimiGiornaliero': 3}})
+        db['Utente'].update_one({'_id': altro_fornitore}, {'$set': {'Fornitore.EventiMassimiGiornaliero': 20}})
+        evento = {'Data': datetime(2031, 4, 2, 18), 'isPagato': True,
+                  'fornitori_associati': [str(altro_fornitore), str(id_fornitore)]}
+        try:
+            with ThreadPoolExecutor(max_workers=8) as esecutore:
+                esiti = list(esecutore.map(lambda _: registra_prenotazioni(evento), range(20)))
+
+            contatori = {contatore['fornitore']: contatore['prenotazioni'] for contatore in
+                         db[COLLEZIONE_PRENOTAZIONI].find({'fornitore': {'$in': [str(id_fornitore),
+                                                                                 str(altro_fornitore)]}})}
+            assert esiti.count(True) == 3
+            # gli incrementi dei fornitori prenotati prima del rifiuto vengono annullati
+            assert contatori == {str(id_fornitore): 3, str(altro_fornitore): 3}
+        finally:
+            db[COLLEZIONE_PRENOTAZIONI].delete_many({'fornitore': {'$in': [str(id_fornitore), str(altro_fornitore)]}})
+            db['Utente'].delete_many({'_id': {'$in': [id_fornitore, altro_fornitore]}})
+
+
+def test_ricostruisci_prenotazioni(mock_app):
+    with mock_app.app_context():
+        db = get_db()
+        id_fornitore = str(ObjectId())
+        id_eventi = db['Evento'].insert_many([
+            {'Data': datetime(2031, 5, 1, 10), 'isPagato': True, 'fornitori_associati': [id_fornitore, id_fornitore]},
+            {'Data': datetime(2031, 5, 1, 21), 'isPagato': True, 'fornitori_associati': [id_fornitore]},
+            {'Data': datetime(2031, 5, 1, 21), 'isPagato': False, 'fornitori_associati': [id_fornitore]},
+        ]).inserted_ids
+        try:
+            risultato = mock_app.test_cli_runner().invoke(args=['ricostruisci-prenotazioni'])
+            assert risultato.exit_code == 0
+
+            contatore = db[COLLEZIONE_PRENOTAZIONI].find_one({'fornitore': id_fornitore})
+            assert contatore['data'] == datetime(2031, 5, 1) and contatore['prenotazioni'] == 2
+        finally:
+            db['Evento'].delete_many({'_id': {'$in': id_eventi}})
+            db[COLLEZIONE_PRENOTAZIONI].delete_many({'fornitore': id_fornitore})
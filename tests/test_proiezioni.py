@@ -0,0 +1,31 @@
+from bson import ObjectId
+
+from BEvent_app.InterfacciaPersistenza.Proiezioni import proiezione, CARD, DETTAGLIO, COMPLETA
+from BEvent_app.InterfacciaPersistenza.ServizioOfferto import ServizioOfferto
+
+
+def test_card_senza_immagini():
+    assert 'Locandina' not in proiezione('Evento', CARD)
+    assert 'Fornitore.Foto' not in proiezione('Utente', CARD)
+    assert 'FotoServizio' not in proiezione('Servizio Offerto', CARD)
+
+
+def test_dettaglio_e_completa():
+    assert proiezione('Evento', DETTAGLIO)['Locandina'] == 1
+    assert proiezione('Evento', COMPLETA) is None
+
+
+def test_url_foto_da_card():
+    servizio = ServizioOfferto({
+        '_id': ObjectId(),
+        'Descrizione': "Servizio di prova",
+        'Tipo': "Catering",
+        'Prezzo': "100",
+        'isCurrentVersion': None,
+        'isDeleted': False,
+        'fornitore_associato': "fornitore",
+        'NumeroFoto': 2
+    })
+    assert servizio.foto_servizio == []
+    assert servizio.url_foto_servizio == [f"/immagine/servizio/{servizio._id}/0",
+                                          f"/immagine/servizio/{servizio._id}/1"]